@@ -0,0 +1,446 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Archive compressée de l'ensemble des structures superposées (Super/*_aligned.cif)
+Un seul fichier .pka au lieu de 64 fichiers texte :
+    - 8 octets : signature PKARCH01
+    - les blocs compressés (zlib, ou zstd si le module zstandard est installé)
+    - index JSON (pour chaque structure : en-tête mmCIF, colonnes, position des blocs)
+    - 8 octets : taille de l'index, puis la signature
+Chaque structure est découpée en trois blocs indépendants : C-alpha, ligands
+(HETATM hors solvant) et autres atomes. On peut donc lire une seule structure,
+ou seulement les C-alpha / ligands de tout l'ensemble, sans décompresser le reste.
+Dans un bloc :
+    - coordonnées en entiers (millièmes d'Å, la précision des fichiers mmCIF),
+      codées en différences d'un atome au suivant, octets regroupés par poids
+    - colonnes texte en catégories (codes + valeurs distinctes)
+    - numéro de ligne de chaque atome dans le fichier d'origine
+Les fichiers mmCIF sont reconstruits à l'identique pour PyMOL (exporter_cif).
+
+Usage (hors PyMOL, depuis le dossier Projet/) :
+    python3 archive_ensemble.py creer ../Super -o ../Super.pka
+    python3 archive_ensemble.py lister ../Super.pka
+    python3 archive_ensemble.py extraire ../Super.pka --entrees 2XB7 --sortie .
+"""
+
+import argparse
+import glob
+import json
+import os
+import struct
+import tempfile
+import time
+import zlib
+
+import numpy as np
+
+from lecture_cif import (_TOKEN, _bloc_atom_site, _nombres, Categorie, COLONNES_COORDS,
+                         COLONNES_FLOAT, COLONNES_INT, MANQUANT)
+
+SIGNATURE = b"PKARCH01"
+EXTENSION = ".pka"
+# coordonnées stockées en millièmes d'Å
+ECHELLE = 1000
+NIVEAU_ZLIB = 9
+NIVEAU_ZSTD = 19
+
+# blocs d'une structure, dans l'ordre du fichier
+CA = "ca"
+LIGANDS = "ligands"
+AUTRES = "autres"
+GROUPES = (CA, LIGANDS, AUTRES)
+
+# résidus qui ne sont pas des ligands
+SOLVANT = (b"HOH", b"DOD", b"WAT", b"H2O")
+
+
+def _compresseur(codec):
+    if codec == "zstd":
+        import zstandard
+        return zstandard.ZstdCompressor(level=NIVEAU_ZSTD).compress
+    return lambda donnees: zlib.compress(donnees, NIVEAU_ZLIB)
+
+
+def _decompresseur(codec):
+    if codec == "zstd":
+        import zstandard
+        return zstandard.ZstdDecompressor().decompress
+    return zlib.decompress
+
+
+def codec_disponible():
+    """zstd si le module zstandard est installé, sinon zlib (bibliothèque standard)"""
+    try:
+        import zstandard  # noqa: F401
+        return "zstd"
+    except ImportError:
+        return "zlib"
+
+
+def _melanger(entiers):
+    """int32 -> octets regroupés par poids (les octets de poids fort, presque tous nuls, se compressent bien)"""
+    return np.ascontiguousarray(entiers, dtype='<i4').view(np.uint8).reshape(-1, 4).T.tobytes()
+
+
+def _demelanger(octets, n):
+    return np.frombuffer(octets, dtype=np.uint8).reshape(4, n).T.copy().view('<i4').reshape(-1)
+
+
+def _categorie_brute(tokens):
+    """Tokens bruts (guillemets compris) -> (codes, valeurs distinctes)"""
+    valeurs, codes = np.unique(tokens, return_inverse=True)
+    dtype = np.uint8 if len(valeurs) < 256 else np.int32
+    return codes.astype(dtype).reshape(-1), valeurs
+
+
+def _decouper(texte):
+    """
+    Découpe un fichier mmCIF : (texte avant la boucle _atom_site, noms des colonnes,
+    tokens bruts (n_lignes, n_colonnes), disposition des colonnes, texte après la boucle).
+    """
+    noms, donnees = _bloc_atom_site(texte)
+    debut_noms = texte.find(b'\n_atom_site.') + 1
+    debut_boucle = texte.rfind(b'loop_', 0, debut_noms)
+    fin_donnees = texte.find(donnees, debut_noms) + len(donnees)
+    lignes = [list(_TOKEN.finditer(ligne)) for ligne in donnees.split(b"\n") if ligne.strip()]
+    if any(len(ligne) != len(noms) for ligne in lignes):
+        raise ValueError("nombre de valeurs incohérent dans _atom_site")
+    tokens = np.array([[m.group() for m in ligne] for ligne in lignes], dtype=bytes).reshape(-1, len(noms))
+    debuts = np.array([[m.start() for m in ligne] for ligne in lignes], dtype=np.int32).reshape(-1, len(noms))
+    fins = np.array([[m.end() for m in ligne] for ligne in lignes], dtype=np.int32).reshape(-1, len(noms))
+    return texte[:debut_boucle], noms, tokens, _disposition(debuts, fins), texte[fin_donnees:]
+
+
+def _largeur(longueurs, espaces):
+    """
+    Largeur minimale w telle que espaces == max(w - longueurs, 0) sur toutes les lignes,
+    0 si la colonne n'est jamais complétée par des espaces, None si ce n'est pas le cas.
+    """
+    completes = espaces > 0
+    if not completes.any():
+        return 0
+    largeurs = longueurs[completes] + espaces[completes]
+    largeur = int(largeurs[0])
+    if np.all(largeurs == largeur) and np.all(longueurs[~completes] >= largeur):
+        return largeur
+    return None
+
+
+def _disposition(debuts, fins):
+    """
+    Mise en page des lignes, comme dans les fichiers écrits par PyMOL : valeurs séparées
+    par un espace et complétées par des espaces à une largeur minimale, à gauche ou à droite.
+    Renvoie [largeur à droite, largeur à gauche] par colonne (0 : pas de complément),
+    ou None si les lignes ne suivent pas cette mise en page (un seul espace à l'export).
+    """
+    if len(debuts) == 0:
+        return None
+    longueurs = fins - debuts
+    # espaces en plus du séparateur avant chaque colonne (et après la dernière : aucun)
+    espaces = np.empty((len(debuts), debuts.shape[1] + 1), dtype=np.int32)
+    espaces[:, 0] = debuts[:, 0]
+    espaces[:, 1:-1] = debuts[:, 1:] - fins[:, :-1] - 1
+    espaces[:, -1] = 0
+    disposition = []
+    for j in range(debuts.shape[1]):
+        # valeur alignée à droite : les espaces avant elle
+        droite = _largeur(longueurs[:, j], espaces[:, j])
+        if droite is None:
+            return None
+        espaces[:, j] = 0
+        # puis alignée à gauche : les espaces après elle
+        gauche = _largeur(longueurs[:, j], espaces[:, j + 1])
+        if gauche is not None:
+            espaces[:, j + 1] = 0
+        disposition.append([droite, gauche or 0])
+    if espaces.any():
+        return None
+    return disposition
+
+
+def _ligne(tokens, disposition):
+    """Réécrit une ligne de la boucle _atom_site"""
+    if disposition is None:
+        return b" ".join(tokens) + b"\n"
+    return b" ".join(token.rjust(droite).ljust(gauche)
+                     for token, (droite, gauche) in zip(tokens, disposition)) + b"\n"
+
+
+def _groupes_atomes(noms, tokens):
+    """Groupe (0 = CA, 1 = ligands, 2 = autres) de chaque atome"""
+    colonne = {nom: j for j, nom in enumerate(noms)}
+    groupe = np.full(len(tokens), 2, dtype=np.int8)
+    if 'group_PDB' in colonne and 'label_comp_id' in colonne:
+        ligand = (tokens[:, colonne['group_PDB']] == b"HETATM") & ~np.isin(tokens[:, colonne['label_comp_id']], SOLVANT)
+        groupe[ligand] = 1
+    ca = tokens[:, colonne['label_atom_id']] == b"CA"
+    if 'type_symbol' in colonne:
+        ca &= tokens[:, colonne['type_symbol']] == b"C"
+    groupe[ca] = 0
+    return groupe
+
+
+def _bloc(noms, tokens, lignes, echelle):
+    """
+    Contenu d'un bloc (avant compression) et description des tableaux :
+    nom -> (dtype, shape, offset) comme dans cache_coordonnees.py
+    """
+    tableaux = {'lignes': _melanger(np.diff(lignes, prepend=0))}
+    description = {'lignes': ['<i4', [len(lignes)], 0]}
+    coords = [noms.index(nom) for nom in COLONNES_COORDS]
+    reels = tokens[:, coords].astype(np.float64)
+    entiers = np.rint(reels * echelle).astype(np.int64)
+    tableaux['coords'] = _melanger(np.diff(entiers, axis=0, prepend=0).reshape(-1))
+    description['coords'] = ['<i4', [len(lignes), 3], 0]
+    # "-0.000" écrit par PyMOL : le signe est perdu dans les entiers
+    zeros_negatifs = np.flatnonzero((entiers == 0) & np.signbit(reels)).astype('<i4')
+    tableaux['zeros_negatifs'] = zeros_negatifs.tobytes()
+    description['zeros_negatifs'] = ['<i4', [len(zeros_negatifs)], 0]
+    for j, nom in enumerate(noms):
+        if nom in COLONNES_COORDS:
+            continue
+        codes, valeurs = _categorie_brute(tokens[:, j])
+        tableaux[f"{nom}.codes"] = codes.tobytes()
+        description[f"{nom}.codes"] = [codes.dtype.str, [len(codes)], 0]
+        tableaux[f"{nom}.valeurs"] = b"\n".join(valeurs)
+        description[f"{nom}.valeurs"] = ['liste', [len(valeurs)], 0]
+
+    offset = 0
+    for nom, octets in tableaux.items():
+        description[nom][2] = offset
+        offset += len(octets)
+    return b"".join(tableaux.values()), description
+
+
+def creer_archive(chemins, destination, echelle=ECHELLE, codec=None, verbose=True):
+    """
+    Regroupe les fichiers mmCIF `chemins` dans l'archive `destination`.
+    Les structures sont nommées par le début du nom de fichier (2XB7_aligned.cif -> 2XB7).
+    Renvoie l'index de l'archive.
+    """
+    codec = codec or codec_disponible()
+    compresser = _compresseur(codec)
+    index = {'version': 1, 'codec': codec, 'echelle': echelle, 'structures': {}}
+
+    dossier = os.path.dirname(destination) or "."
+    fd, temporaire = tempfile.mkstemp(dir=dossier, suffix=".tmp")
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            f.write(SIGNATURE)
+            for chemin in chemins:
+                nom_fichier = os.path.basename(chemin)
+                pdb_id = nom_fichier.split('_')[0].split('-')[0].split('.')[0]
+                with open(chemin, 'rb') as g:
+                    texte = g.read()
+                entete, noms, tokens, disposition, fin = _decouper(texte)
+                groupe = _groupes_atomes(noms, tokens)
+
+                blocs = {}
+                for numero, nom_groupe in enumerate(GROUPES):
+                    lignes = np.flatnonzero(groupe == numero)
+                    contenu, description = _bloc(noms, tokens[lignes], lignes, echelle)
+                    compresse = compresser(contenu)
+                    blocs[nom_groupe] = {'offset': f.tell(), 'taille': len(compresse),
+                                         'n_atomes': len(lignes), 'tableaux': description}
+                    f.write(compresse)
+                index['structures'][pdb_id] = {
+                    'fichier': nom_fichier,
+                    'entete': entete.decode(),
+                    'fin': fin.decode(),
+                    'colonnes': noms,
+                    'disposition': disposition,
+                    'n_atomes': len(tokens),
+                    'blocs': blocs,
+                }
+                if verbose:
+                    print(f"  {pdb_id} : {len(tokens)} atomes")
+
+            contenu_index = json.dumps(index).encode()
+            f.write(contenu_index)
+            f.write(struct.pack('<Q', len(contenu_index)))
+            f.write(SIGNATURE)
+        os.chmod(temporaire, 0o644)
+        os.replace(temporaire, destination)
+    except BaseException:
+        os.unlink(temporaire)
+        raise
+    return index
+
+
+def ouvrir_archive(chemin):
+    """Lit seulement l'index de l'archive (fin du fichier)"""
+    with open(chemin, 'rb') as f:
+        if f.read(len(SIGNATURE)) != SIGNATURE:
+            raise ValueError(f"{chemin} n'est pas une archive d'ensemble valide")
+        f.seek(-(8 + len(SIGNATURE)), os.SEEK_END)
+        taille = struct.unpack('<Q', f.read(8))[0]
+        if f.read(len(SIGNATURE)) != SIGNATURE:
+            raise ValueError(f"{chemin} est incomplète (pas d'index en fin de fichier)")
+        f.seek(-(8 + len(SIGNATURE) + taille), os.SEEK_END)
+        index = json.loads(f.read(taille))
+    index['chemin'] = chemin
+    return index
+
+
+def _lire_bloc(f, index, pdb_id, nom_groupe):
+    """
+    Décompresse un bloc : (lignes, coordonnées entières (n, 3), positions des "-0.000"
+    dans les coordonnées, colonnes brutes nom -> (codes, valeurs))
+    """
+    bloc = index['structures'][pdb_id]['blocs'][nom_groupe]
+    f.seek(bloc['offset'])
+    contenu = _decompresseur(index['codec'])(f.read(bloc['taille']))
+    n = bloc['n_atomes']
+
+    def tranche(nom):
+        noms = list(bloc['tableaux'])
+        debut = bloc['tableaux'][nom][2]
+        suivant = noms.index(nom) + 1
+        fin = bloc['tableaux'][noms[suivant]][2] if suivant < len(noms) else len(contenu)
+        return contenu[debut:fin]
+
+    lignes = np.cumsum(_demelanger(tranche('lignes'), n))
+    coords = np.cumsum(_demelanger(tranche('coords'), 3 * n).reshape(n, 3), axis=0)
+    zeros_negatifs = np.frombuffer(tranche('zeros_negatifs'), dtype='<i4')
+    colonnes = {}
+    for nom, (dtype, shape, _) in bloc['tableaux'].items():
+        if nom.endswith(".codes"):
+            base = nom[:-len(".codes")]
+            codes = np.frombuffer(tranche(nom), dtype=dtype)
+            brut = tranche(f"{base}.valeurs")
+            valeurs = np.array(brut.split(b"\n") if shape[0] else [], dtype=bytes)
+            colonnes[base] = (codes, valeurs)
+    return lignes, coords, zeros_negatifs, colonnes
+
+
+def _lire_brut(index, pdb_id, groupes):
+    """
+    Atomes des groupes demandés, dans l'ordre du fichier d'origine :
+    (coordonnées entières (n, 3), masque des "-0.000" (n, 3), colonnes brutes nom -> (codes, valeurs))
+    """
+    with open(index['chemin'], 'rb') as f:
+        blocs = [_lire_bloc(f, index, pdb_id, nom_groupe) for nom_groupe in groupes]
+    lignes = np.concatenate([bloc[0] for bloc in blocs])
+    ordre = np.argsort(lignes, kind='stable')
+    coords = np.concatenate([bloc[1] for bloc in blocs])
+    negatifs = np.zeros(coords.size, dtype=bool)
+    debut = 0
+    for _, coords_bloc, zeros_negatifs, _ in blocs:
+        negatifs[debut + zeros_negatifs] = True
+        debut += coords_bloc.size
+    colonnes = {}
+    for nom in blocs[0][3]:
+        # catégories de chaque bloc fusionnées sur les valeurs distinctes de l'ensemble
+        valeurs = np.unique(np.concatenate([bloc[3][nom][1] for bloc in blocs]))
+        codes = np.concatenate([np.searchsorted(valeurs, valeurs_bloc)[codes_bloc]
+                                for codes_bloc, valeurs_bloc in (bloc[3][nom] for bloc in blocs)])
+        dtype = np.uint8 if len(valeurs) < 256 else np.int32
+        colonnes[nom] = (codes[ordre].astype(dtype), valeurs)
+    return coords[ordre], negatifs.reshape(-1, 3)[ordre], colonnes
+
+
+def lire_structure(index, pdb_id, groupes=GROUPES):
+    """
+    Structure `pdb_id` de l'archive au même format que lecture_cif.lire_atom_site.
+    groupes : blocs à décompresser (CA, LIGANDS, AUTRES), les autres ne sont pas lus.
+    """
+    coords, _, colonnes = _lire_brut(index, pdb_id, groupes)
+    structure = {'coords': (coords / index['echelle']).astype(np.float32)}
+    for nom, (codes, valeurs) in colonnes.items():
+        if nom in COLONNES_FLOAT:
+            structure[nom] = _nombres(valeurs, np.float32, 'nan')[codes]
+        elif nom in COLONNES_INT:
+            structure[nom] = _nombres(valeurs, np.int32, MANQUANT)[codes]
+        else:
+            # guillemets retirés comme dans lecture_cif
+            texte = np.char.strip(valeurs.astype(str), "'\"") if len(valeurs) else valeurs.astype(str)
+            structure[nom] = Categorie(codes, texte)
+    return structure
+
+
+def lire_ensemble(index, groupes=(CA,)):
+    """PDB ID -> structure pour toutes les entrées, en ne lisant que les blocs `groupes`"""
+    return {pdb_id: lire_structure(index, pdb_id, groupes) for pdb_id in index['structures']}
+
+
+def exporter_cif(index, pdb_id, destination):
+    """Réécrit le fichier mmCIF d'origine de `pdb_id` (pour PyMOL). Renvoie le nombre d'atomes."""
+    entree = index['structures'][pdb_id]
+    noms = entree['colonnes']
+    coords, negatifs, colonnes = _lire_brut(index, pdb_id, GROUPES)
+    echelle = index['echelle']
+    decimales = len(str(echelle)) - 1
+    texte_coords = np.char.mod(f"%.{decimales}f", coords / echelle).astype(bytes).astype(object)
+    texte_coords[negatifs] = b"-" + texte_coords[negatifs]
+
+    tokens = np.empty((len(coords), len(noms)), dtype=object)
+    for j, nom in enumerate(noms):
+        if nom in COLONNES_COORDS:
+            tokens[:, j] = texte_coords[:, COLONNES_COORDS.index(nom)]
+        else:
+            codes, valeurs = colonnes[nom]
+            tokens[:, j] = valeurs[codes]
+
+    with open(destination, 'wb') as f:
+        f.write(entree['entete'].encode())
+        f.write(b"loop_\n")
+        f.writelines(f"_atom_site.{nom}\n".encode() for nom in noms)
+        f.writelines(_ligne(ligne, entree['disposition']) for ligne in tokens)
+        f.write(entree['fin'].encode())
+    return len(coords)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Archive compressée de l'ensemble des structures superposées")
+    commandes = parser.add_subparsers(dest="commande", required=True)
+    creer = commandes.add_parser("creer", help="créer l'archive depuis un dossier ou des fichiers mmCIF")
+    creer.add_argument("sources", nargs="+", help="dossier (fichiers *_aligned.cif) ou fichiers mmCIF")
+    creer.add_argument("-o", "--archive", default="../Super" + EXTENSION, help="archive à créer")
+    creer.add_argument("--codec", choices=["zlib", "zstd"], default=None,
+                       help="compression (zstd si le module zstandard est installé)")
+    lister = commandes.add_parser("lister", help="structures contenues dans l'archive")
+    lister.add_argument("archive")
+    extraire = commandes.add_parser("extraire", help="réécrire des fichiers mmCIF pour PyMOL")
+    extraire.add_argument("archive")
+    extraire.add_argument("--entrees", nargs="*", default=None, help="PDB ID à extraire (toutes par défaut)")
+    extraire.add_argument("--sortie", default=".", help="dossier des fichiers extraits")
+    args = parser.parse_args()
+
+    if args.commande == "creer":
+        chemins = []
+        for source in args.sources:
+            if os.path.isdir(source):
+                chemins.extend(sorted(glob.glob(os.path.join(source, "*_aligned.cif"))))
+            else:
+                chemins.append(source)
+        debut = time.perf_counter()
+        creer_archive(chemins, args.archive, codec=args.codec)
+        taille_source = sum(os.path.getsize(c) for c in chemins)
+        taille = os.path.getsize(args.archive)
+        print(f"🕺🏻 {len(chemins)} structures : {taille_source / 1e6:.1f} Mo -> {taille / 1e6:.1f} Mo "
+              f"({args.archive}, {time.perf_counter() - debut:.1f} s)")
+
+    elif args.commande == "lister":
+        index = ouvrir_archive(args.archive)
+        print(f"{'PDB ID':<8} {'Atomes':>8} {'CA':>6} {'Ligands':>8}  Fichier")
+        for pdb_id, entree in index['structures'].items():
+            blocs = entree['blocs']
+            print(f"{pdb_id:<8} {entree['n_atomes']:>8} {blocs[CA]['n_atomes']:>6} "
+                  f"{blocs[LIGANDS]['n_atomes']:>8}  {entree['fichier']}")
+        print(f"🕺🏻 {len(index['structures'])} structures ({index['codec']})")
+
+    else:
+        index = ouvrir_archive(args.archive)
+        entrees = args.entrees if args.entrees is not None else list(index['structures'])
+        os.makedirs(args.sortie, exist_ok=True)
+        for pdb_id in entrees:
+            if pdb_id not in index['structures']:
+                print(f"🙈 {pdb_id} absent de l'archive")
+                continue
+            destination = os.path.join(args.sortie, index['structures'][pdb_id]['fichier'])
+            n = exporter_cif(index, pdb_id, destination)
+            print(f"✨ {destination} : {n} atomes")
+
+
+if __name__ == "__main__":
+    main()
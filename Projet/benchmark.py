@@ -0,0 +1,400 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Banc d'essai de la chaîne de superposition sur des ensembles synthétiques (hors ligne, sans PyMOL)
+
+Les structures synthétiques sont fabriquées à partir des C-alpha déjà superposés de Super/
+(chaîne de superposition_results.csv) :
+    - chaque structure reprend la trace d'une structure source, renumérotée (décalage aléatoire)
+    - ses C-alpha sont déplacés d'un bruit gaussien de σ fixe par coordonnée (--sigma, générateur
+      à graine), indépendant de toute superposition, puis la trace entière subit un déplacement
+      rigide aléatoire
+
+Étapes chronométrées (mesures.py), pour chaque taille d'ensemble, sur le chemin du pipeline
+sans PyMOL contre le lobe C de la vraie référence (--reference, 4WB8:A:127-350 par défaut) :
+    lecture         : lire_atom_site + residus_ca de chaque fichier mmCIF synthétique
+    correspondance  : superposition.paires_residus (alignement de séquence, cache vide au départ)
+    superposition   : kabsch.superposer_lot par lots sur les paires, 10 cycles, cutoff 2.0
+    ecriture        : fichiers _aligned.cif et lignes de superposition_results.csv
+    rapport         : not_submit/generate_report.py sur les résultats synthétiques
+
+Vérifications, par rapport à la source non bruitée superposée par les mêmes fonctions
+(paires_residus + kabsch.superposer) :
+    - paires : mêmes résidus de la référence, résidus de la cible décalés de la renumérotation
+    - RMSD : |RMSD synthétique - RMSD de la source| <= RMS du bruit sur les paires + TOLERANCE
+      (inégalité triangulaire, exacte à atomes gardés égaux ; TOLERANCE couvre l'écriture au millième)
+Avec la référence de superposition_results.csv (4WB8), l'écart médian entre le RMSD de Kabsch
+des sources et le RMSD cmd.align du fichier est aussi rapporté (information, pas un contrôle).
+
+Chaque exécution ajoute un enregistrement (version git, paramètres, temps par étape,
+vérifications) à benchmark_resultats.jsonl pour suivre les régressions d'une version à l'autre.
+
+Usage (hors PyMOL, depuis le dossier Projet/) :
+    python3 benchmark.py --tailles 10 100 1000
+    python3 benchmark.py --tailles 100000 --lot 2000
+"""
+
+import argparse
+import contextlib
+import csv
+import io
+import json
+import os
+import platform
+import resource
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+import kabsch
+import mesures
+from lecture_cif import lire_atom_site, residus_ca
+from multi_references import REFERENCES, lire_reference, nom_reference
+from superposition import RESULTS_FIELDS, coordonnees_residus, paires_residus, statut_rmsd
+from telechargement import nom_assemblage
+
+TAILLES = [10, 100, 1000]
+# structures générées, lues et écrites à la fois (espace disque borné)
+LOT = 1000
+# paramètres de cmd.align dans open_pdb_csv.py
+CYCLES = 10
+CUTOFF = 2.0
+# bruit gaussien par coordonnée (Å)
+SIGMA = 0.3
+# marge ajoutée au RMS du bruit dans la comparaison des RMSD (Å) ; les coordonnées sont écrites au millième
+TOLERANCE = 0.01
+# référence de superposition_results.csv (RMSD cmd.align comparables)
+REFERENCE = REFERENCES[0]
+RESULTATS = "benchmark_resultats.jsonl"
+ETAPES = ["lecture", "correspondance", "superposition", "ecriture", "rapport"]
+
+COLONNES_CIF = ['group_PDB', 'id', 'type_symbol', 'label_atom_id', 'label_comp_id', 'label_asym_id',
+                'label_seq_id', 'Cartn_x', 'Cartn_y', 'Cartn_z', 'occupancy', 'B_iso_or_equiv',
+                'auth_asym_id', 'pdbx_PDB_model_num']
+
+
+def charger_reference(reference=REFERENCE, dossier="."):
+    """C-alpha (numéros, noms, coordonnées) de la chaîne de la référence (fichier <PDB>-assembly1.cif)"""
+    chemin = os.path.join(dossier, nom_assemblage(reference[0], 1))
+    return residus_ca(lire_atom_site(chemin, ca_seulement=True, chaines=[reference[1]]), reference[1])
+
+
+def charger_sources(ca_ref, reference=REFERENCE, results_csv="superposition_results.csv", dossier="../Super",
+                    cache_dir=None):
+    """
+    C-alpha des structures superposées ayant un RMSD cmd.align valide, appariées à la référence
+    et superposées dessus sans bruit (paires_residus + kabsch.superposer, mêmes cycles et cutoff).
+    Renvoie une liste de dictionnaires (pdb_id, chaine, rmsd_align, numeros, noms, coords,
+    paires, lignes, rmsd).
+    """
+    sources = []
+    with open(results_csv, newline='') as f:
+        for row in csv.DictReader(f):
+            if row['Status'] == 'ERROR' or row['RMSD'] in ('', 'N/A'):
+                continue
+            chemin = os.path.join(dossier, f"{row['PDB_ID']}_aligned.cif")
+            if not os.path.exists(chemin):
+                continue
+            structure = lire_atom_site(chemin, ca_seulement=True, chaines=[row['Chain']])
+            numeros, noms, coords = residus_ca(structure, row['Chain'])
+            garder = ~np.isnan(coords).any(axis=1)
+            ca = (numeros[garder], noms[garder], coords[garder].astype(np.float64))
+            paires = paires_residus(ca, ca_ref, reference[2], reference[3], cache_dir=cache_dir)
+            if len(paires[0]) < kabsch.MIN_ATOMES:
+                continue
+            rmsd, _, _ = kabsch.superposer(coordonnees_residus(ca, paires[0]), coordonnees_residus(ca_ref, paires[1]),
+                                           cycles=CYCLES, cutoff=CUTOFF)
+            sources.append({
+                'pdb_id': row['PDB_ID'],
+                'chaine': row['Chain'],
+                'rmsd_align': float(row['RMSD']),
+                'numeros': ca[0],
+                'noms': ca[1],
+                'coords': ca[2],
+                'paires': paires,
+                'lignes': np.searchsorted(ca[0], paires[0]),
+                'rmsd': float(rmsd),
+            })
+    return sources
+
+
+def rotation_aleatoire(rng):
+    """Rotation uniforme (décomposition QR d'une matrice gaussienne)"""
+    q, r = np.linalg.qr(rng.normal(size=(3, 3)))
+    q *= np.sign(np.diag(r))
+    if np.linalg.det(q) < 0:
+        q[:, 0] = -q[:, 0]
+    return q
+
+
+def ecrire_ca(chemin, nom, numeros, noms, coords, chaine):
+    """Fichier mmCIF minimal (C-alpha seulement) lisible par lire_atom_site et PyMOL"""
+    lignes = [f"data_{nom}", "#", "loop_"]
+    lignes += [f"_atom_site.{colonne}" for colonne in COLONNES_CIF]
+    for i, (numero, residu, (x, y, z)) in enumerate(zip(numeros, noms, coords), start=1):
+        lignes.append(f"ATOM {i} C CA {residu} {chaine} {numero} {x:.3f} {y:.3f} {z:.3f} 1.00 0.00 {chaine} 1")
+    lignes.append("#")
+    with open(chemin, 'w') as f:
+        f.write("\n".join(lignes) + "\n")
+
+
+def generer(sources, debut, fin, dossier, rng, sigma=SIGMA):
+    """
+    Écrit les structures synthétiques debut..fin-1 dans `dossier`.
+    Renvoie la liste des (nom, index de la source, décalage de numérotation, RMS du bruit sur les paires).
+    """
+    generees = []
+    for k in range(debut, fin):
+        i = k % len(sources)
+        source = sources[i]
+        decalage = int(rng.integers(1 - source['numeros'].min(), 3000))
+        bruit = rng.normal(scale=sigma, size=source['coords'].shape)
+        rms_bruit = float(np.sqrt((bruit[source['lignes']] ** 2).sum(axis=1).mean()))
+        coords = (source['coords'] + bruit) @ rotation_aleatoire(rng).T + rng.uniform(-50, 50, size=3)
+        nom = f"S{k:06d}"
+        ecrire_ca(os.path.join(dossier, f"{nom}.cif"), nom, source['numeros'] + decalage,
+                  source['noms'], coords, source['chaine'])
+        generees.append((nom, i, decalage, rms_bruit))
+    return generees
+
+
+def traiter_lot(sources, ca_ref, reference, generees, dossier, writer, cache_dir, verification):
+    """Lecture, correspondance, superposition sur la référence et écriture d'un lot de structures synthétiques"""
+    with mesures.etape("lecture"):
+        ca = []
+        for nom, i, _, _ in generees:
+            chaine = sources[i]['chaine']
+            structure = lire_atom_site(os.path.join(dossier, f"{nom}.cif"), ca_seulement=True)
+            ca.append(residus_ca(structure, chaine))
+
+    with mesures.etape("correspondance"):
+        paires = []
+        for (nom, i, decalage, _), ca_cible in zip(generees, ca):
+            residus_cible, residus_ref = paires_residus(ca_cible, ca_ref, reference[2], reference[3],
+                                                        cache_dir=cache_dir)
+            attendues = sources[i]['paires']
+            if (not np.array_equal(residus_ref, attendues[1])
+                    or not np.array_equal(residus_cible, attendues[0] + decalage)):
+                verification['correspondances_fausses'].append(nom)
+            paires.append((residus_cible, residus_ref))
+
+    with mesures.etape("superposition"):
+        n_max = max(len(residus_cible) for residus_cible, _ in paires)
+        mobiles = np.zeros((len(generees), n_max, 3))
+        cibles = np.zeros((len(generees), n_max, 3))
+        masques = np.zeros((len(generees), n_max), dtype=bool)
+        for b, (ca_cible, (residus_cible, residus_ref)) in enumerate(zip(ca, paires)):
+            n = len(residus_cible)
+            mobiles[b, :n] = coordonnees_residus(ca_cible, residus_cible)
+            cibles[b, :n] = coordonnees_residus(ca_ref, residus_ref)
+            masques[b, :n] = True
+        rmsd, n_atomes, transformations = kabsch.superposer_lot(mobiles, cibles, masques,
+                                                                cycles=CYCLES, cutoff=CUTOFF)
+
+    with mesures.etape("ecriture"):
+        for b, ((nom, i, _, _), ca_cible) in enumerate(zip(generees, ca)):
+            source = sources[i]
+            numeros, noms, coords = ca_cible
+            ecrire_ca(os.path.join(dossier, f"{nom}_aligned.cif"), nom, numeros, noms,
+                      kabsch.appliquer(transformations[b], coords), source['chaine'])
+            writer.writerow({
+                'PDB_ID': nom,
+                'Chain': source['chaine'],
+                'N_CA_aligned': int(n_atomes[b]),
+                'RMSD': f"{rmsd[b]:.2f}",
+                'Status': statut_rmsd(rmsd[b]),
+            })
+
+    # inégalité triangulaire : le bruit ne peut pas déplacer le RMSD optimal de plus que son RMS
+    ecarts = np.abs(rmsd - [sources[i]['rmsd'] for _, i, _, _ in generees])
+    bornes = np.array([rms_bruit for _, _, _, rms_bruit in generees]) + TOLERANCE
+    verification['ecart_rmsd_max'] = max(verification['ecart_rmsd_max'], float(ecarts.max()))
+    verification['marge_min'] = min(verification['marge_min'], float((bornes - ecarts).min()))
+    verification['hors_tolerance'] += [nom for (nom, _, _, _), e, borne in zip(generees, ecarts, bornes)
+                                       if not e <= borne]
+
+
+def generer_rapport(dossier):
+    """generate_report() de not_submit/ sur le superposition_results.csv du dossier de travail"""
+    sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "not_submit"))
+    from generate_report import generate_report
+
+    with contextlib.redirect_stdout(io.StringIO()):
+        generate_report(os.path.join(dossier, "superposition_results.csv"),
+                        os.path.join(dossier, "rapport_resultats.md"))
+
+
+def mesurer_taille(sources, ca_ref, reference, taille, lot, dossier, rng, sigma=SIGMA, verbose=True):
+    """Génère et traite `taille` structures synthétiques ; renvoie le bilan de cette taille"""
+    verification = {'ecart_rmsd_max': 0.0, 'marge_min': np.inf, 'hors_tolerance': [],
+                    'correspondances_fausses': []}
+    travail = os.path.join(dossier, f"n{taille}")
+    os.makedirs(travail)
+    cache_dir = os.path.join(travail, "correspondances")
+    mesures.a_envoyer()
+    generation = 0.0
+
+    with mesures.entree(f"n={taille}"):
+        with open(os.path.join(travail, "superposition_results.csv"), 'w', newline='') as f:
+            writer = csv.DictWriter(f, fieldnames=RESULTS_FIELDS)
+            writer.writeheader()
+            for debut in range(0, taille, lot):
+                # la génération n'est pas comptée dans les étapes du pipeline
+                t0 = time.perf_counter()
+                generees = generer(sources, debut, min(debut + lot, taille), travail, rng, sigma)
+                generation += time.perf_counter() - t0
+
+                traiter_lot(sources, ca_ref, reference, generees, travail, writer, cache_dir, verification)
+                for nom, _, _, _ in generees:
+                    os.remove(os.path.join(travail, f"{nom}.cif"))
+                    os.remove(os.path.join(travail, f"{nom}_aligned.cif"))
+                if verbose and taille > lot:
+                    print(f"   {min(debut + lot, taille)}/{taille}", end="\r", flush=True)
+
+        with mesures.etape("rapport"):
+            generer_rapport(travail)
+
+    etapes = {}
+    total = None
+    for releve in mesures.a_envoyer():
+        if releve['etape'] == mesures.TOTAL:
+            total = releve
+            continue
+        cumul = etapes.setdefault(releve['etape'], {'temps_s': 0.0, 'cpu_s': 0.0})
+        cumul['temps_s'] += releve['temps_s']
+        cumul['cpu_s'] += releve['cpu_s']
+    for cumul in etapes.values():
+        cumul['temps_s'] = round(cumul['temps_s'], 6)
+        cumul['cpu_s'] = round(cumul['cpu_s'], 6)
+        cumul['us_par_structure'] = round(cumul['temps_s'] / taille * 1e6, 1)
+    pipeline = sum(etapes[nom]['temps_s'] for nom in ETAPES)
+    shutil.rmtree(travail)
+
+    verification['ecart_rmsd_max'] = round(verification['ecart_rmsd_max'], 6)
+    verification['marge_min'] = round(verification['marge_min'], 6)
+    verification['ok'] = not (verification['hors_tolerance'] or verification['correspondances_fausses'])
+    # seulement les premiers noms en cause, pour garder le fichier lisible
+    for cle in ('hors_tolerance', 'correspondances_fausses'):
+        verification[f"n_{cle}"] = len(verification[cle])
+        verification[cle] = verification[cle][:10]
+    return {
+        'taille': taille,
+        'etapes': etapes,
+        'pipeline_s': round(pipeline, 6),
+        'structures_par_s': round(taille / pipeline, 1) if pipeline else None,
+        'generation_s': round(generation, 6),
+        'total_s': total['temps_s'] if total else None,
+        'rss_max_ko': resource.getrusage(resource.RUSAGE_SELF).ru_maxrss,
+        'verification': verification,
+    }
+
+
+def version_git():
+    """Commit courant (suffixe -modifie si l'arbre a des changements), None hors dépôt git"""
+    dossier = os.path.dirname(os.path.abspath(__file__))
+    try:
+        commit = subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=dossier,
+                                capture_output=True, text=True, check=True).stdout.strip()
+        modifie = subprocess.run(["git", "status", "--porcelain", "--untracked-files=no"], cwd=dossier,
+                                 capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+    return f"{commit}-modifie" if modifie else commit
+
+
+def lire_resultats(chemin):
+    """Enregistrements précédents du fichier de résultats"""
+    if not os.path.exists(chemin):
+        return []
+    with open(chemin) as f:
+        return [json.loads(ligne) for ligne in f if ligne.strip()]
+
+
+def afficher(bilans, precedent=None):
+    """Temps par structure de chaque étape, et rapport au dernier enregistrement pour la même taille"""
+    anciens = {b['taille']: b for b in precedent['resultats']} if precedent else {}
+    print(f"\n{'Taille':>8} " + " ".join(f"{nom[:14]:>14}" for nom in ETAPES) + f" {'struct/s':>10}  Vérif.")
+    print("-" * (8 + 15 * len(ETAPES) + 20))
+    for bilan in bilans:
+        colonnes = " ".join(f"{bilan['etapes'][nom]['us_par_structure']:>11.0f} µs" for nom in ETAPES)
+        ok = "✨ ok" if bilan['verification']['ok'] else "🙈 ÉCHEC"
+        print(f"{bilan['taille']:>8} {colonnes} {bilan['structures_par_s']:>10.0f}  {ok}")
+        ancien = anciens.get(bilan['taille'])
+        if ancien and ancien.get('structures_par_s'):
+            rapport = bilan['structures_par_s'] / ancien['structures_par_s']
+            print(f"{'':>8} débit x{rapport:.2f} par rapport à {precedent['version']} ({precedent['date']})")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Banc d'essai de la superposition sur des ensembles synthétiques")
+    parser.add_argument("--tailles", type=int, nargs="+", default=TAILLES,
+                        help=f"nombres de structures synthétiques (défaut : {' '.join(map(str, TAILLES))})")
+    parser.add_argument("--lot", type=int, default=LOT, help=f"structures traitées à la fois (défaut : {LOT})")
+    parser.add_argument("--resultats", default="superposition_results.csv",
+                        help="RMSD cmd.align des structures sources")
+    parser.add_argument("--super", default="../Super", help="dossier des structures superposées")
+    parser.add_argument("--reference", type=lire_reference, default=REFERENCE, metavar="PDB:CHAÎNE:DÉBUT-FIN",
+                        help=f"référence et son lobe C (défaut : {REFERENCE[0]}:{REFERENCE[1]}:"
+                             f"{REFERENCE[2]}-{REFERENCE[3]})")
+    parser.add_argument("--dossier-reference", default=".", help="dossier du fichier <PDB>-assembly1.cif de la référence")
+    parser.add_argument("--sigma", type=float, default=SIGMA, help=f"bruit par coordonnée en Å (défaut : {SIGMA})")
+    parser.add_argument("--sortie", default=RESULTATS, help=f"fichier des résultats (défaut : {RESULTATS})")
+    parser.add_argument("--graine", type=int, default=0, help="graine du générateur aléatoire")
+    parser.add_argument("--travail", default=None, help="dossier de travail (défaut : dossier temporaire)")
+    args = parser.parse_args()
+
+    try:
+        ca_ref = charger_reference(args.reference, args.dossier_reference)
+    except (OSError, ValueError) as e:
+        print(f"🙈 erreur : référence {nom_reference(args.reference)} illisible : {e}")
+        sys.exit(1)
+    dossier = tempfile.mkdtemp(prefix="benchmark_", dir=args.travail)
+    sources = charger_sources(ca_ref, args.reference, args.resultats, args.super,
+                              os.path.join(dossier, "correspondances_sources"))
+    if not sources:
+        shutil.rmtree(dossier, ignore_errors=True)
+        print(f"🙈 erreur : aucune structure source ({args.resultats}, {args.super})")
+        sys.exit(1)
+    print(f"🕺🏻 {len(sources)} structures sources, référence {nom_reference(args.reference)} "
+          f"(lobe C {args.reference[2]}-{args.reference[3]}), tailles {', '.join(map(str, args.tailles))}")
+    if args.reference[0] == REFERENCE[0]:
+        ecart = np.median([abs(source['rmsd'] - source['rmsd_align']) for source in sources])
+        print(f"   écart médian Kabsch / cmd.align sur les sources : {ecart:.3f} Å")
+
+    rng = np.random.default_rng(args.graine)
+    mesures.activer(memoire=False)
+    try:
+        bilans = [mesurer_taille(sources, ca_ref, args.reference, taille, args.lot, dossier, rng, args.sigma)
+                  for taille in args.tailles]
+    finally:
+        shutil.rmtree(dossier, ignore_errors=True)
+        mesures.terminer()
+
+    enregistrement = {
+        'date': time.strftime("%Y-%m-%dT%H:%M:%S"),
+        'version': version_git(),
+        'python': platform.python_version(),
+        'numpy': np.__version__,
+        'machine': platform.machine(),
+        'cpus': os.cpu_count(),
+        'parametres': {'lot': args.lot, 'cycles': CYCLES, 'cutoff': CUTOFF, 'sigma': args.sigma,
+                       'tolerance': TOLERANCE, 'graine': args.graine, 'sources': len(sources),
+                       'reference': list(args.reference)},
+        'resultats': bilans,
+    }
+    precedents = lire_resultats(args.sortie)
+    afficher(bilans, precedents[-1] if precedents else None)
+    with open(args.sortie, 'a') as f:
+        f.write(json.dumps(enregistrement) + "\n")
+    print(f"\n✨ Résultats ajoutés à {args.sortie}")
+
+    if not all(bilan['verification']['ok'] for bilan in bilans):
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,214 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Cache binaire des structures lues par lecture_cif.py
+Chaque structure est stockée dans un fichier <sha256 du mmCIF>.pkc :
+    - 8 octets : signature PKCOORD1
+    - 8 octets : taille de l'en-tête JSON
+    - en-tête JSON (source, options, dtype/shape/offset de chaque tableau)
+    - les tableaux bruts, alignés sur 64 octets, ouverts avec np.memmap
+La clé étant le contenu du fichier source, un mmCIF modifié n'utilise jamais
+un ancien cache. Le dossier est limité en taille (éviction LRU).
+
+Usage (hors PyMOL) :
+    python3 cache_coordonnees.py 4WB8-assembly1.cif 2XB7-assembly1.cif   # remplir le cache
+    python3 cache_coordonnees.py --nettoyer                               # appliquer la taille max
+"""
+
+import hashlib
+import json
+import os
+import struct
+import sys
+import tempfile
+
+import numpy as np
+
+from lecture_cif import Categorie, lire_atom_site
+
+# dossier partagé du cache (modifiable par la variable d'environnement PK_CACHE_DIR)
+CACHE_DIR = os.environ.get("PK_CACHE_DIR", os.path.expanduser("~/.cache/pk_analysis/coordonnees"))
+# taille maximale du dossier avant éviction des fichiers les moins récemment utilisés
+TAILLE_MAX = 2 * 1024 ** 3
+# le dossier n'est parcouru qu'à la première écriture du processus, puis chaque fois que
+# les écritures dépassent cette fraction de taille_max
+FRACTION_NETTOYAGE = 0.05
+
+SIGNATURE = b"PKCOORD1"
+ALIGNEMENT = 64
+EXTENSION = ".pkc"
+
+# octets écrits par ce processus depuis le dernier nettoyage, par dossier de cache
+_ecrits = {}
+
+
+def cle_fichier(chemin):
+    """SHA-256 du contenu d'un fichier"""
+    h = hashlib.sha256()
+    with open(chemin, 'rb') as f:
+        for bloc in iter(lambda: f.read(1 << 20), b''):
+            h.update(bloc)
+    return h.hexdigest()
+
+
+def _nom_cache(cle, ca_seulement, chaines):
+    """Nom du fichier de cache : une variante par jeu d'options de lecture"""
+    nom = cle
+    if ca_seulement:
+        nom += ".ca"
+    if chaines:
+        nom += "." + "-".join(chaines)
+    return nom + EXTENSION
+
+
+def ecrire_cache(chemin_cache, structure, meta=None):
+    """Écrit une structure (dictionnaire de lecture_cif) dans un fichier binaire"""
+    tableaux = {}
+    for nom, colonne in structure.items():
+        if isinstance(colonne, Categorie):
+            tableaux[f"{nom}.codes"] = np.ascontiguousarray(colonne.codes)
+            tableaux[f"{nom}.valeurs"] = np.ascontiguousarray(colonne.valeurs)
+        else:
+            tableaux[nom] = np.ascontiguousarray(colonne)
+
+    # calcul des positions de chaque tableau après l'en-tête
+    description = {}
+    offset = 0
+    for nom, tableau in tableaux.items():
+        description[nom] = {'dtype': tableau.dtype.str, 'shape': list(tableau.shape), 'offset': offset}
+        offset += -(-tableau.nbytes // ALIGNEMENT) * ALIGNEMENT
+    entete = json.dumps({'meta': meta or {}, 'tableaux': description}).encode()
+    debut_donnees = -(-(len(SIGNATURE) + 8 + len(entete)) // ALIGNEMENT) * ALIGNEMENT
+
+    # écriture dans un fichier temporaire puis renommage : pas de fichier à moitié écrit
+    # si plusieurs processus remplissent le même cache
+    dossier = os.path.dirname(chemin_cache) or "."
+    fd, temporaire = tempfile.mkstemp(dir=dossier, suffix=".tmp")
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            f.write(SIGNATURE)
+            f.write(struct.pack('<Q', len(entete)))
+            f.write(entete)
+            for nom, tableau in tableaux.items():
+                f.seek(debut_donnees + description[nom]['offset'])
+                f.write(tableau.tobytes())
+            f.truncate(debut_donnees + offset)
+        # lisible par les autres utilisateurs du dossier partagé
+        os.chmod(temporaire, 0o644)
+        os.replace(temporaire, chemin_cache)
+    except BaseException:
+        os.unlink(temporaire)
+        raise
+
+
+def ouvrir_cache(chemin_cache):
+    """
+    Ouvre un fichier de cache sans le lire en entier (tableaux en np.memmap).
+    Renvoie (structure, meta).
+    """
+    with open(chemin_cache, 'rb') as f:
+        if f.read(len(SIGNATURE)) != SIGNATURE:
+            raise ValueError(f"{chemin_cache} n'est pas un fichier de cache valide")
+        taille = struct.unpack('<Q', f.read(8))[0]
+        entete = json.loads(f.read(taille))
+    debut_donnees = -(-(len(SIGNATURE) + 8 + taille) // ALIGNEMENT) * ALIGNEMENT
+
+    tableaux = {}
+    for nom, d in entete['tableaux'].items():
+        shape = tuple(d['shape'])
+        if int(np.prod(shape)) == 0:
+            tableaux[nom] = np.zeros(shape, dtype=d['dtype'])
+        else:
+            tableaux[nom] = np.memmap(chemin_cache, dtype=d['dtype'], mode='r',
+                                      offset=debut_donnees + d['offset'], shape=shape)
+
+    structure = {}
+    for nom, tableau in tableaux.items():
+        if nom.endswith(".valeurs"):
+            continue
+        if nom.endswith(".codes"):
+            base = nom[:-len(".codes")]
+            structure[base] = Categorie(tableau, np.asarray(tableaux[f"{base}.valeurs"]))
+        else:
+            structure[nom] = tableau
+    return structure, entete['meta']
+
+
+def nettoyer_cache(cache_dir=CACHE_DIR, taille_max=TAILLE_MAX):
+    """Supprime les fichiers les moins récemment utilisés jusqu'à passer sous taille_max"""
+    if not os.path.isdir(cache_dir):
+        return 0
+    fichiers = []
+    for nom in os.listdir(cache_dir):
+        if nom.endswith(EXTENSION):
+            chemin = os.path.join(cache_dir, nom)
+            try:
+                info = os.stat(chemin)
+            except FileNotFoundError:
+                continue
+            fichiers.append((info.st_mtime, info.st_size, chemin))
+
+    total = sum(taille for _, taille, _ in fichiers)
+    supprimes = 0
+    for _, taille, chemin in sorted(fichiers):
+        if total <= taille_max:
+            break
+        try:
+            os.unlink(chemin)
+        except FileNotFoundError:
+            pass
+        total -= taille
+        supprimes += 1
+    return supprimes
+
+
+def charger_coordonnees(chemin, cache_dir=CACHE_DIR, taille_max=TAILLE_MAX,
+                        ca_seulement=False, chaines=None):
+    """
+    Renvoie la structure du fichier mmCIF `chemin` (même format que lecture_cif.lire_atom_site),
+    depuis le cache si le même contenu a déjà été lu, sinon en le lisant et en le mettant en cache.
+    """
+    os.makedirs(cache_dir, exist_ok=True)
+    cle = cle_fichier(chemin)
+    chemin_cache = os.path.join(cache_dir, _nom_cache(cle, ca_seulement, chaines))
+
+    if os.path.exists(chemin_cache):
+        try:
+            structure, _ = ouvrir_cache(chemin_cache)
+        except (ValueError, OSError):
+            structure = None
+        if structure is not None:
+            # la date de modification sert d'horodatage LRU (cache en lecture seule : ignorée)
+            try:
+                os.utime(chemin_cache)
+            except OSError:
+                pass
+            return structure
+
+    structure = lire_atom_site(chemin, ca_seulement=ca_seulement, chaines=chaines)
+    ecrire_cache(chemin_cache, structure, meta={
+        'source': os.path.basename(chemin),
+        'sha256': cle,
+        'ca_seulement': ca_seulement,
+        'chaines': list(chaines) if chaines else None,
+    })
+    try:
+        ecrit = os.path.getsize(chemin_cache)
+    except OSError:
+        ecrit = 0
+    if cache_dir not in _ecrits or _ecrits[cache_dir] + ecrit >= taille_max * FRACTION_NETTOYAGE:
+        nettoyer_cache(cache_dir, taille_max)
+        _ecrits[cache_dir] = 0
+    else:
+        _ecrits[cache_dir] += ecrit
+    return structure
+
+
+if __name__ == "__main__":
+    if "--nettoyer" in sys.argv:
+        n = nettoyer_cache()
+        print(f"🕺🏻 {n} fichiers supprimés du cache {CACHE_DIR}")
+    else:
+        for chemin in sys.argv[1:]:
+            structure = charger_coordonnees(chemin)
+            print(f"🕺🏻 {chemin} : {len(structure['coords'])} atomes en cache")
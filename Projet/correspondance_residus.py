@@ -0,0 +1,231 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Correspondance des résidus entre une chaîne ALK et la référence PKACA (4WB8 chaîne A)
+La numérotation d'ALK (~1095-1400) ne correspond pas à celle de PKACA (127-350) :
+on aligne les deux séquences une fois (programmation dynamique vectorisée NumPy,
+BLOSUM62, pénalités affines, extrémités libres) et on garde les paires de résidus
+qui tombent dans le lobe C de la référence.
+
+Le résultat est mis en cache par couple de séquences (SHA-256) : les structures
+d'une même construction ALK réutilisent le même alignement.
+
+Usage (hors PyMOL) :
+    python3 correspondance_residus.py ../Super/2XB7_aligned.cif A 4WB8-assembly1.cif A
+"""
+
+import hashlib
+import os
+import sys
+
+import numpy as np
+
+# dossier du cache des correspondances (modifiable par la variable PK_CORRESPONDANCE_DIR)
+CORRESPONDANCE_DIR = os.environ.get("PK_CORRESPONDANCE_DIR",
+                                    os.path.expanduser("~/.cache/pk_analysis/correspondances"))
+
+# pénalités de gap : un gap de k résidus coûte OUVERTURE_GAP + (k-1)·EXTENSION_GAP, soit 11 pour
+# un résidu (BLAST avec BLOSUM62, existence 11 / extension 1, compte 11 + k·1, soit 12)
+OUVERTURE_GAP = 11
+EXTENSION_GAP = 1
+
+TROIS_LETTRES = {
+    'ALA': 'A', 'ARG': 'R', 'ASN': 'N', 'ASP': 'D', 'CYS': 'C', 'GLN': 'Q', 'GLU': 'E',
+    'GLY': 'G', 'HIS': 'H', 'ILE': 'I', 'LEU': 'L', 'LYS': 'K', 'MET': 'M', 'PHE': 'F',
+    'PRO': 'P', 'SER': 'S', 'THR': 'T', 'TRP': 'W', 'TYR': 'Y', 'VAL': 'V',
+    # résidus modifiés fréquents dans les kinases
+    'MSE': 'M', 'PTR': 'Y', 'SEP': 'S', 'TPO': 'T', 'CSO': 'C', 'CME': 'C',
+}
+
+_BLOSUM62 = """
+   A  R  N  D  C  Q  E  G  H  I  L  K  M  F  P  S  T  W  Y  V  X
+A  4 -1 -2 -2  0 -1 -1  0 -2 -1 -1 -1 -1 -2 -1  1  0 -3 -2  0 -1
+R -1  5  0 -2 -3  1  0 -2  0 -3 -2  2 -1 -3 -2 -1 -1 -3 -2 -3 -1
+N -2  0  6  1 -3  0  0  0  1 -3 -3  0 -2 -3 -2  1  0 -4 -2 -3 -1
+D -2 -2  1  6 -3  0  2 -1 -1 -3 -4 -1 -3 -3 -1  0 -1 -4 -3 -3 -1
+C  0 -3 -3 -3  9 -3 -4 -3 -3 -1 -1 -3 -1 -2 -3 -1 -1 -2 -2 -1 -1
+Q -1  1  0  0 -3  5  2 -2  0 -3 -2  1  0 -3 -1  0 -1 -2 -1 -2 -1
+E -1  0  0  2 -4  2  5 -2  0 -3 -3  1 -2 -3 -1  0 -1 -3 -2 -2 -1
+G  0 -2  0 -1 -3 -2 -2  6 -2 -4 -4 -2 -3 -3 -2  0 -2 -2 -3 -3 -1
+H -2  0  1 -1 -3  0  0 -2  8 -3 -3 -1 -2 -1 -2 -1 -2 -2  2 -3 -1
+I -1 -3 -3 -3 -1 -3 -3 -4 -3  4  2 -3  1  0 -3 -2 -1 -3 -1  3 -1
+L -1 -2 -3 -4 -1 -2 -3 -4 -3  2  4 -2  2  0 -3 -2 -1 -2 -1  1 -1
+K -1  2  0 -1 -3  1  1 -2 -1 -3 -2  5 -1 -3 -1  0 -1 -3 -2 -2 -1
+M -1 -1 -2 -3 -1  0 -2 -3 -2  1  2 -1  5  0 -2 -1 -1 -1 -1  1 -1
+F -2 -3 -3 -3 -2 -3 -3 -3 -1  0  0 -3  0  6 -4 -2 -2  1  3 -1 -1
+P -1 -2 -2 -1 -3 -1 -1 -2 -2 -3 -3 -1 -2 -4  7 -1 -1 -4 -3 -2 -1
+S  1 -1  1  0 -1  0  0  0 -1 -2 -2  0 -1 -2 -1  4  1 -3 -2 -2 -1
+T  0 -1  0 -1 -1 -1 -1 -2 -2 -1 -1 -1 -1 -2 -1  1  5 -2 -2  0 -1
+W -3 -3 -4 -4 -2 -2 -3 -2 -2 -3 -2 -3 -1  1 -4 -3 -2 11  2 -3 -1
+Y -2 -2 -2 -3 -2 -1 -2 -3  2 -1 -1 -2 -1  3 -3 -2 -2  2  7 -1 -1
+V  0 -3 -3 -3 -1 -2 -2 -3 -3  3  1 -2  1 -1 -2 -2  0 -3 -1  4 -1
+X -1 -1 -1 -1 -1 -1 -1 -1 -1 -1 -1 -1 -1 -1 -1 -1 -1 -1 -1 -1 -1
+"""
+
+
+def _charger_blosum():
+    lignes = _BLOSUM62.strip().splitlines()
+    alphabet = lignes[0].split()
+    matrice = np.array([[int(v) for v in ligne.split()[1:]] for ligne in lignes[1:]], dtype=np.int32)
+    return alphabet, matrice
+
+
+ALPHABET, BLOSUM62 = _charger_blosum()
+_CODES = {lettre: i for i, lettre in enumerate(ALPHABET)}
+
+# provenance d'une cellule pendant le retour sur trace
+_DEPART, _DIAGONALE, _HAUT = 0, 1, 2
+
+
+def sequence(noms_residus):
+    """Séquence une lettre à partir des noms de résidus à trois lettres (X si inconnu)"""
+    return ''.join(TROIS_LETTRES.get(str(nom), 'X') for nom in noms_residus)
+
+
+def aligner_sequences(seq_a, seq_b, ouverture=OUVERTURE_GAP, extension=EXTENSION_GAP):
+    """
+    Alignement global à extrémités libres (Gotoh, gaps affines) de seq_a et seq_b.
+    Chaque ligne de la matrice est calculée en une fois avec NumPy ; les gaps
+    horizontaux sont obtenus par un maximum cumulé (np.maximum.accumulate).
+    Renvoie (positions dans seq_a, positions dans seq_b) des résidus alignés.
+    """
+    a = np.array([_CODES.get(c, _CODES['X']) for c in seq_a], dtype=np.intp)
+    b = np.array([_CODES.get(c, _CODES['X']) for c in seq_b], dtype=np.intp)
+    n, m = len(a), len(b)
+    if n == 0 or m == 0:
+        return np.zeros(0, dtype=np.intp), np.zeros(0, dtype=np.intp)
+
+    scores = BLOSUM62[a[:, None], b[None, :]]
+    moins_infini = -10 ** 9
+    colonnes = np.arange(m + 1)
+
+    h = np.zeros(m + 1, dtype=np.int64)                    # ligne précédente de H
+    f = np.full(m + 1, moins_infini, dtype=np.int64)       # gaps verticaux
+    # matrices de retour sur trace
+    source_hp = np.zeros((n + 1, m + 1), dtype=np.uint8)   # diagonale / haut / départ
+    source_h = np.zeros((n + 1, m + 1), dtype=bool)        # True si H vient d'un gap horizontal
+    f_extension = np.zeros((n + 1, m + 1), dtype=bool)     # True si F prolonge un gap
+    e_origine = np.zeros((n + 1, m + 1), dtype=np.int32)   # colonne d'ouverture du gap horizontal
+
+    meilleur_colonne = (moins_infini, 0)
+    for i in range(1, n + 1):
+        # gaps verticaux : ouverture depuis H ou prolongation de F
+        ouvrir = h - ouverture
+        prolonger = f - extension
+        f_extension[i] = prolonger > ouvrir
+        f = np.maximum(ouvrir, prolonger)
+
+        # H' = max(diagonale, gap vertical) ; H'[0] = 0 (début libre)
+        diagonale = np.full(m + 1, moins_infini, dtype=np.int64)
+        diagonale[1:] = h[:-1] + scores[i - 1]
+        hp = np.maximum(diagonale, f)
+        source_hp[i] = np.where(diagonale >= f, _DIAGONALE, _HAUT)
+        hp[0] = 0
+        source_hp[i, 0] = _DEPART
+
+        # gap horizontal : E[j] = max_{k<j} H'[k] - ouverture - extension*(j-1-k)
+        cumul = hp + extension * colonnes
+        maximum = np.maximum.accumulate(cumul)
+        argmax = np.maximum.accumulate(np.where(cumul >= maximum, colonnes, 0))
+        e = np.full(m + 1, moins_infini, dtype=np.int64)
+        e[1:] = maximum[:-1] - ouverture - extension * (colonnes[1:] - 1)
+        e_origine[i, 1:] = argmax[:-1]
+
+        source_h[i] = e > hp
+        h = np.maximum(hp, e)
+        h[0] = 0
+        source_h[i, 0] = False
+
+        # fin libre sur la dernière colonne
+        if h[m] > meilleur_colonne[0]:
+            meilleur_colonne = (h[m], i)
+
+    # fin libre : meilleur score sur la dernière ligne ou la dernière colonne
+    j_fin = int(np.argmax(h))
+    if h[j_fin] >= meilleur_colonne[0]:
+        i, j = n, j_fin
+    else:
+        i, j = meilleur_colonne[1], m
+
+    positions_a, positions_b = [], []
+    etat = 'H'
+    while i > 0 and j > 0:
+        if etat == 'F':
+            etat = 'F' if f_extension[i, j] else 'H'
+            i -= 1
+            continue
+        if etat == 'H' and source_h[i, j]:
+            j = int(e_origine[i, j])
+            etat = 'Hp'
+            continue
+        source = source_hp[i, j]
+        if source == _DIAGONALE:
+            positions_a.append(i - 1)
+            positions_b.append(j - 1)
+            i -= 1
+            j -= 1
+            etat = 'H'
+        elif source == _HAUT:
+            etat = 'F'
+        else:
+            break
+
+    return np.array(positions_a[::-1], dtype=np.intp), np.array(positions_b[::-1], dtype=np.intp)
+
+
+def cle_sequences(seq_cible, seq_ref, ouverture=OUVERTURE_GAP, extension=EXTENSION_GAP):
+    """Clé du cache : SHA-256 des deux séquences et des pénalités"""
+    texte = f"{seq_cible}|{seq_ref}|{ouverture}|{extension}"
+    return hashlib.sha256(texte.encode()).hexdigest()
+
+
+def correspondance(seq_cible, seq_ref, cache_dir=CORRESPONDANCE_DIR):
+    """
+    Positions alignées (cible, référence) des deux séquences, depuis le cache si
+    ce couple de séquences a déjà été aligné. cache_dir=None : pas de cache.
+    """
+    chemin = None
+    if cache_dir:
+        chemin = os.path.join(cache_dir, cle_sequences(seq_cible, seq_ref) + ".npz")
+        if os.path.exists(chemin):
+            with np.load(chemin) as donnees:
+                return donnees['cible'], donnees['ref']
+
+    positions_cible, positions_ref = aligner_sequences(seq_cible, seq_ref)
+    if chemin:
+        os.makedirs(cache_dir, exist_ok=True)
+        temporaire = f"{chemin}.{os.getpid()}.tmp.npz"
+        np.savez(temporaire, cible=positions_cible, ref=positions_ref)
+        os.replace(temporaire, chemin)
+    return positions_cible, positions_ref
+
+
+def paires_lobe_c(ca_cible, ca_ref, lobe_start, lobe_end, cache_dir=CORRESPONDANCE_DIR):
+    """
+    Résidus appariés entre la cible et le lobe C de la référence.
+    ca_cible, ca_ref : (numéros, noms des résidus, coordonnées) triés par numéro
+    (voir lecture_cif.residus_ca et superposition.ca_pymol).
+    Renvoie (numéros cible, numéros référence) des paires dans [lobe_start, lobe_end].
+    """
+    numeros_cible, noms_cible = ca_cible[0], ca_cible[1]
+    numeros_ref, noms_ref = ca_ref[0], ca_ref[1]
+    positions_cible, positions_ref = correspondance(sequence(noms_cible), sequence(noms_ref), cache_dir)
+
+    residus_cible = np.asarray(numeros_cible)[positions_cible]
+    residus_ref = np.asarray(numeros_ref)[positions_ref]
+    dans_lobe = (residus_ref >= lobe_start) & (residus_ref <= lobe_end)
+    return residus_cible[dans_lobe], residus_ref[dans_lobe]
+
+
+if __name__ == "__main__":
+    from lecture_cif import lire_atom_site, residus_ca
+
+    if len(sys.argv) != 5:
+        print("Usage : python3 correspondance_residus.py cible.cif chaine reference.cif chaine")
+        sys.exit(1)
+    ca_cible = residus_ca(lire_atom_site(sys.argv[1], ca_seulement=True), sys.argv[2])
+    ca_ref = residus_ca(lire_atom_site(sys.argv[3], ca_seulement=True), sys.argv[4])
+    residus_cible, residus_ref = paires_lobe_c(ca_cible, ca_ref, 127, 350)
+    print(f"{len(residus_cible)} C-alpha appariés dans le lobe C de la référence")
+    if len(residus_cible):
+        print(f"  cible {residus_cible[0]}-{residus_cible[-1]} ↔ référence {residus_ref[0]}-{residus_ref[-1]}")
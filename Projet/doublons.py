@@ -0,0 +1,111 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Détection des structures en double avant la superposition
+Deux entrées sont des doublons si la chaîne à superposer a la même séquence
+(mêmes numéros et noms de résidus) et les mêmes coordonnées C-alpha à
+TOLERANCE près. La première entrée du CSV est superposée normalement ; ses
+doublons reprennent sa transformation et sa ligne de résultats, sans nouvel
+alignement. Si les fichiers d'entrée sont identiques octet par octet, le
+fichier aligné est partagé (lien physique).
+
+Usage (hors PyMOL, depuis le dossier Projet/) :
+    python3 doublons.py rcsb_pdb_custom_report.csv
+"""
+
+import hashlib
+import os
+import sys
+
+import numpy as np
+
+from cache_coordonnees import cle_fichier
+from lecture_cif import lire_atom_site, residus_ca
+
+# écart maximal entre C-alpha (Å) : précision des coordonnées des fichiers mmCIF
+TOLERANCE = 1e-3
+
+# type de doublon
+FICHIER = "fichier"
+COORDONNEES = "coordonnees"
+
+
+def ca_entree(structure_file, chain_id, cache_dir=None):
+    """C-alpha de la chaîne (numéros, noms, coordonnées), depuis le cache binaire si possible"""
+    if cache_dir:
+        from superposition import ca_fichier
+        return ca_fichier(structure_file, chain_id, cache_dir)
+    return residus_ca(lire_atom_site(structure_file, ca_seulement=True, chaines=[chain_id]), chain_id)
+
+
+def cle_sequence(ca):
+    """Empreinte de la séquence : numéros et noms des résidus C-alpha"""
+    numeros, noms, _ = ca
+    h = hashlib.sha256(np.ascontiguousarray(numeros, dtype=np.int32).tobytes())
+    h.update(",".join(noms).encode())
+    return h.hexdigest()
+
+
+def identiques(ca_a, ca_b, tolerance=TOLERANCE):
+    """True si les deux chaînes ont les mêmes C-alpha à `tolerance` près (même séquence supposée)"""
+    coords_a, coords_b = ca_a[2], ca_b[2]
+    return coords_a.shape == coords_b.shape and bool(np.all(np.abs(coords_a - coords_b) <= tolerance))
+
+
+def grouper(entrees, cache_dir=None, tolerance=TOLERANCE):
+    """
+    Cherche les doublons parmi les entrées (entry_id, assembly_id, chain_id) dont le
+    fichier d'assemblage est présent localement.
+    Renvoie le dictionnaire index du doublon -> (index du représentant, FICHIER ou COORDONNEES),
+    le représentant étant toujours la première occurrence dans l'ordre des entrées.
+    """
+    doublons = {}
+    par_fichier = {}
+    par_sequence = {}
+    for index, (entry_id, assembly_id, chain_id) in enumerate(entrees):
+        structure_file = f"{entry_id}-assembly{assembly_id}.cif"
+        if not os.path.exists(structure_file):
+            continue
+
+        # même fichier et même chaîne : pas besoin de relire les coordonnées
+        cle = (cle_fichier(structure_file), chain_id)
+        if cle in par_fichier:
+            doublons[index] = (par_fichier[cle], FICHIER)
+            continue
+        par_fichier[cle] = index
+
+        try:
+            ca = ca_entree(structure_file, chain_id, cache_dir)
+        except (ValueError, KeyError):
+            continue
+        if len(ca[0]) == 0:
+            continue
+
+        # comparaison des coordonnées seulement entre chaînes de même séquence
+        candidats = par_sequence.setdefault(cle_sequence(ca), [])
+        for representant, ca_representant in candidats:
+            if identiques(ca, ca_representant, tolerance):
+                doublons[index] = (representant, COORDONNEES)
+                break
+        else:
+            candidats.append((index, ca))
+    return doublons
+
+
+def representants(doublons):
+    """Index du représentant -> liste des index de ses doublons"""
+    groupes = {}
+    for index, (representant, _) in sorted(doublons.items()):
+        groupes.setdefault(representant, []).append(index)
+    return groupes
+
+
+if __name__ == "__main__":
+    from superposition import lire_entrees
+
+    csv_file = sys.argv[1] if len(sys.argv) > 1 else "rcsb_pdb_custom_report.csv"
+    entrees = lire_entrees(csv_file)
+    doublons = grouper(entrees)
+    for index, (representant, type_) in sorted(doublons.items()):
+        print(f"{entrees[index][0]} = {entrees[representant][0]} ({type_})")
+    print(f"🕺🏻 {len(doublons)} doublons parmi {len(entrees)} entrées")
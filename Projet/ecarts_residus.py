@@ -0,0 +1,266 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Écarts par résidu à la référence, pour tout l'ensemble, dans un seul tableau
+Après la superposition, la distance entre chaque C-alpha apparié et son C-alpha de la
+référence est calculée en une fois (transformation 4x4 appliquée à toutes les paires).
+Les profils de toutes les structures sont rangés dans un tableau float32 (N, R) :
+    - une ligne par structure (NaN pour les résidus non appariés)
+    - une colonne par numéro de résidu ALK (numérotation UniProt Q9UM73, commune à l'ensemble)
+et un index JSON (structures, chaînes, résidus ALK, résidu de la référence de chaque colonne).
+Une question comme « quelles structures s'écartent dans la boucle d'activation ? »
+devient une tranche du tableau (ouvert en np.memmap) au lieu d'un nouvel alignement.
+
+Fichiers : superposition_results_ecarts.npy et superposition_results_ecarts.json
+(à côté du fichier de résultats, voir chemins_ecarts).
+
+Usage (hors PyMOL, depuis le dossier Projet/) :
+    python3 ecarts_residus.py superposition_results_ecarts.npy --region boucle_activation --seuil 2.0
+    python3 ecarts_residus.py superposition_results_ecarts.npy --residus 1197 1201
+    python3 ecarts_residus.py --depuis-index superposition_results_transforms.jsonl --reference 4WB8 A --lobe 127 350
+"""
+
+import argparse
+import json
+import os
+
+import numpy as np
+
+# régions d'ALK (numérotation UniProt Q9UM73)
+REGIONS = {
+    'helice_ac': (1157, 1173),
+    'charniere': (1197, 1201),
+    'boucle_activation': (1270, 1299),
+}
+# écart (Å) au-delà duquel un résidu est considéré comme déplacé
+SEUIL = 2.0
+
+
+def chemins_ecarts(output_csv):
+    """superposition_results.csv -> (superposition_results_ecarts.npy, superposition_results_ecarts.json)"""
+    base = os.path.splitext(output_csv)[0] + "_ecarts"
+    return base + ".npy", base + ".json"
+
+
+def ecarts(ca_cible, ca_ref, paires, transformation):
+    """
+    Distance de chaque C-alpha apparié de la cible (après `transformation`, matrice 4x4
+    qui place la cible sur la référence) à son C-alpha de la référence.
+    ca_cible, ca_ref : (numéros triés, noms, coordonnées) ; paires : (résidus cible, résidus référence).
+    Renvoie (résidus cible, résidus référence, distances float32).
+    """
+    from superposition import coordonnees_residus
+
+    residus_cible = np.asarray(paires[0], dtype=np.int32)
+    residus_ref = np.asarray(paires[1], dtype=np.int32)
+    transformation = np.asarray(transformation, dtype=np.float64)
+    mobile = coordonnees_residus(ca_cible, residus_cible) @ transformation[:3, :3].T + transformation[:3, 3]
+    distances = np.linalg.norm(mobile - coordonnees_residus(ca_ref, residus_ref), axis=1)
+    return residus_cible, residus_ref, distances.astype(np.float32)
+
+
+def ecrire_ecarts(chemin, profils, reference=None):
+    """
+    Écrit le tableau (N, R) des écarts et son index.
+    profils : liste de (PDB ID, chaîne, (résidus cible, résidus référence, distances) ou None)
+    reference : description de la référence gardée dans l'index (ex: ['4WB8', 'A', 127, 350])
+    Renvoie le chemin de l'index.
+    """
+    presents = [p[2] for p in profils if p[2] is not None and len(p[2][0])]
+    if presents:
+        premier = int(min(p[0].min() for p in presents))
+        dernier = int(max(p[0].max() for p in presents))
+    else:
+        premier, dernier = 0, -1
+    tableau = np.full((len(profils), dernier - premier + 1), np.nan, dtype=np.float32)
+    apparies = np.full(tableau.shape, -1, dtype=np.int32)
+    for ligne, (_, _, profil) in enumerate(profils):
+        if profil is None or not len(profil[0]):
+            continue
+        tableau[ligne, profil[0] - premier] = profil[2]
+        apparies[ligne, profil[0] - premier] = profil[1]
+    # résidu de la référence de chaque colonne : l'appariement le plus fréquent
+    # (les boucles désordonnées peuvent être appariées différemment d'une structure à l'autre)
+    residus_ref = np.full(tableau.shape[1], -1, dtype=np.int64)
+    for colonne in range(tableau.shape[1]):
+        valeurs, comptes = np.unique(apparies[:, colonne][apparies[:, colonne] >= 0], return_counts=True)
+        if len(valeurs):
+            residus_ref[colonne] = valeurs[np.argmax(comptes)]
+
+    temporaire = f"{chemin}.{os.getpid()}.tmp.npy"
+    np.save(temporaire, tableau)
+    os.replace(temporaire, chemin)
+    chemin_index = os.path.splitext(chemin)[0] + ".json"
+    with open(chemin_index, 'w') as f:
+        json.dump({
+            'tableau': os.path.basename(chemin),
+            'reference': reference,
+            'entrees': [[pdb_id, chaine] for pdb_id, chaine, _ in profils],
+            'premier_residu': premier,
+            'residus_ref': residus_ref.tolist(),
+        }, f)
+    return chemin_index
+
+
+def charger_ecarts(chemin):
+    """Tableau des écarts ouvert en np.memmap (lecture seule) et son index"""
+    with open(os.path.splitext(chemin)[0] + ".json") as f:
+        index = json.load(f)
+    return np.load(chemin, mmap_mode='r'), index
+
+
+def profils_existants(chemin):
+    """
+    Profils d'un tableau des écarts déjà écrit, par (PDB ID, chaîne) : (résidus cible,
+    résidu de la référence de chaque colonne, distances), copiés hors du np.memmap.
+    {} si le tableau n'existe pas ; OSError / ValueError / KeyError s'il est illisible.
+    """
+    if not os.path.exists(chemin):
+        return {}
+    tableau, index = charger_ecarts(chemin)
+    premier = index['premier_residu']
+    residus_ref = np.asarray(index['residus_ref'], dtype=np.int32)
+    profils = {}
+    for ligne, (pdb_id, chaine) in enumerate(index['entrees']):
+        distances = np.array(tableau[ligne])
+        presents = np.flatnonzero(~np.isnan(distances))
+        if len(presents):
+            profils[(pdb_id, chaine)] = ((presents + premier).astype(np.int32), residus_ref[presents],
+                                         distances[presents])
+    return profils
+
+
+def colonnes(index, debut, fin):
+    """Tranche des colonnes des résidus ALK debut-fin (inclus)"""
+    premier = index['premier_residu']
+    n = len(index['residus_ref'])
+    return slice(min(max(debut - premier, 0), n), min(max(fin - premier + 1, 0), n))
+
+
+def deplacees(tableau, index, debut, fin, seuil=SEUIL):
+    """
+    Structures qui s'écartent de la référence dans les résidus debut-fin :
+    liste de (PDB ID, chaîne, écart maximal, résidus au-delà du seuil, résidus appariés)
+    triée par écart maximal décroissant
+    """
+    tranche = np.asarray(tableau[:, colonnes(index, debut, fin)])
+    apparies = (~np.isnan(tranche)).sum(axis=1)
+    au_dela = (np.nan_to_num(tranche, nan=0.0) > seuil).sum(axis=1)
+    maximum = np.where(apparies > 0, np.nan_to_num(tranche, nan=-np.inf).max(axis=1, initial=-np.inf), np.nan)
+    lignes = np.flatnonzero(au_dela > 0)
+    lignes = lignes[np.argsort(-maximum[lignes], kind='stable')]
+    return [(*index['entrees'][i], float(maximum[i]), int(au_dela[i]), int(apparies[i])) for i in lignes]
+
+
+def profil_transformation(record, ca_ref, lobe_start, lobe_end, cache_dir=None, correspondance=True):
+    """
+    Profil d'une entrée de l'index des transformations (index_transformations.py) :
+    C-alpha relus dans le fichier source, None si la source ou les paires manquent
+    """
+    from doublons import ca_entree
+    from superposition import paires_residus
+
+    try:
+        ca_cible = ca_entree(record['source'], record['chain'], cache_dir)
+        paires = paires_residus(ca_cible, ca_ref, lobe_start, lobe_end, correspondance)
+        return ecarts(ca_cible, ca_ref, paires, record['transformation'])
+    except (ValueError, OSError):
+        return None
+
+
+def profil_aligne(chemin, chaine, ca_ref, lobe_start, lobe_end, correspondance=True):
+    """
+    Profil d'une structure déjà superposée ({entry_id}_aligned.cif) : ses C-alpha sont
+    dans le repère de la référence, aucune transformation. None si le fichier ou les paires manquent.
+    """
+    from doublons import ca_entree
+    from superposition import paires_residus
+
+    try:
+        ca_cible = ca_entree(chemin, chaine)
+        paires = paires_residus(ca_cible, ca_ref, lobe_start, lobe_end, correspondance)
+        return ecarts(ca_cible, ca_ref, paires, np.eye(4))
+    except (ValueError, OSError):
+        return None
+
+
+def completer_profils(chemin, entrees, results, profils, transformations, lire_ca_ref, lobe_start, lobe_end,
+                      cache_dir=None, correspondance=True):
+    """
+    Profils des entrées superposées sans profil dans `profils` (index -> profil), déjà à jour
+    lors d'une exécution incrémentale : ligne du tableau précédent `chemin`, sinon recalculé
+    depuis l'index des transformations (`transformations`, entry_id -> enregistrement) ou
+    depuis {entry_id}_aligned.cif. lire_ca_ref : fonction sans argument qui renvoie les
+    C-alpha de la référence (appelée seulement s'il faut recalculer un profil).
+    Complète `profils` ; renvoie (nombre de profils non retrouvés, tableau précédent lisible).
+    """
+    try:
+        precedents, lisible = profils_existants(chemin), True
+    except (OSError, ValueError, KeyError):
+        precedents, lisible = {}, False
+    ca_ref = None
+    n_manquants = 0
+    for index, ((entry_id, _, _), result) in enumerate(zip(entrees, results)):
+        if index in profils or result['Status'] == 'ERROR':
+            continue
+        profil = precedents.get((entry_id, result['Chain']))
+        aligne = f"{entry_id}_aligned.cif"
+        if profil is None and (entry_id in transformations or os.path.exists(aligne)):
+            if ca_ref is None:
+                ca_ref = lire_ca_ref()
+            if entry_id in transformations:
+                profil = profil_transformation(transformations[entry_id], ca_ref, lobe_start, lobe_end,
+                                               cache_dir, correspondance)
+            else:
+                profil = profil_aligne(aligne, result['Chain'], ca_ref, lobe_start, lobe_end, correspondance)
+        n_manquants += profil is None
+        profils[index] = profil
+    return n_manquants, lisible
+
+
+def depuis_index(chemin_index, reference, chaine_ref, lobe_start, lobe_end, cache_dir=None, correspondance=True):
+    """
+    Profils de toutes les entrées d'un index des transformations, pour les superpositions
+    faites sans calcul des écarts (RESIDUE_DEVIATIONS = False, --sans-ecarts)
+    """
+    from doublons import ca_entree
+    from index_transformations import charger_index
+    from telechargement import nom_assemblage
+
+    ca_ref = ca_entree(nom_assemblage(reference, 1), chaine_ref, cache_dir)
+    return [(entry_id, record['chain'],
+             profil_transformation(record, ca_ref, lobe_start, lobe_end, cache_dir, correspondance))
+            for entry_id, record in charger_index(chemin_index).items()]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Écarts par résidu des structures superposées à la référence")
+    parser.add_argument("tableau", nargs="?", default="superposition_results_ecarts.npy",
+                        help="tableau des écarts (.npy, avec son index .json)")
+    parser.add_argument("--region", choices=sorted(REGIONS), default=None, help="région d'ALK à examiner")
+    parser.add_argument("--residus", type=int, nargs=2, default=None, metavar=("DEBUT", "FIN"),
+                        help="résidus ALK à examiner (au lieu d'une région)")
+    parser.add_argument("--seuil", type=float, default=SEUIL, help="écart minimal (Å)")
+    parser.add_argument("--depuis-index", default=None,
+                        help="construire le tableau depuis un index des transformations")
+    parser.add_argument("--reference", nargs=2, default=("4WB8", "A"), metavar=("PDB", "CHAÎNE"))
+    parser.add_argument("--lobe", type=int, nargs=2, default=(127, 350), metavar=("DEBUT", "FIN"),
+                        help="lobe C de la référence")
+    parser.add_argument("--cache-dir", default=None, help="cache binaire des coordonnées")
+    args = parser.parse_args()
+
+    if args.depuis_index:
+        profils = depuis_index(args.depuis_index, *args.reference, *args.lobe, cache_dir=args.cache_dir)
+        ecrire_ecarts(args.tableau, profils, reference=[*args.reference, *args.lobe])
+        print(f"✨ {args.tableau} : {len(profils)} structures")
+
+    tableau, index = charger_ecarts(args.tableau)
+    debut, fin = args.residus or REGIONS[args.region or 'boucle_activation']
+    print(f"🕺🏻 {tableau.shape[0]} structures × {tableau.shape[1]} résidus, "
+          f"résidus {debut}-{fin} au-delà de {args.seuil} Å :")
+    for pdb_id, chaine, maximum, au_dela, apparies in deplacees(tableau, index, debut, fin, args.seuil):
+        print(f"  {pdb_id:<6} {chaine:<3} max {maximum:5.2f} Å  {au_dela}/{apparies} résidus")
+
+
+if __name__ == "__main__":
+    main()
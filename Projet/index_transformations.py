@@ -0,0 +1,154 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Index des transformations : sortie compacte de la superposition
+Au lieu d'une copie complète de chaque structure ({entry_id}_aligned.cif),
+une ligne JSON par entrée dans superposition_results_transforms.jsonl :
+    - fichier source (<PDB_ID>-assembly<N>.cif) et son SHA-256
+    - matrice 4x4 qui place la source dans le repère de la référence
+    - chaîne, ligne de résultats et paramètres de l'alignement
+Les coordonnées alignées sont reconstruites à la demande (materialiser) pour
+un fichier entier ou seulement certaines chaînes et certains ligands.
+
+Usage (hors PyMOL, depuis le dossier Projet/) :
+    python3 index_transformations.py superposition_results_transforms.jsonl --sortie ../Super
+    python3 index_transformations.py superposition_results_transforms.jsonl --entrees 2XB7 --chaines A --ligands GUI
+"""
+
+import argparse
+import json
+import os
+
+import numpy as np
+
+from cache_coordonnees import cle_fichier
+from lecture_cif import lignes_atom_site
+
+# résidus retirés comme par cmd.remove("solvent")
+SOLVANT = (b"HOH", b"DOD", b"WAT", b"H2O")
+
+
+def chemin_index(output_csv):
+    """superposition_results.csv -> superposition_results_transforms.jsonl"""
+    return os.path.splitext(output_csv)[0] + "_transforms.jsonl"
+
+
+def enregistrer(chemin, entry_id, assembly_id, chain_id, transformation, result, **meta):
+    """Ajoute la transformation d'une entrée à l'index et l'écrit immédiatement sur le disque"""
+    source = f"{entry_id}-assembly{assembly_id}.cif"
+    record = {
+        'entry_id': entry_id,
+        'assembly_id': assembly_id,
+        'chain': chain_id,
+        'source': source,
+        'source_sha256': cle_fichier(source),
+        'transformation': np.round(np.asarray(transformation), 8).tolist(),
+        'result': result,
+        **meta,
+    }
+    with open(chemin, 'a') as f:
+        f.write(json.dumps(record) + "\n")
+        f.flush()
+        os.fsync(f.fileno())
+    return record
+
+
+def charger_index(chemin):
+    """PDB ID -> dernier enregistrement de l'index"""
+    index = {}
+    if not os.path.exists(chemin):
+        return index
+    with open(chemin) as f:
+        for ligne in f:
+            ligne = ligne.strip()
+            if not ligne:
+                continue
+            try:
+                record = json.loads(ligne)
+            except json.JSONDecodeError:
+                continue
+            index[record['entry_id']] = record
+    return index
+
+
+def materialiser(record, destination, chaines=None, ligands=None, dossier=".", solvant=False):
+    """
+    Écrit les coordonnées alignées d'une entrée de l'index dans `destination` (mmCIF) :
+    boucle _atom_site du fichier source avec les coordonnées transformées.
+    chaines : ne garder que ces chaînes (auth_asym_id)
+    ligands : ne garder que ces hétéro-groupes (label_comp_id des lignes HETATM)
+    solvant : garder l'eau (retirée par défaut, comme dans le pipeline)
+    Lève une ValueError si le fichier source a changé depuis la superposition.
+    Renvoie le nombre d'atomes écrits.
+    """
+    source = os.path.join(dossier, record['source'])
+    if cle_fichier(source) != record['source_sha256']:
+        raise ValueError(f"{source} a changé depuis la superposition (SHA-256 différent)")
+    with open(source, 'rb') as f:
+        texte = f.read()
+    noms, lignes = lignes_atom_site(texte)
+    colonne = {nom: i for i, nom in enumerate(noms)}
+
+    def valeurs(nom):
+        return np.array([ligne[colonne[nom]] for ligne in lignes])
+
+    garder = np.ones(len(lignes), dtype=bool)
+    comp = valeurs('label_comp_id')
+    if not solvant:
+        garder &= ~np.isin(comp, SOLVANT)
+    if chaines is not None:
+        nom_chaine = 'auth_asym_id' if 'auth_asym_id' in colonne else 'label_asym_id'
+        garder &= np.isin(valeurs(nom_chaine), [c.encode() for c in chaines])
+    if ligands is not None:
+        hetatm = valeurs('group_PDB') == b"HETATM"
+        garder &= ~hetatm | np.isin(comp, [l.encode() for l in ligands])
+
+    # transformation de toutes les coordonnées en une fois
+    transformation = np.array(record['transformation'])
+    xyz = np.stack([valeurs(nom).astype(np.float64) for nom in ('Cartn_x', 'Cartn_y', 'Cartn_z')], axis=1)
+    xyz = xyz @ transformation[:3, :3].T + transformation[:3, 3]
+    texte_xyz = np.char.mod("%.3f", xyz).astype(bytes)
+
+    nom_objet = f"{record['entry_id']}_assembly{record['assembly_id']}"
+    sortie = [f"# generated by index_transformations.py\n#\ndata_{nom_objet}\n_entry.id {nom_objet}\n#\nloop_\n".encode()]
+    sortie.extend(f"_atom_site.{nom}\n".encode() for nom in noms)
+    for i in np.flatnonzero(garder):
+        ligne = lignes[i]
+        for k, nom in enumerate(('Cartn_x', 'Cartn_y', 'Cartn_z')):
+            ligne[colonne[nom]] = texte_xyz[i, k]
+        sortie.append(b" ".join(ligne) + b"\n")
+    sortie.append(b"#\n")
+
+    with open(destination, 'wb') as f:
+        f.writelines(sortie)
+    return int(garder.sum())
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Reconstruire les structures alignées depuis l'index des transformations")
+    parser.add_argument("index", nargs="?", default="superposition_results_transforms.jsonl",
+                        help="index des transformations")
+    parser.add_argument("--entrees", nargs="*", default=None, help="PDB ID à reconstruire (toutes par défaut)")
+    parser.add_argument("--chaines", nargs="*", default=None, help="ne garder que ces chaînes")
+    parser.add_argument("--ligands", nargs="*", default=None, help="ne garder que ces ligands (HETATM)")
+    parser.add_argument("--sources", default=".", help="dossier des fichiers <PDB_ID>-assembly<N>.cif")
+    parser.add_argument("--sortie", default=".", help="dossier des fichiers <PDB_ID>_aligned.cif")
+    args = parser.parse_args()
+
+    index = charger_index(args.index)
+    entrees = args.entrees if args.entrees is not None else list(index)
+    os.makedirs(args.sortie, exist_ok=True)
+    for entry_id in entrees:
+        if entry_id not in index:
+            print(f"🙈 {entry_id} absent de l'index")
+            continue
+        destination = os.path.join(args.sortie, f"{entry_id}_aligned.cif")
+        try:
+            n = materialiser(index[entry_id], destination, args.chaines, args.ligands, args.sources)
+            print(f"✨ {destination} : {n} atomes")
+        except (ValueError, OSError) as e:
+            print(f"🙈 erreur : {e}")
+
+
+if __name__ == "__main__":
+    main()
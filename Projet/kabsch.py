@@ -0,0 +1,119 @@
+"""
+Superposition de C-alpha par l'algorithme de Kabsch (SVD), en NumPy pur
+Alternative à cmd.align quand les atomes sont déjà appariés :
+mêmes paramètres de rejet des outliers que PyMOL (cycles, cutoff)
+
+- superposer(mobile, cible) : une paire de tableaux (N, 3)
+- superposer_lot(mobiles, cibles, masques) : B paires (B, N, 3) traitées en une fois
+"""
+
+import numpy as np
+
+# en dessous de 3 atomes la rotation n'est plus définie
+MIN_ATOMES = 3
+
+
+def kabsch(mobile, cible, poids):
+    """
+    Rotation R et translation t minimisant |R @ mobile + t - cible| (pondéré).
+    Les tableaux peuvent être empilés : mobile/cible (..., N, 3), poids (..., N).
+    Les paires avec moins de MIN_ATOMES atomes de poids non nul reçoivent l'identité
+    (pas de SVD sur des centres NaN).
+    """
+    poids = np.asarray(poids).astype(np.float64)
+    degeneres = np.count_nonzero(poids > 0, axis=-1) < MIN_ATOMES
+    if np.any(degeneres):
+        # calcul sur des zéros de poids unitaires (aucun NaN), résultat remplacé par l'identité
+        poids = np.where(degeneres[..., None], 1.0, poids)
+        mobile = np.where(degeneres[..., None, None], 0.0, mobile)
+        cible = np.where(degeneres[..., None, None], 0.0, cible)
+    total = poids.sum(axis=-1)
+    total = np.where(total > 0, total, 1.0)[..., None, None]
+    centre_m = (poids[..., None] * mobile).sum(axis=-2, keepdims=True) / total
+    centre_c = (poids[..., None] * cible).sum(axis=-2, keepdims=True) / total
+
+    # matrice de covariance 3x3 de chaque paire
+    h = np.swapaxes((mobile - centre_m) * poids[..., None], -1, -2) @ (cible - centre_c)
+    u, _, vt = np.linalg.svd(h)
+
+    # correction des réflexions (det = -1)
+    d = np.sign(np.linalg.det(np.swapaxes(vt, -1, -2) @ np.swapaxes(u, -1, -2)))
+    d = np.where(d == 0, 1.0, d)
+    correction = np.ones(h.shape[:-1])
+    correction[..., 2] = d
+    r = np.swapaxes(vt, -1, -2) @ (correction[..., :, None] * np.swapaxes(u, -1, -2))
+
+    t = centre_c[..., 0, :] - (r @ centre_m[..., 0, :, None])[..., 0]
+    if np.any(degeneres):
+        r = np.where(degeneres[..., None, None], np.eye(3), r)
+        t = np.where(degeneres[..., None], 0.0, t)
+    return r, t
+
+
+def matrice_4x4(r, t):
+    """Assemble rotation (..., 3, 3) et translation (..., 3) en matrices homogènes (..., 4, 4)"""
+    m = np.zeros(r.shape[:-2] + (4, 4))
+    m[..., :3, :3] = r
+    m[..., :3, 3] = t
+    m[..., 3, 3] = 1.0
+    return m
+
+
+def superposer_lot(mobiles, cibles, masques=None, cycles=10, cutoff=2.0):
+    """
+    Superpose B paires de C-alpha appariés en une seule fois.
+    mobiles, cibles : (B, N, 3) ; masques : (B, N) booléen (atomes présents).
+
+    Comme cmd.align : à chaque cycle, les paires dont l'écart dépasse
+    cutoff * RMSD sont rejetées, jusqu'à `cycles` cycles ou stabilité.
+    Les paires avec moins de MIN_ATOMES atomes présents donnent RMSD NaN, 0 atome et l'identité.
+    Renvoie (rmsd (B,), n_atomes (B,), transformations (B, 4, 4)).
+    """
+    mobiles = np.asarray(mobiles, dtype=np.float64)
+    cibles = np.asarray(cibles, dtype=np.float64)
+    if masques is None:
+        masques = np.ones(mobiles.shape[:2], dtype=bool)
+    masques = np.asarray(masques, dtype=bool).copy()
+
+    for cycle in range(cycles + 1):
+        r, t = kabsch(mobiles, cibles, masques)
+        ecarts = np.linalg.norm(mobiles @ np.swapaxes(r, -1, -2) + t[:, None, :] - cibles, axis=-1)
+        n = masques.sum(axis=1)
+        rmsd = np.sqrt((ecarts ** 2 * masques).sum(axis=1) / np.maximum(n, 1))
+        if cycle == cycles:
+            break
+
+        # rejet des outliers ; on garde l'ancien masque s'il resterait trop peu d'atomes
+        nouveaux = masques & (ecarts <= cutoff * rmsd[:, None])
+        trop_peu = nouveaux.sum(axis=1) < MIN_ATOMES
+        nouveaux[trop_peu] = masques[trop_peu]
+        if np.array_equal(nouveaux, masques):
+            break
+        masques = nouveaux
+
+    n = masques.sum(axis=1)
+    vides = n < MIN_ATOMES
+    return np.where(vides, np.nan, rmsd), np.where(vides, 0, n), matrice_4x4(r, t)
+
+
+def superposer(mobile, cible, cycles=10, cutoff=2.0):
+    """
+    Superpose les C-alpha `mobile` (N, 3) sur `cible` (N, 3), appariés ligne à ligne.
+    Renvoie (rmsd, nombre d'atomes gardés, transformation 4x4 à appliquer à mobile).
+    """
+    mobile = np.asarray(mobile, dtype=np.float64)
+    cible = np.asarray(cible, dtype=np.float64)
+    if len(mobile) != len(cible):
+        raise ValueError(f"nombre d'atomes différent : {len(mobile)} vs {len(cible)}")
+    if len(mobile) < MIN_ATOMES:
+        raise ValueError(f"au moins {MIN_ATOMES} paires d'atomes sont nécessaires ({len(mobile)} trouvées)")
+
+    rmsd, n_atomes, transformation = superposer_lot(mobile[None], cible[None],
+                                                    cycles=cycles, cutoff=cutoff)
+    return float(rmsd[0]), int(n_atomes[0]), transformation[0]
+
+
+def appliquer(transformation, coords):
+    """Applique une transformation 4x4 à des coordonnées (N, 3)"""
+    coords = np.asarray(coords)
+    return coords @ transformation[:3, :3].T + transformation[:3, 3]
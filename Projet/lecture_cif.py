@@ -0,0 +1,226 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Lecture rapide de la boucle _atom_site des fichiers mmCIF (ex: Super/*_aligned.cif)
+sans PyMOL et sans créer d'objet Python par atome :
+le texte est découpé en tokens avec NumPy puis converti colonne par colonne.
+
+- coordonnées en float32 (tableau (N, 3) sous la clé 'coords')
+- colonnes numériques (id, label_seq_id, ...) en int32
+- colonnes texte (noms d'atomes, résidus, chaînes...) en catégories :
+  Categorie(codes, valeurs) avec valeurs[codes] = colonne complète
+
+Usage (hors PyMOL) :
+    python3 lecture_cif.py ../Super --ca
+"""
+
+import glob
+import os
+import re
+import sys
+import time
+from collections import namedtuple
+
+import numpy as np
+
+# colonne texte stockée en codes entiers + tableau des valeurs distinctes
+Categorie = namedtuple('Categorie', ['codes', 'valeurs'])
+
+# valeur des colonnes entières quand le mmCIF contient '.' ou '?'
+MANQUANT = -999999
+
+COLONNES_COORDS = ('Cartn_x', 'Cartn_y', 'Cartn_z')
+COLONNES_FLOAT = ('occupancy', 'B_iso_or_equiv')
+COLONNES_INT = ('id', 'label_seq_id', 'auth_seq_id', 'pdbx_PDB_model_num', 'pdbx_formal_charge')
+
+# table de correspondance octet -> espace (plus rapide que np.isin sur tout le fichier)
+_ESPACES = np.zeros(256, dtype=bool)
+_ESPACES[[ord(c) for c in ' \t\r\n']] = True
+_QUOTES = (ord("'"), ord('"'))
+# un token mmCIF brut (guillemets compris), pour réécrire les lignes telles quelles
+_TOKEN = re.compile(rb"'[^']*'(?=\s|$)|\"[^\"]*\"(?=\s|$)|\S+")
+
+
+def _bloc_atom_site(texte):
+    """Renvoie (noms des colonnes, texte des lignes de données) de la boucle _atom_site"""
+    debut = texte.find(b'\n_atom_site.')
+    if debut < 0:
+        raise ValueError("pas de boucle _atom_site dans le fichier")
+
+    noms = []
+    position = debut + 1
+    while texte.startswith(b'_atom_site.', position):
+        fin_ligne = texte.find(b'\n', position)
+        noms.append(texte[position + len(b'_atom_site.'):fin_ligne].strip().decode())
+        position = fin_ligne + 1
+
+    # les données s'arrêtent au prochain '#', 'loop_', item '_' ou bloc 'data_'
+    fin = len(texte)
+    for marqueur in (b'\n#', b'\nloop_', b'\n_', b'\ndata_'):
+        trouve = texte.find(marqueur, position - 1)
+        if 0 <= trouve < fin:
+            fin = trouve
+    return noms, texte[position:fin]
+
+
+def lignes_atom_site(texte):
+    """
+    Boucle _atom_site brute du texte mmCIF `texte` (bytes), pour réécrire les lignes telles
+    quelles : renvoie (noms des colonnes, liste des lignes, chacune liste de tokens bytes,
+    guillemets compris). Lève une ValueError sans boucle _atom_site.
+    """
+    noms, donnees = _bloc_atom_site(texte)
+    return noms, [_TOKEN.findall(ligne) for ligne in donnees.split(b"\n") if ligne.strip()]
+
+
+def _tokens(donnees, n_colonnes):
+    """
+    Découpe les données en tokens sans passer par str.split :
+    renvoie deux tableaux (n_lignes, n_colonnes) de positions début/fin dans `buf`.
+    """
+    buf = np.frombuffer(donnees, dtype=np.uint8)
+    espace = _ESPACES[buf]
+    plein = ~espace
+    # un token commence après un espace et finit avant un espace
+    precedent = np.concatenate(([True], espace[:-1]))
+    suivant = np.concatenate((espace[1:], [True]))
+    debuts = np.flatnonzero(plein & precedent)
+    fins = np.flatnonzero(plein & suivant) + 1
+
+    if len(debuts) % n_colonnes != 0:
+        raise ValueError("nombre de valeurs incohérent dans _atom_site "
+                         "(valeurs entre guillemets contenant des espaces ?)")
+
+    # retirer les guillemets autour des valeurs ('O5'' ou "O5'")
+    quote = np.isin(buf[debuts], _QUOTES) & (buf[fins - 1] == buf[debuts]) & (fins - debuts >= 2)
+    debuts = debuts + quote
+    fins = fins - quote
+    return buf, debuts.reshape(-1, n_colonnes), fins.reshape(-1, n_colonnes)
+
+
+def _colonne_bytes(buf, debuts, fins):
+    """Colonne de tokens sous forme de tableau NumPy de chaînes d'octets de largeur fixe"""
+    longueurs = fins - debuts
+    largeur = max(int(longueurs.max()) if len(longueurs) else 1, 1)
+    decalage = np.arange(largeur)
+    index = np.minimum(debuts[:, None] + decalage, len(buf) - 1)
+    octets = np.where(decalage < longueurs[:, None], buf[index], 0).astype(np.uint8)
+    return octets.view(f'S{largeur}').reshape(-1)
+
+
+def _nombres(colonne, dtype, manquant):
+    """Convertit une colonne d'octets en nombres ; '.' et '?' deviennent `manquant`"""
+    absent = (colonne == b'.') | (colonne == b'?')
+    if absent.any():
+        colonne = np.where(absent, str(manquant).encode(), colonne)
+    if np.issubdtype(dtype, np.integer):
+        return colonne.astype(np.int64).astype(dtype)
+    return colonne.astype(dtype)
+
+
+def _categorie(colonne):
+    valeurs, codes = np.unique(colonne, return_inverse=True)
+    dtype = np.uint8 if len(valeurs) < 256 else np.int32
+    return Categorie(codes.astype(dtype).reshape(-1), valeurs.astype(str))
+
+
+def lire_atom_site(chemin, ca_seulement=False, chaines=None):
+    """
+    Lit la boucle _atom_site d'un fichier mmCIF.
+    ca_seulement : ne garder que les C-alpha (atome CA de type carbone)
+    chaines : ne garder que ces chaînes (auth_asym_id, ou label_asym_id à défaut)
+    Renvoie un dictionnaire colonne -> tableau (voir l'en-tête du module).
+    """
+    with open(chemin, 'rb') as f:
+        texte = f.read()
+    noms, donnees = _bloc_atom_site(texte)
+    buf, debuts, fins = _tokens(donnees, len(noms))
+    position = {nom: i for i, nom in enumerate(noms)}
+
+    def brute(nom):
+        j = position[nom]
+        return _colonne_bytes(buf, debuts[:, j], fins[:, j])
+
+    # filtrer les lignes avant toute conversion
+    garder = np.ones(len(debuts), dtype=bool)
+    if ca_seulement:
+        garder &= brute('label_atom_id') == b'CA'
+        if 'type_symbol' in position:
+            garder &= brute('type_symbol') == b'C'
+    if chaines is not None:
+        nom_chaine = 'auth_asym_id' if 'auth_asym_id' in position else 'label_asym_id'
+        garder &= np.isin(brute(nom_chaine), [c.encode() for c in chaines])
+    if not garder.all():
+        debuts, fins = debuts[garder], fins[garder]
+
+    structure = {}
+    if all(nom in position for nom in COLONNES_COORDS):
+        structure['coords'] = np.stack([_nombres(brute(nom), np.float32, 'nan')
+                                        for nom in COLONNES_COORDS], axis=1)
+    for nom in noms:
+        if nom in COLONNES_COORDS:
+            continue
+        if nom in COLONNES_FLOAT:
+            structure[nom] = _nombres(brute(nom), np.float32, 'nan')
+        elif nom in COLONNES_INT:
+            structure[nom] = _nombres(brute(nom), np.int32, MANQUANT)
+        else:
+            structure[nom] = _categorie(brute(nom))
+    return structure
+
+
+def valeurs(structure, nom):
+    """Colonne texte complète (une valeur par atome) à partir de sa catégorie"""
+    colonne = structure[nom]
+    return colonne.valeurs[colonne.codes]
+
+
+def numeros_residus(structure):
+    """Numéros de résidus tels que PyMOL les affiche (auth_seq_id, sinon label_seq_id)"""
+    if 'auth_seq_id' in structure:
+        return structure['auth_seq_id']
+    return structure['label_seq_id']
+
+
+def residus_ca(structure, chaine=None):
+    """
+    C-alpha d'une chaîne, un seul par résidu (premier modèle, première conformation).
+    Renvoie (numéros de résidus (N,), noms des résidus (N,), coordonnées (N, 3)),
+    triés par numéro de résidu.
+    """
+    garder = valeurs(structure, 'label_atom_id') == 'CA'
+    if 'type_symbol' in structure:
+        garder &= valeurs(structure, 'type_symbol') == 'C'
+    if chaine is not None:
+        nom_chaine = 'auth_asym_id' if 'auth_asym_id' in structure else 'label_asym_id'
+        garder &= valeurs(structure, nom_chaine) == chaine
+    if 'pdbx_PDB_model_num' in structure and len(structure['pdbx_PDB_model_num']):
+        garder &= structure['pdbx_PDB_model_num'] == structure['pdbx_PDB_model_num'][0]
+
+    lignes = np.flatnonzero(garder)
+    numeros = numeros_residus(structure)[lignes]
+    # np.unique garde la première occurrence de chaque résidu (conformation A)
+    numeros, premiers = np.unique(numeros, return_index=True)
+    lignes = lignes[premiers]
+    return numeros, valeurs(structure, 'label_comp_id')[lignes], np.asarray(structure['coords'][lignes])
+
+
+def lire_ensemble(dossier="../Super", motif="*_aligned.cif", **options):
+    """
+    Lit tous les fichiers du dossier correspondant au motif.
+    Renvoie un dictionnaire PDB ID -> structure (options : voir lire_atom_site).
+    """
+    ensemble = {}
+    for chemin in sorted(glob.glob(os.path.join(dossier, motif))):
+        pdb_id = os.path.basename(chemin).split('_')[0]
+        ensemble[pdb_id] = lire_atom_site(chemin, **options)
+    return ensemble
+
+
+if __name__ == "__main__":
+    dossier = sys.argv[1] if len(sys.argv) > 1 and not sys.argv[1].startswith('--') else "../Super"
+    debut = time.perf_counter()
+    ensemble = lire_ensemble(dossier, ca_seulement='--ca' in sys.argv)
+    duree = time.perf_counter() - debut
+    n_atomes = sum(len(s['coords']) for s in ensemble.values())
+    print(f"{len(ensemble)} structures, {n_atomes} atomes lus en {duree:.3f} s")
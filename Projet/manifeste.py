@@ -0,0 +1,100 @@
+"""
+Manifeste des superpositions pour des exécutions incrémentales et reprenables
+Fichier JSON lines à côté de superposition_results.csv : une ligne par structure
+superposée, ajoutée dès que la structure est traitée. Chaque ligne contient :
+    - la clé de l'entrée (PDB ID, assemblage, chaîne)
+    - la signature : SHA-256 du fichier d'entrée, référence, sélection, paramètres d'alignement
+    - le fichier de sortie et la ligne de résultats
+Une relance ne refait que les structures nouvelles, modifiées ou en erreur ;
+après un arrêt brutal, elle reprend là où le traitement s'était arrêté.
+"""
+
+import json
+import os
+
+from cache_coordonnees import cle_fichier
+
+
+def chemin_manifeste(output_csv):
+    """superposition_results.csv -> superposition_results_manifest.jsonl"""
+    return os.path.splitext(output_csv)[0] + "_manifest.jsonl"
+
+
+def cle_entree(entry_id, assembly_id, chain_id):
+    return f"{entry_id}-{assembly_id}-{chain_id}"
+
+
+def hash_fichier(chemin):
+    """SHA-256 du fichier s'il existe localement, sinon None (structure à télécharger)"""
+    return cle_fichier(chemin) if os.path.exists(chemin) else None
+
+
+def parametres_run(reference_pdb, reference_chain, lobe_start, lobe_end, **options):
+    """
+    Paramètres communs à toutes les entrées d'une exécution : référence (avec le hash
+    de son fichier), plage du lobe C et options d'alignement (moteur, correspondance...).
+    """
+    return {
+        'reference': reference_pdb,
+        'reference_chain': reference_chain,
+        'reference_sha256': hash_fichier(f"{reference_pdb}-assembly1.cif"),
+        'lobe_c': [lobe_start, lobe_end],
+        'cycles': 10,
+        'cutoff': 2.0,
+        **options,
+    }
+
+
+def signature(entry_id, assembly_id, parametres):
+    """Signature d'une entrée : hash du fichier d'entrée + paramètres de l'exécution"""
+    return {
+        'input_sha256': hash_fichier(f"{entry_id}-assembly{assembly_id}.cif"),
+        **parametres,
+    }
+
+
+def charger_manifeste(chemin):
+    """Dictionnaire clé -> dernier enregistrement du manifeste (vide s'il n'existe pas)"""
+    manifeste = {}
+    if not os.path.exists(chemin):
+        return manifeste
+    with open(chemin) as f:
+        for ligne in f:
+            ligne = ligne.strip()
+            if not ligne:
+                continue
+            try:
+                record = json.loads(ligne)
+            except json.JSONDecodeError:
+                # dernière ligne tronquée par un arrêt brutal
+                continue
+            manifeste[record['cle']] = record
+    return manifeste
+
+
+def a_jour(record, sig):
+    """True si l'entrée a déjà été superposée avec les mêmes entrées et paramètres"""
+    if record is None or record.get('signature') != sig:
+        return False
+    if record['result'].get('Status') == 'ERROR':
+        return False
+    return os.path.exists(record['output'])
+
+
+def ajouter(chemin, cle, sig, result, output):
+    """Ajoute un enregistrement au manifeste et l'écrit immédiatement sur le disque"""
+    record = {'cle': cle, 'signature': sig, 'output': output, 'result': result}
+    with open(chemin, 'a') as f:
+        f.write(json.dumps(record) + "\n")
+        f.flush()
+        os.fsync(f.fileno())
+    return record
+
+
+def compacter(chemin, manifeste):
+    """Réécrit le manifeste avec un seul enregistrement (le plus récent) par entrée"""
+    temporaire = chemin + ".tmp"
+    with open(temporaire, 'w') as f:
+        for record in manifeste.values():
+            f.write(json.dumps(record) + "\n")
+    os.replace(temporaire, chemin)
@@ -0,0 +1,293 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Matrice N x N des RMSD entre toutes les structures superposées (Super/*_aligned.cif)
+Les C-alpha du lobe C d'ALK sont empilés dans un tableau (N, R, 3) indexé par
+numéro de résidu (masque des résidus présents), puis :
+    - sans resuperposition : les structures étant déjà dans le repère de 4WB8,
+      RMSD_ij = écart sur les résidus communs, calculé par produits matriciels
+      par blocs de lignes (mémoire bornée)
+    - avec --superposer : chaque paire est resuperposée (Kabsch par lots, kabsch.py)
+Puis classification hiérarchique (lien moyen) et médoïde de chaque groupe.
+
+Sorties :
+    rmsd_matrice.npz   : noms, résidus, matrice RMSD (float32)
+    rmsd_clusters.csv  : PDB_ID, Cluster, Medoid, RMSD_to_medoid
+
+Usage (hors PyMOL, depuis le dossier Projet/) :
+    python3 matrice_rmsd.py ../Super --seuil 1.5
+    python3 matrice_rmsd.py ../Super --superposer --cycles 5
+"""
+
+import argparse
+import csv
+import glob
+import os
+import time
+
+import numpy as np
+
+import kabsch
+from lecture_cif import lire_atom_site, residus_ca, valeurs
+
+# lobe C d'ALK (numérotation UniProt Q9UM73) : après la charnière E1197-M1199
+ALK_LOBE_C_START = 1200
+ALK_LOBE_C_END = 1400
+# seuil de coupure de l'arbre (Å) pour former les groupes
+SEUIL = 1.5
+
+
+def chaines_resultats(results_csv):
+    """PDB ID -> chaîne superposée, d'après superposition_results.csv (entrées en erreur exclues)"""
+    chaines = {}
+    if not os.path.exists(results_csv):
+        return chaines
+    with open(results_csv, newline='') as f:
+        for row in csv.DictReader(f):
+            if row['Status'] != 'ERROR':
+                chaines[row['PDB_ID']] = row['Chain']
+    return chaines
+
+
+def lire_ca(dossier="../Super", motif="*_aligned.cif", chaines=None, cache_dir=None):
+    """
+    C-alpha de chaque structure du dossier : liste de (PDB ID, (numéros, noms, coordonnées)).
+    La chaîne est prise dans `chaines` (voir chaines_resultats), sinon la première du fichier.
+    """
+    if cache_dir:
+        from cache_coordonnees import charger_coordonnees
+    chaines = chaines or {}
+    ca = []
+    for chemin in sorted(glob.glob(os.path.join(dossier, motif))):
+        pdb_id = os.path.basename(chemin).split('_')[0]
+        if cache_dir:
+            structure = charger_coordonnees(chemin, cache_dir, ca_seulement=True)
+        else:
+            structure = lire_atom_site(chemin, ca_seulement=True)
+        if len(structure['coords']) == 0:
+            continue
+        nom_chaine = 'auth_asym_id' if 'auth_asym_id' in structure else 'label_asym_id'
+        chaine = chaines.get(pdb_id, valeurs(structure, nom_chaine)[0])
+        ca.append((pdb_id, residus_ca(structure, chaine)))
+    return ca
+
+
+def empiler(ca, debut=ALK_LOBE_C_START, fin=ALK_LOBE_C_END):
+    """
+    Empile les C-alpha des résidus debut-fin de toutes les structures.
+    Renvoie (noms (N,), résidus (R,), coordonnées (N, R, 3), masques (N, R)) ;
+    les résidus absents ont des coordonnées nulles et un masque False.
+    """
+    noms = np.array([pdb_id for pdb_id, _ in ca])
+    garder = [(numeros >= debut) & (numeros <= fin) for _, (numeros, _, _) in ca]
+    residus = np.unique(np.concatenate([c[1][0][g] for c, g in zip(ca, garder)] or [np.zeros(0, np.int32)]))
+
+    coords = np.zeros((len(ca), len(residus), 3))
+    masques = np.zeros((len(ca), len(residus)), dtype=bool)
+    for i, ((_, (numeros, _, xyz)), g) in enumerate(zip(ca, garder)):
+        colonnes = np.searchsorted(residus, numeros[g])
+        coords[i, colonnes] = xyz[g]
+        masques[i, colonnes] = True
+    return noms, residus, coords, masques
+
+
+def depuis_ensemble(chemin, debut=ALK_LOBE_C_START, fin=ALK_LOBE_C_END):
+    """Mêmes tableaux que empiler, tranchés dans le tenseur des C-alpha (tenseur_ensemble.py)"""
+    from tenseur_ensemble import colonnes_residus, ouvrir_ensemble
+
+    coords, masque, index = ouvrir_ensemble(chemin)
+    if index['atomes'] != ['CA']:
+        raise ValueError(f"{chemin} : tenseur des C-alpha attendu (atomes {index['atomes']})")
+    colonnes = colonnes_residus(index, debut, fin)
+    masques = np.asarray(masque[:, colonnes])
+    coords = np.where(masques[..., None], coords[:, colonnes], 0.0).astype(np.float64)
+    noms = np.array([pdb_id for pdb_id, _, _ in index['entrees']])
+    return noms, np.asarray(index['residus'][colonnes]), coords, masques
+
+
+def rmsd_meme_repere(coords, masques, taille_bloc=512):
+    """
+    RMSD entre toutes les paires dans le repère commun, sur les résidus présents des deux côtés :
+    sum |x_i - x_j|² = sum m_j |x_i|² + sum m_i |x_j|² - 2 x_i . x_j (coordonnées masquées à 0).
+    Les paires avec moins de kabsch.MIN_ATOMES résidus communs valent NaN.
+    """
+    n = len(coords)
+    m = masques.astype(np.float64)
+    carres = (coords ** 2).sum(axis=-1) * m
+    plats = (coords * m[..., None]).reshape(n, -1)
+
+    rmsd = np.empty((n, n), dtype=np.float32)
+    for debut in range(0, n, taille_bloc):
+        bloc = slice(debut, min(debut + taille_bloc, n))
+        communs = m[bloc] @ m.T
+        somme = carres[bloc] @ m.T + m[bloc] @ carres.T - 2.0 * plats[bloc] @ plats.T
+        with np.errstate(invalid='ignore', divide='ignore'):
+            valeur = np.sqrt(np.maximum(somme, 0.0) / communs)
+        valeur[communs < kabsch.MIN_ATOMES] = np.nan
+        rmsd[bloc] = valeur
+    np.fill_diagonal(rmsd, 0.0)
+    return rmsd
+
+
+def rmsd_superpose(coords, masques, taille_lot=4096, cycles=0, cutoff=2.0):
+    """
+    RMSD entre toutes les paires après superposition de chaque paire (kabsch.superposer_lot),
+    sur les résidus communs ; `cycles`/`cutoff` : rejet des outliers comme cmd.align.
+    Les paires sont traitées par lots de `taille_lot` (triangle supérieur).
+    """
+    n = len(coords)
+    rmsd = np.zeros((n, n), dtype=np.float32)
+    lignes, colonnes = np.triu_indices(n, k=1)
+    for debut in range(0, len(lignes), taille_lot):
+        i = lignes[debut:debut + taille_lot]
+        j = colonnes[debut:debut + taille_lot]
+        communs = masques[i] & masques[j]
+        valides = communs.sum(axis=1) >= kabsch.MIN_ATOMES
+        valeur = np.full(len(i), np.nan, dtype=np.float32)
+        if valides.any():
+            valeur[valides], _, _ = kabsch.superposer_lot(coords[i[valides]], coords[j[valides]],
+                                                          communs[valides], cycles=cycles, cutoff=cutoff)
+        rmsd[i, j] = valeur
+        rmsd[j, i] = valeur
+    return rmsd
+
+
+def classification(rmsd):
+    """
+    Classification hiérarchique par lien moyen (algorithme de la chaîne des plus proches
+    voisins, O(N²) en mémoire et en temps). Les RMSD NaN sont remplacés par le maximum.
+    Renvoie la liste des fusions (a, b, hauteur) dans l'ordre croissant des hauteurs,
+    a et b étant des index de structures représentant chacun un des deux groupes fusionnés.
+    """
+    n = len(rmsd)
+    d = np.array(rmsd, dtype=np.float64)
+    d[np.isnan(d)] = np.nanmax(d) if np.isfinite(d).any() else 0.0
+    np.fill_diagonal(d, np.inf)
+    taille = np.ones(n)
+    actif = np.ones(n, dtype=bool)
+    fusions = []
+    chaine = []
+
+    while actif.sum() > 1:
+        if not chaine:
+            chaine.append(int(np.flatnonzero(actif)[0]))
+        a = chaine[-1]
+        b = int(np.argmin(d[a]))
+        # départager en faveur du prédécesseur dans la chaîne : fusion des voisins réciproques
+        if len(chaine) > 1 and d[a, chaine[-2]] <= d[a, b]:
+            b = chaine[-2]
+        if len(chaine) < 2 or b != chaine[-2]:
+            chaine.append(b)
+            continue
+
+        chaine.pop()
+        chaine.pop()
+        fusions.append((a, b, d[a, b]))
+        # mise à jour de Lance-Williams (lien moyen) : le groupe fusionné garde l'index a
+        nouvelle = (taille[a] * d[a] + taille[b] * d[b]) / (taille[a] + taille[b])
+        d[a] = nouvelle
+        d[:, a] = nouvelle
+        d[a, a] = np.inf
+        d[b] = np.inf
+        d[:, b] = np.inf
+        taille[a] += taille[b]
+        actif[b] = False
+
+    fusions.sort(key=lambda fusion: fusion[2])
+    return fusions
+
+
+def groupes(fusions, n, seuil=SEUIL):
+    """Numéro de groupe de chaque structure en coupant l'arbre à `seuil` Å"""
+    parent = np.arange(n)
+
+    def racine(i):
+        while parent[i] != i:
+            parent[i] = parent[parent[i]]
+            i = parent[i]
+        return i
+
+    for a, b, hauteur in fusions:
+        if hauteur > seuil:
+            break
+        parent[racine(b)] = racine(a)
+    racines = np.array([racine(i) for i in range(n)])
+    # groupes numérotés par taille décroissante
+    uniques, etiquettes, effectifs = np.unique(racines, return_inverse=True, return_counts=True)
+    ordre = np.argsort(-effectifs, kind='stable')
+    rang = np.empty(len(uniques), dtype=int)
+    rang[ordre] = np.arange(len(uniques))
+    return rang[etiquettes]
+
+
+def medoides(rmsd, etiquettes):
+    """Index du médoïde de chaque groupe : structure de RMSD moyen minimal aux autres membres"""
+    d = np.nan_to_num(np.asarray(rmsd, dtype=np.float64), nan=np.nanmax(rmsd) if np.isfinite(rmsd).any() else 0.0)
+    resultat = {}
+    for groupe in np.unique(etiquettes):
+        membres = np.flatnonzero(etiquettes == groupe)
+        resultat[int(groupe)] = int(membres[np.argmin(d[np.ix_(membres, membres)].sum(axis=1))])
+    return resultat
+
+
+def ecrire_groupes(noms, rmsd, etiquettes, centres, output_csv):
+    with open(output_csv, 'w', newline='') as f:
+        writer = csv.writer(f)
+        writer.writerow(['PDB_ID', 'Cluster', 'Medoid', 'RMSD_to_medoid'])
+        for i, nom in enumerate(noms):
+            centre = centres[int(etiquettes[i])]
+            writer.writerow([nom, int(etiquettes[i]), noms[centre], f"{rmsd[i, centre]:.2f}"])
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Matrice des RMSD entre toutes les structures superposées")
+    parser.add_argument("dossier", nargs="?", default="../Super", help="dossier des structures *_aligned.cif")
+    parser.add_argument("--resultats", default="superposition_results.csv",
+                        help="résultats de la superposition (chaîne de chaque structure)")
+    parser.add_argument("--residus", default=f"{ALK_LOBE_C_START}-{ALK_LOBE_C_END}",
+                        help="plage de résidus ALK comparée (lobe C par défaut)")
+    parser.add_argument("--superposer", action="store_true",
+                        help="resuperposer chaque paire au lieu d'utiliser le repère commun")
+    parser.add_argument("--cycles", type=int, default=0, help="cycles de rejet des outliers (avec --superposer)")
+    parser.add_argument("--cutoff", type=float, default=2.0, help="seuil de rejet (avec --superposer)")
+    parser.add_argument("--seuil", type=float, default=SEUIL, help="coupure de l'arbre en groupes (Å)")
+    parser.add_argument("--taille-bloc", type=int, default=512, help="lignes de la matrice calculées à la fois")
+    parser.add_argument("--taille-lot", type=int, default=4096, help="paires superposées à la fois (avec --superposer)")
+    parser.add_argument("--cache-dir", default=None, help="cache binaire des coordonnées (cache_coordonnees.py)")
+    parser.add_argument("--ensemble", default=None,
+                        help="tenseur des C-alpha (tenseur_ensemble.py) au lieu de relire les fichiers")
+    parser.add_argument("--output", default="rmsd_matrice.npz", help="matrice RMSD")
+    parser.add_argument("--clusters", default="rmsd_clusters.csv", help="groupes et médoïdes")
+    args = parser.parse_args()
+    debut, fin = (int(x) for x in args.residus.split("-"))
+
+    t0 = time.perf_counter()
+    if args.ensemble:
+        noms, residus, coords, masques = depuis_ensemble(args.ensemble, debut, fin)
+    else:
+        ca = lire_ca(args.dossier, chaines=chaines_resultats(args.resultats), cache_dir=args.cache_dir)
+        noms, residus, coords, masques = empiler(ca, debut, fin)
+    t1 = time.perf_counter()
+    if args.superposer:
+        rmsd = rmsd_superpose(coords, masques, args.taille_lot, args.cycles, args.cutoff)
+    else:
+        rmsd = rmsd_meme_repere(coords, masques, args.taille_bloc)
+    t2 = time.perf_counter()
+    fusions = classification(rmsd)
+    etiquettes = groupes(fusions, len(noms), args.seuil)
+    centres = medoides(rmsd, etiquettes)
+    t3 = time.perf_counter()
+
+    np.savez(args.output, noms=noms, residus=residus, rmsd=rmsd)
+    ecrire_groupes(noms, rmsd, etiquettes, centres, args.clusters)
+
+    print(f"{len(noms)} structures, {len(residus)} résidus ({debut}-{fin})")
+    print(f"  lecture {t1 - t0:.2f} s, matrice {t2 - t1:.2f} s, classification {t3 - t2:.2f} s")
+    print(f"{len(centres)} groupes (coupure à {args.seuil} Å) :")
+    for groupe, centre in sorted(centres.items())[:10]:
+        print(f"  groupe {groupe} : {np.sum(etiquettes == groupe)} structures, médoïde {noms[centre]}")
+    print(f"🕺🏻 Matrice sauvegardée dans {args.output}, groupes dans {args.clusters}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,277 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Mesures par étape de la boucle de superposition
+Chaque étape d'une structure (téléchargement, chargement, suppression du solvant,
+alignement, sauvegarde...) est enregistrée avec :
+    - le temps réel et le temps CPU (s)
+    - la variation de mémoire Python (tracemalloc) et son pic pendant l'étape (Ko)
+    - la variation de mémoire résidente du processus (RSS, Ko), qui voit aussi PyMOL
+Les relevés sont écrits au fur et à mesure (JSON lines, ou CSV si le fichier finit par .csv).
+À la fin : tableau p50/p95/max par étape et, en option, profils cProfile des N
+structures les plus lentes (un fichier .prof par structure, lisible avec pstats/snakeviz).
+
+Tant que activer() n'a pas été appelé, etape() et entree() ne mesurent rien.
+
+Usage (hors PyMOL, depuis le dossier Projet/) :
+    python3 mesures.py superposition_results_mesures.jsonl      # résumé d'une exécution
+"""
+
+import cProfile
+import csv
+import heapq
+import json
+import os
+import sys
+import time
+import tracemalloc
+from contextlib import contextmanager
+
+CHAMPS = ['PDB_ID', 'etape', 'temps_s', 'cpu_s', 'python_ko', 'pic_python_ko', 'rss_ko']
+# étape qui couvre toute la structure
+TOTAL = "total"
+
+_actif = False
+_memoire = False
+_fichier = None
+_writer = None
+_releves = []
+_n_envoyes = 0
+_entree = None
+_en_cours = None
+_n_profils = 0
+_dossier_profils = "profils"
+_plus_lents = []
+# début de l'exécution (horloge des fichiers) : seuls les profils écrits depuis sont supprimés
+_debut = None
+
+
+def _rss():
+    """Mémoire résidente actuelle du processus en Ko (Linux), None ailleurs"""
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE") // 1024
+    except (OSError, ValueError, IndexError):
+        return None
+
+
+def activer(chemin=None, memoire=True, profils=0, dossier_profils="profils"):
+    """
+    Active les mesures.
+    chemin : fichier des relevés (.jsonl ou .csv), None pour les garder en mémoire seulement
+    memoire : suivre les allocations Python avec tracemalloc (ralentit le code Python)
+    profils : garder le profil cProfile des `profils` structures les plus lentes
+    """
+    global _actif, _memoire, _fichier, _writer, _n_profils, _dossier_profils, _debut
+    _actif = True
+    _debut = time.time()
+    _memoire = memoire
+    _n_profils = profils
+    _dossier_profils = dossier_profils
+    if memoire and not tracemalloc.is_tracing():
+        tracemalloc.start()
+    if profils:
+        os.makedirs(dossier_profils, exist_ok=True)
+    if chemin is not None:
+        _fichier = open(chemin, 'w', newline='')
+        if chemin.endswith(".csv"):
+            _writer = csv.DictWriter(_fichier, fieldnames=CHAMPS)
+            _writer.writeheader()
+
+
+def _ecrire(releve):
+    _releves.append(releve)
+    if _fichier is None:
+        return
+    if _writer is not None:
+        _writer.writerow(releve)
+    else:
+        _fichier.write(json.dumps(releve) + "\n")
+    _fichier.flush()
+
+
+def ajouter(releves):
+    """Ajoute des relevés faits dans un autre processus (superposition_parallele.py)"""
+    for releve in releves:
+        _ecrire(releve)
+
+
+def a_envoyer():
+    """Relevés faits depuis le dernier appel (renvoyés au processus principal par les processus de calcul)"""
+    global _n_envoyes
+    releves = _releves[_n_envoyes:]
+    _n_envoyes = len(_releves)
+    return releves
+
+
+@contextmanager
+def etape(nom):
+    """Mesure le bloc `with etape("alignement"):` pour la structure en cours"""
+    if not _actif:
+        yield
+        return
+    rss_avant = _rss()
+    if _memoire:
+        python_avant = tracemalloc.get_traced_memory()[0]
+        tracemalloc.reset_peak()
+    debut, debut_cpu = time.perf_counter(), time.process_time()
+    try:
+        yield
+    finally:
+        releve = {
+            'PDB_ID': _entree,
+            'etape': nom,
+            'temps_s': round(time.perf_counter() - debut, 6),
+            'cpu_s': round(time.process_time() - debut_cpu, 6),
+            'python_ko': None,
+            'pic_python_ko': None,
+            'rss_ko': None,
+        }
+        if _memoire:
+            courante, pic = tracemalloc.get_traced_memory()
+            releve['python_ko'] = round((courante - python_avant) / 1024, 1)
+            releve['pic_python_ko'] = round((pic - python_avant) / 1024, 1)
+        rss_apres = _rss()
+        if rss_avant is not None and rss_apres is not None:
+            releve['rss_ko'] = rss_apres - rss_avant
+        _ecrire(releve)
+
+
+def _garder_profil(entry_id, duree, profileur):
+    """Écrit le profil s'il fait partie des `_n_profils` structures les plus lentes du processus"""
+    if len(_plus_lents) >= _n_profils and duree <= _plus_lents[0][0]:
+        return
+    profileur.dump_stats(os.path.join(_dossier_profils, f"{entry_id}.prof"))
+    heapq.heappush(_plus_lents, (duree, entry_id))
+    if len(_plus_lents) > _n_profils:
+        _, ecarte = heapq.heappop(_plus_lents)
+        try:
+            os.remove(os.path.join(_dossier_profils, f"{ecarte}.prof"))
+        except FileNotFoundError:
+            pass
+
+
+def commencer(entry_id):
+    """
+    Début d'une structure : les étapes suivantes lui sont rattachées jusqu'à finir(),
+    qui relève le tout comme étape TOTAL (profilé si activer(profils=N)).
+    """
+    global _entree, _en_cours
+    if not _actif:
+        return
+    _entree = entry_id
+    profileur = cProfile.Profile() if _n_profils else None
+    _en_cours = (profileur, _rss(), time.perf_counter(), time.process_time())
+    if profileur is not None:
+        profileur.enable()
+
+
+def finir():
+    """Fin de la structure commencée par commencer()"""
+    global _entree, _en_cours
+    if not _actif or _en_cours is None:
+        return
+    profileur, rss_avant, debut, debut_cpu = _en_cours
+    if profileur is not None:
+        profileur.disable()
+    duree = time.perf_counter() - debut
+    rss_apres = _rss()
+    _ecrire({
+        'PDB_ID': _entree,
+        'etape': TOTAL,
+        'temps_s': round(duree, 6),
+        'cpu_s': round(time.process_time() - debut_cpu, 6),
+        'python_ko': None,
+        'pic_python_ko': None,
+        'rss_ko': rss_apres - rss_avant if rss_avant is not None and rss_apres is not None else None,
+    })
+    if profileur is not None:
+        _garder_profil(_entree, duree, profileur)
+    _entree = _en_cours = None
+
+
+@contextmanager
+def entree(entry_id):
+    """`with entree("2XB7"):` : commencer() puis finir() autour du bloc"""
+    commencer(entry_id)
+    try:
+        yield
+    finally:
+        finir()
+
+
+def resume(releves=None):
+    """
+    Statistiques du temps réel par étape : étape -> {n, total, p50, p95, max, plus_lent}
+    (étapes dans l'ordre de leur première apparition)
+    """
+    import numpy as np
+
+    releves = _releves if releves is None else releves
+    par_etape = {}
+    for releve in releves:
+        par_etape.setdefault(releve['etape'], []).append(releve)
+    statistiques = {}
+    for nom, liste in par_etape.items():
+        temps = np.array([float(r['temps_s']) for r in liste])
+        statistiques[nom] = {
+            'n': len(temps),
+            'total': float(temps.sum()),
+            'p50': float(np.percentile(temps, 50)),
+            'p95': float(np.percentile(temps, 95)),
+            'max': float(temps.max()),
+            'plus_lent': liste[int(temps.argmax())]['PDB_ID'],
+        }
+    return statistiques
+
+
+def afficher_resume(releves=None):
+    """Tableau p50/p95/max du temps réel de chaque étape"""
+    statistiques = resume(releves)
+    if not statistiques:
+        return
+    print(f"\n{'Étape':<16} {'N':>6} {'Total (s)':>10} {'p50 (ms)':>10} {'p95 (ms)':>10} {'max (ms)':>10}  Plus lent")
+    print("-" * 80)
+    for nom, s in statistiques.items():
+        print(f"{nom:<16} {s['n']:>6} {s['total']:>10.2f} {s['p50'] * 1e3:>10.1f} {s['p95'] * 1e3:>10.1f} "
+              f"{s['max'] * 1e3:>10.1f}  {s['plus_lent'] or ''}")
+
+
+def terminer():
+    """
+    Ferme le fichier des relevés et ne garde que les profils des structures les plus lentes
+    de l'exécution (chaque processus de calcul a gardé ses propres plus lentes).
+    Seuls les profils écrits par cette exécution sont supprimés : fichiers nommés d'après une
+    structure mesurée et modifiés depuis activer() (ceux des processus de calcul compris) ;
+    les profils des exécutions précédentes et les autres fichiers .prof du dossier sont gardés.
+    """
+    global _actif, _fichier, _writer
+    if _fichier is not None:
+        _fichier.close()
+    _fichier = _writer = None
+    if _n_profils and os.path.isdir(_dossier_profils):
+        totaux = sorted(((float(r['temps_s']), r['PDB_ID']) for r in _releves if r['etape'] == TOTAL),
+                        reverse=True)
+        gardes = {f"{entry_id}.prof" for _, entry_id in totaux[:_n_profils]}
+        ecrits = {f"{entry_id}.prof" for _, entry_id in totaux}
+        for nom in ecrits - gardes:
+            chemin = os.path.join(_dossier_profils, nom)
+            try:
+                if os.path.getmtime(chemin) >= _debut:
+                    os.remove(chemin)
+            except FileNotFoundError:
+                pass
+    _actif = False
+
+
+def lire_releves(chemin):
+    """Relit un fichier de relevés (.jsonl ou .csv)"""
+    with open(chemin, newline='') as f:
+        if chemin.endswith(".csv"):
+            return list(csv.DictReader(f))
+        return [json.loads(ligne) for ligne in f if ligne.strip()]
+
+
+if __name__ == "__main__":
+    chemin = sys.argv[1] if len(sys.argv) > 1 else "superposition_results_mesures.jsonl"
+    afficher_resume(lire_releves(chemin))
@@ -0,0 +1,281 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Superposition sur plusieurs références en un seul passage (hors PyMOL, moteur NumPy)
+Chaque assemblage ALK est lu une seule fois (cache binaire, voir cache_coordonnees.py)
+puis superposé sur toutes les références, chacune avec sa chaîne et son lobe C :
+    - C-alpha des références lus une fois par processus
+    - paires cible / lobe C de chaque référence par correspondance_residus.py (mis en cache),
+      sinon par numéros de résidus
+    - Kabsch avec rejet des outliers (kabsch.py, 10 cycles, cutoff 2.0 comme cmd.align)
+Sorties :
+    - superposition_multi.csv : une ligne par structure, colonnes N_CA_aligned / RMSD / Status
+      et TM_score / GDT_TS / LDDT (qualite.py) par référence (suffixe <PDB>_<chaîne>)
+    - un index des transformations par référence (superposition_multi_<PDB>_<chaîne>_transforms.jsonl,
+      format de index_transformations.py) : les structures alignées sur n'importe quelle
+      référence sont reconstruites à la demande avec materialiser
+    - un tableau des écarts par résidu par référence (superposition_multi_<PDB>_<chaîne>_ecarts.npy,
+      voir ecarts_residus.py)
+
+Usage (hors PyMOL, depuis le dossier Projet/) :
+    python3 multi_references.py --references 4WB8:A:127-350 1ATP:E:127-300
+    python3 multi_references.py --references 4WB8:A:127-350 1ATP:E:127-300 --workers 8 --mesures mesures.jsonl
+"""
+
+import argparse
+import csv
+import os
+from multiprocessing import Pool
+
+import kabsch
+import mesures
+from doublons import ca_entree
+from ecarts_residus import chemins_ecarts, ecarts, ecrire_ecarts
+from index_transformations import chemin_index, enregistrer
+from qualite import METRIQUES, formater, scores_superposition
+from profil_chaines import PROFIL_DIR, choisir_chaines
+from rapport_rcsb import ALK_UNIPROT, lire_rapport, selectionner
+from superposition import CRITERES_STATUT, coordonnees_residus, paires_residus, statut
+from telechargement import SOURCE_RCSB, N_REQUETES, nom_assemblage, prefetch
+
+csv_file = "rcsb_pdb_custom_report.csv"
+output_csv = "superposition_multi.csv"
+# (PDB, chaîne, début du lobe C, fin du lobe C) : références de open_pdb_csv.py
+# et de not_submit/test_superposition.py
+REFERENCES = [("4WB8", "A", 127, 350), ("1ATP", "E", 127, 300)]
+# paramètres de cmd.align dans open_pdb_csv.py
+CYCLES = 10
+CUTOFF = 2.0
+# en dessous, la correspondance puis le lobe C par numéros sont abandonnés (comme superposer_entree)
+MIN_PAIRES = 20
+
+# état propre à chaque processus : références et leurs C-alpha, options
+_references = []
+_options = {}
+
+
+def lire_reference(texte):
+    """'4WB8:A:127-350' -> ('4WB8', 'A', 127, 350)"""
+    try:
+        pdb_id, chaine, lobe = texte.split(":")
+        debut, fin = (int(n) for n in lobe.split("-"))
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"référence attendue sous la forme PDB:CHAÎNE:DÉBUT-FIN, pas {texte!r}")
+    return pdb_id.upper(), chaine, debut, fin
+
+
+def nom_reference(reference):
+    """('4WB8', 'A', 127, 350) -> '4WB8_A' (suffixe des colonnes et des index)"""
+    return f"{reference[0]}_{reference[1]}"
+
+
+def champs_resultats(references):
+    """Colonnes du fichier de résultats : PDB_ID, Chain puis six colonnes par référence"""
+    champs = ['PDB_ID', 'Chain']
+    for reference in references:
+        nom = nom_reference(reference)
+        champs += [f'N_CA_aligned_{nom}', f'RMSD_{nom}', f'Status_{nom}']
+        champs += [f'{metrique}_{nom}' for metrique in METRIQUES]
+    return champs
+
+
+def superposer_references(ca_cible, references, correspondance=True, cycles=CYCLES, cutoff=CUTOFF):
+    """
+    Superpose une cible sur chaque référence (liste de (référence, C-alpha de sa chaîne)).
+    Renvoie une liste de (rmsd, C-alpha gardés, transformation 4x4, écarts par résidu
+    (voir ecarts_residus.ecarts), TM-score / GDT_TS / LDDT (voir qualite.py)),
+    None si la superposition sur cette référence a échoué.
+    """
+    superpositions = []
+    for (_, _, lobe_start, lobe_end), ca_ref in references:
+        try:
+            with mesures.etape("correspondance"):
+                residus_cible, residus_ref = paires_residus(ca_cible, ca_ref, lobe_start, lobe_end,
+                                                            correspondance, MIN_PAIRES)
+            with mesures.etape("alignement"):
+                rmsd, n_aligned, transformation = kabsch.superposer(coordonnees_residus(ca_cible, residus_cible),
+                                                                    coordonnees_residus(ca_ref, residus_ref),
+                                                                    cycles=cycles, cutoff=cutoff)
+            with mesures.etape("ecarts"):
+                profil = ecarts(ca_cible, ca_ref, (residus_cible, residus_ref), transformation)
+            with mesures.etape("qualite"):
+                scores = scores_superposition(ca_cible, ca_ref, (residus_cible, residus_ref),
+                                              lobe_start, lobe_end, transformation)
+            superpositions.append((rmsd, n_aligned, transformation, profil, scores))
+        except ValueError:
+            superpositions.append(None)
+    return superpositions
+
+
+def resultat_reference(superposition, critere="RMSD"):
+    """Ligne de résultats au format RESULTS_FIELDS (sans PDB_ID ni Chain) d'une superposition"""
+    if superposition is None:
+        return {'N_CA_aligned': 0, 'RMSD': 'N/A', 'Status': 'ERROR', **formater(None)}
+    rmsd, n_aligned, _, _, scores = superposition
+    return {'N_CA_aligned': n_aligned, 'RMSD': f"{rmsd:.2f}", 'Status': statut(rmsd, scores, critere),
+            **formater(scores)}
+
+
+def ligne_resultats(entry_id, chain_id, references, superpositions, critere="RMSD"):
+    """Ligne du fichier de résultats (voir champs_resultats)"""
+    ligne = {'PDB_ID': entry_id, 'Chain': chain_id}
+    for reference, superposition in zip(references, superpositions):
+        nom = nom_reference(reference)
+        ligne.update({f'{champ}_{nom}': valeur
+                      for champ, valeur in resultat_reference(superposition, critere).items()})
+    return ligne
+
+
+def _init_worker(references, options, options_mesures=None):
+    """Références (référence, C-alpha de sa chaîne) déjà lues par le processus principal"""
+    global _references, _options
+    if options_mesures is not None:
+        mesures.activer(None, **options_mesures)
+    _options = options
+    _references = references
+
+
+def _traiter_entree(entree):
+    """Lit une cible une seule fois et la superpose sur toutes les références"""
+    entry_id, assembly_id, chain_id = entree
+    mesures.commencer(entry_id)
+    try:
+        with mesures.etape("coordonnees"):
+            ca_cible = ca_entree(nom_assemblage(entry_id, assembly_id), chain_id, _options['cache_dir'])
+        superpositions = superposer_references(ca_cible, _references, _options['correspondance'])
+    except (ValueError, OSError):
+        superpositions = [None] * len(_references)
+    mesures.finir()
+    return entree, superpositions, mesures.a_envoyer()
+
+
+def superposer_multi(entrees, references, output=output_csv, n_workers=1, cache_dir=None,
+                     correspondance=True, options_mesures=None, critere="RMSD"):
+    """
+    Superpose toutes les entrées (entry_id, assembly_id, chain_id) sur toutes les références
+    (fichiers <PDB_ID>-assembly<N>.cif du dossier courant).
+    Les assemblages absents donnent des lignes en erreur.
+    Les lignes de résultats sont écrites au fur et à mesure dans `output`, les transformations
+    dans un index par référence, les écarts par résidu dans un tableau par référence
+    (ecarts_residus.py). `critere` : RMSD ou métrique de qualite.py pour les statuts.
+    Les C-alpha des références sont lus une seule fois, ici : une référence illisible arrête
+    le run (SystemExit) avant le démarrage des processus.
+    Renvoie (lignes de résultats, chemins des index).
+    """
+    ca_references = []
+    for reference in references:
+        try:
+            ca_references.append((reference, ca_entree(nom_assemblage(reference[0], 1), reference[1], cache_dir)))
+        except (ValueError, OSError) as e:
+            raise SystemExit(f"🙈 erreur : référence {nom_reference(reference)} illisible : {e}")
+    champs = champs_resultats(references)
+    index_files = [chemin_index(f"{os.path.splitext(output)[0]}_{nom_reference(r)}.csv") for r in references]
+    for index_file in index_files:
+        if os.path.exists(index_file):
+            os.remove(index_file)
+    options = dict(cache_dir=cache_dir, correspondance=correspondance)
+
+    results = []
+    profils = [[] for _ in references]
+    with open(output, 'w', newline='') as f, \
+            Pool(max(1, n_workers), initializer=_init_worker,
+                 initargs=(ca_references, options, options_mesures)) as pool:
+        writer = csv.DictWriter(f, fieldnames=champs)
+        writer.writeheader()
+        for done, (entree, superpositions, releves) in enumerate(pool.imap(_traiter_entree, entrees), 1):
+            mesures.ajouter(releves)
+            entry_id, assembly_id, chain_id = entree
+            ligne = ligne_resultats(entry_id, chain_id, references, superpositions, critere)
+            writer.writerow(ligne)
+            f.flush()
+            results.append(ligne)
+            for reference, index_file, superposition, profils_reference in zip(references, index_files,
+                                                                               superpositions, profils):
+                profils_reference.append((entry_id, chain_id, superposition and superposition[3]))
+                if superposition is None:
+                    continue
+                enregistrer(index_file, entry_id, assembly_id, chain_id, superposition[2],
+                            {'PDB_ID': entry_id, 'Chain': chain_id,
+                             **resultat_reference(superposition, critere)},
+                            reference=list(reference))
+            print(f"[{done}/{len(entrees)}] {entry_id:<6} " + " ".join(
+                f"{nom_reference(r)} {ligne[f'RMSD_{nom_reference(r)}']:>6}" for r in references))
+
+    for reference, profils_reference in zip(references, profils):
+        ecarts_file, _ = chemins_ecarts(f"{os.path.splitext(output)[0]}_{nom_reference(reference)}.csv")
+        ecrire_ecarts(ecarts_file, profils_reference, reference=list(reference))
+    return results, index_files
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Superposition des structures ALK sur plusieurs références en un passage")
+    parser.add_argument("--csv", default=csv_file, help="rapport RCSB contenant les structures")
+    parser.add_argument("--output", default=output_csv, help="fichier de résultats (une colonne par référence)")
+    parser.add_argument("--references", nargs="+", type=lire_reference, default=REFERENCES,
+                        metavar="PDB:CHAÎNE:DÉBUT-FIN",
+                        help="références et lobe C de chacune (défaut : 4WB8:A:127-350 1ATP:E:127-300)")
+    parser.add_argument("--workers", type=int, default=os.cpu_count(), help="nombre de processus")
+    parser.add_argument("--accession", default=ALK_UNIPROT, help="accession UniProt de la chaîne à superposer")
+    parser.add_argument("--sans-ligand", action="store_true", help="garder aussi les entrées sans ligand")
+    parser.add_argument("--max-structures", type=int, default=None, help="limiter le nombre de structures")
+    parser.add_argument("--cache-dir", default=None,
+                        help="cache binaire des coordonnées (voir cache_coordonnees.py)")
+    parser.add_argument("--sans-correspondance", action="store_true",
+                        help="apparier les résidus par leurs numéros au lieu de l'alignement de séquence")
+    parser.add_argument("--sans-profil-chaines", action="store_true",
+                        help="garder la première chaîne du rapport (voir profil_chaines.py)")
+    parser.add_argument("--statut", choices=CRITERES_STATUT, default="RMSD",
+                        help="critère du statut EXCELLENT/GOOD/MODERATE/HIGH_RMSD (voir qualite.py)")
+    parser.add_argument("--source", default=SOURCE_RCSB,
+                        help="source du pré-téléchargement : modèle d'URL avec {nom} ou dossier miroir local")
+    parser.add_argument("--prefetch-workers", type=int, default=N_REQUETES,
+                        help="téléchargements simultanés avant la superposition")
+    parser.add_argument("--sans-prefetch", action="store_true", help="ne pas pré-télécharger")
+    parser.add_argument("--mesures", default=None,
+                        help="fichier des mesures par étape (.jsonl ou .csv), voir mesures.py")
+    parser.add_argument("--sans-tracemalloc", action="store_true",
+                        help="mesures sans suivi des allocations Python (plus rapide)")
+    args = parser.parse_args()
+
+    table = lire_rapport(args.csv)
+    entrees = selectionner(table, args.accession, avec_ligand=not args.sans_ligand)
+    if args.max_structures is not None:
+        entrees = entrees[:args.max_structures]
+
+    options_mesures = None
+    if args.mesures:
+        options_mesures = dict(memoire=not args.sans_tracemalloc)
+        mesures.activer(args.mesures, **options_mesures)
+
+    # références et cibles téléchargées une seule fois, avant la superposition
+    echecs = {}
+    if not args.sans_prefetch:
+        noms = [nom_assemblage(r[0], 1) for r in args.references] + [nom_assemblage(e, a) for e, a, _ in entrees]
+        with mesures.etape("prefetch"):
+            echecs = prefetch(noms, args.source, n_workers=args.prefetch_workers)
+        manquantes = [r[0] for r in args.references if nom_assemblage(r[0], 1) in echecs]
+        if manquantes:
+            raise SystemExit(f"🙈 erreur : références non disponibles : {', '.join(manquantes)}")
+
+    if not args.sans_profil_chaines:
+        with mesures.etape("chaines"):
+            entrees, _ = choisir_chaines(entrees, table, args.accession, PROFIL_DIR)
+
+    n_workers = max(1, min(args.workers, len(entrees)))
+    print(f"{len(entrees)} structures × {len(args.references)} références sur {n_workers} processus")
+    _, index_files = superposer_multi(entrees, args.references, args.output, n_workers, args.cache_dir,
+                                      not args.sans_correspondance, options_mesures, args.statut)
+
+    print(f"\n🕺🏻 Résultats sauvegardés dans {args.output}")
+    for index_file in index_files:
+        print(f"🕺🏻 Transformations dans {index_file}")
+    if echecs:
+        print(f"🙈 {len(echecs)} assemblages non téléchargés (lignes en erreur)")
+    if args.mesures:
+        mesures.afficher_resume()
+        mesures.terminer()
+        print(f"🕺🏻 Mesures par étape dans {args.mesures}")
+
+
+if __name__ == "__main__":
+    main()
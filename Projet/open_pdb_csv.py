@@ -4,15 +4,99 @@ Utilise fetch_mmcif pour les assemblages biologiques
 Alignement sur le LOBE C uniquement
 """
 
-import csv
 import os
+import sys
 from pymol import cmd
 
+# les modules du projet sont dans le même dossier (lancer PyMOL depuis Projet/)
+sys.path.insert(0, os.getcwd())
+from superposition import (superposer_entree, ouvrir_resultats, resultat_erreur,
+                           ca_fichier, ca_pymol, matrice_superposition, superposer_doublon,
+                           sauvegarder_session, pic_memoire)
+from doublons import FICHIER, grouper, representants, ca_entree
+from telechargement import SOURCE_RCSB, nom_assemblage, prefetch
+from manifeste import (chemin_manifeste, cle_entree, parametres_run, signature,
+                       charger_manifeste, a_jour, ajouter, compacter)
+from index_transformations import chemin_index, enregistrer, charger_index
+from ecarts_residus import chemins_ecarts, completer_profils, ecarts, ecrire_ecarts
+from rapport_rcsb import lire_rapport, selectionner
+from profil_chaines import PROFIL_DIR, choisir_chaines
+import mesures
+from mesures import etape
+
 # CSV contenant les structures PDB
 csv_file = "rcsb_pdb_custom_report.csv"
+# chaîne à superposer : celle de l'accession UniProt d'ALK (voir rapport_rcsb.py)
+# ne garder que les entrées avec au moins un ligand
+ALK_ACCESSION = "Q9UM73"
+LIGAND_REQUIRED = True
+# fichier de résultats (écrit ligne par ligne) et manifeste associé
+output_csv = "superposition_results.csv"
+# ne refaire que les structures nouvelles, modifiées ou en erreur (voir manifeste.py)
+INCREMENTAL = True
+# sorties de la superposition :
+# ALIGNED_CIF : copie complète de chaque structure superposée ({entry_id}_aligned.cif)
+# TRANSFORM_INDEX : matrice 4x4, hash du fichier source et résultats de chaque entrée dans
+# superposition_results_transforms.jsonl ; index_transformations.py reconstruit les fichiers
+# alignés à la demande (ALIGNED_CIF = False pour n'écrire que l'index)
+ALIGNED_CIF = True
+TRANSFORM_INDEX = True
 # a commenter si on veut charger et aligner toutes les structures du CSV
 # MAX_STRUCTURES = 10
 
+# télécharger tous les assemblages du CSV avant la superposition (telechargement.py)
+# la boucle ne lit alors que des fichiers locaux
+PREFETCH = True
+# source : RCSB, modèle d'URL avec {nom} ou dossier miroir local
+PREFETCH_SOURCE = SOURCE_RCSB
+PREFETCH_WORKERS = 8
+
+# choisir la chaîne ALK sur le profil des chaînes de chaque fichier téléchargé
+# (profil_chaines.py : C-alpha, complétude, accession UniProt) au lieu de la première
+# chaîne du rapport ; profils en cache dans PROFIL_DIR
+CHAIN_PROFILING = True
+
+# superposer une seule fois les structures identiques (doublons.py) :
+# même séquence et mêmes C-alpha à DUPLICATE_TOLERANCE Å près
+DEDUPLICATE = True
+DUPLICATE_TOLERANCE = 1e-3
+
+# moteur de superposition : "pymol" (cmd.align) ou "numpy" (Kabsch, voir kabsch.py)
+SUPERPOSITION_ENGINE = "pymol"
+# cache binaire des coordonnées (cache_coordonnees.py), utilisé par le moteur numpy
+# None pour toujours relire les C-alpha dans PyMOL
+COORD_CACHE_DIR = os.environ.get("PK_CACHE_DIR", os.path.expanduser("~/.cache/pk_analysis/coordonnees"))
+# apparier les résidus ALK au lobe C de PKACA par alignement de séquence mis en cache
+# (correspondance_residus.py) au lieu de la plage resi 127-350 (numérotation PKACA)
+RESIDUE_MAPPING = True
+# TM-score, GDT_TS et LDDT calculés sur les C-alpha appariés (qualite.py), colonnes du fichier de résultats
+QUALITY_METRICS = True
+# critère du statut EXCELLENT/GOOD/MODERATE/HIGH_RMSD : "RMSD", "TM_score", "GDT_TS" ou "LDDT"
+# (seuils des métriques dans qualite.SEUILS_STATUT, indépendants du nombre de C-alpha alignés)
+STATUS_METRIC = "RMSD"
+# écarts par résidu à la référence sur les paires de la superposition (ecarts_residus.py),
+# une ligne par structure dans superposition_results_ecarts.npy
+RESIDUE_DEVIATIONS = True
+
+# mode sans affichage pour les calculs en lot (pymol -cq open_pdb_csv.py -- --headless) :
+# aucune représentation ni couleur, pas de messages décoratifs (et mode flux, voir STREAMING)
+HEADLESS = "--headless" in sys.argv
+# mode flux : chaque structure est supprimée de PyMOL dès que son fichier aligné et sa ligne
+# de résultats sont écrits ; seule la référence reste chargée (mémoire indépendante du nombre
+# de structures). Activé par --streaming ou --headless, ignoré si une session est sauvegardée.
+STREAMING = "--streaming" in sys.argv or HEADLESS
+# session PyMOL écrite à la fin (configuration visuelle appliquée une seule fois), None sinon
+SESSION_FILE = None
+
+# mesures par étape (mesures.py, activées par --mesures) : temps réel, temps CPU et mémoire
+# de chaque étape de chaque structure dans MEASURES_FILE (.jsonl ou .csv), tableau p50/p95/max
+# à la fin ; MEASURE_MEMORY : suivi des allocations Python (tracemalloc, plus lent)
+MEASURE = "--mesures" in sys.argv
+MEASURES_FILE = "superposition_results_mesures.jsonl"
+MEASURE_MEMORY = True
+# profils cProfile des N structures les plus lentes (dossier profils/), 0 pour aucun
+PROFILE_SLOWEST = 0
+
 # Reference PKACA humaine (P17612)
 
 reference_pdb = "4WB8"
@@ -24,36 +108,69 @@ reference_uniprot = "P17612"
 PKACA_LOBE_C_START = 127
 PKACA_LOBE_C_END = 350 
 
-print("=" * 60)
-print("CHARGEMENT DE LA STRUCTURE DE RÉFÉRENCE PKACA")
-print("=" * 60)
-print(f"Protéine: PKACA humaine (Homo sapiens)")
-print(f"  Lobe C: résidus {PKACA_LOBE_C_START}-{PKACA_LOBE_C_END}")
-print("=" * 60)
+
+def journal(*args):
+    """print, sauf en mode sans affichage (messages décoratifs)"""
+    if not HEADLESS:
+        print(*args)
+
+
+if HEADLESS:
+    # pas de messages de PyMOL non plus
+    cmd.feedback("disable", "all", "everything")
+
+if MEASURE:
+    mesures.activer(MEASURES_FILE, memoire=MEASURE_MEMORY, profils=PROFILE_SLOWEST)
+
+# rapport RCSB lu une seule fois : chaîne ALK de chaque entrée, entrées filtrées
+table_rapport = lire_rapport(csv_file)
+entrees = selectionner(table_rapport, ALK_ACCESSION, LIGAND_REQUIRED)
+
+prefetch_echecs = {}
+if PREFETCH:
+    journal("=" * 60)
+    journal("TÉLÉCHARGEMENT DES ASSEMBLAGES BIOLOGIQUES")
+    journal("=" * 60)
+    noms = [nom_assemblage(reference_pdb, 1)] + [nom_assemblage(e, a) for e, a, _ in entrees]
+    with etape("prefetch"):
+        prefetch_echecs = prefetch(noms, PREFETCH_SOURCE, n_workers=PREFETCH_WORKERS, verbose=not HEADLESS)
+
+if CHAIN_PROFILING:
+    with etape("chaines"):
+        entrees, changements = choisir_chaines(entrees, table_rapport, ALK_ACCESSION, PROFIL_DIR)
+    for entry_id, avant, apres in changements:
+        journal(f"🕺🏻 {entry_id} : chaîne {apres} au lieu de {avant} (profil des chaînes)")
+
+journal("=" * 60)
+journal("CHARGEMENT DE LA STRUCTURE DE RÉFÉRENCE PKACA")
+journal("=" * 60)
+journal(f"Protéine: PKACA humaine (Homo sapiens)")
+journal(f"  Lobe C: résidus {PKACA_LOBE_C_START}-{PKACA_LOBE_C_END}")
+journal("=" * 60)
 
 # charger la structure de référence (assemblage biologique 1)
-print(f"\nChargement de la structure de référence {reference_pdb}...")
+journal(f"\nChargement de la structure de référence {reference_pdb}...")
 try:
     # supprimer l'objet s'il existe déjà
     if f"{reference_pdb}_ref" in cmd.get_names():
         cmd.delete(f"{reference_pdb}_ref")
-        print(f"🕺🏻 Objet existant {reference_pdb}_ref supprimé")
+        journal(f"🕺🏻 Objet existant {reference_pdb}_ref supprimé")
     
     # vérifier si le fichier existe localement pour eviter de le retelecharger a chaque fois
     ref_file = f"{reference_pdb}-assembly1.cif"
     if os.path.exists(ref_file):
-        print(f"🕺🏻 Fichier local trouvé: {ref_file}")
+        journal(f"🕺🏻 Fichier local trouvé: {ref_file}")
         cmd.load(ref_file, f"{reference_pdb}_ref")
     else:
         cmd.do(f"fetch_mmcif {reference_pdb}, {reference_pdb}_ref, 1")
     
     cmd.remove(f"{reference_pdb}_ref and solvent")
-    print(f"🕺🏻 {reference_pdb} chargé")
+    journal(f"🕺🏻 {reference_pdb} chargé")
 
     # Afficher des informations sur la structure
     n_chains = len(cmd.get_chains(f"{reference_pdb}_ref"))
     n_residues = cmd.count_atoms(f"{reference_pdb}_ref and chain {reference_chain} and name CA")
-    print(f"  Chaînes: {n_chains}, Résidus totaux dans chaîne {reference_chain}: {n_residues}")
+    journal(f"  Chaînes: {n_chains}, Résidus totaux dans chaîne {reference_chain}: {n_residues}")
 
 except Exception as e:
     print(f"🙈 erreur : {e}")
@@ -68,171 +185,202 @@ if n_atoms_lobe_c == 0:
     print(" !!Vérifiez la chaîne et les numéros de résidu!s!")
     exit(1)
 
-print(f" Lobe C de la référence: {n_atoms_lobe_c} C-alpha (résidus {PKACA_LOBE_C_START}-{PKACA_LOBE_C_END})")
-print(f" Tous les alignements seront faits sur cette région uniquement.")
+journal(f" Lobe C de la référence: {n_atoms_lobe_c} C-alpha (résidus {PKACA_LOBE_C_START}-{PKACA_LOBE_C_END})")
+journal(f" Tous les alignements seront faits sur cette région uniquement.")
+
+# C-alpha de la chaîne de référence lus une seule fois (cache binaire si possible)
+ca_ref = None
+if SUPERPOSITION_ENGINE == "numpy" or RESIDUE_MAPPING or QUALITY_METRICS or RESIDUE_DEVIATIONS:
+    if COORD_CACHE_DIR and os.path.exists(ref_file):
+        ca_ref = ca_fichier(ref_file, reference_chain, COORD_CACHE_DIR)
+        journal(f" {len(ca_ref[0])} C-alpha de la référence lus depuis le cache {COORD_CACHE_DIR}")
+    else:
+        ca_ref = ca_pymol(cmd, f"{reference_pdb}_ref and chain {reference_chain} and name CA")
 
 # Configuration visuelle pour vérification
-cmd.hide("everything", f"{reference_pdb}_ref")
-cmd.show("cartoon", f"{reference_pdb}_ref")
-cmd.color("green", f"{reference_pdb}_ref")
-cmd.show("sticks", f"{reference_pdb}_ref and organic")
-cmd.show("nb_spheres", f"{reference_pdb}_ref and inorganic")
+if not HEADLESS:
+    cmd.hide("everything", f"{reference_pdb}_ref")
+    cmd.show("cartoon", f"{reference_pdb}_ref")
+    cmd.color("green", f"{reference_pdb}_ref")
+    cmd.show("sticks", f"{reference_pdb}_ref and organic")
+    cmd.show("nb_spheres", f"{reference_pdb}_ref and inorganic")
 
 
 # les structures : 
-print("\n" + "=" * 60)
-print("TRAITEMENT DES STRUCTURES ALK")
-print("=" * 60)
+journal("\n" + "=" * 60)
+journal("TRAITEMENT DES STRUCTURES ALK")
+journal("=" * 60)
+
+# doublons : index du doublon -> (index du représentant, type) ; tous les fichiers sont locaux
+with etape("doublons"):
+    doublons = grouper(entrees, COORD_CACHE_DIR, DUPLICATE_TOLERANCE) if DEDUPLICATE else {}
+groupes = representants(doublons)
+if doublons:
+    journal(f"🕺🏻 {len(doublons)} doublons détectés, superposés avec la transformation de leur représentant")
+# index du représentant -> (transformation 4x4, ligne de résultats)
+transformations = {}
+# index -> profil des écarts par résidu (ecarts_residus.ecarts) des structures superposées
+profils = {}
+
+# sans fichiers alignés, l'index des transformations est la seule sortie
+indexer = TRANSFORM_INDEX or not ALIGNED_CIF
+index_file = chemin_index(output_csv)
 
 # Créer un fichier de résultats
 results = []
 count = 0
-
-# Parcourir le CSV en sautant la première ligne (en-têtes de section)
-with open(csv_file, newline='') as f:
-    # lire toutes les lignes
-    lines = f.readlines()
-    reader = csv.DictReader(lines[1:])
-
-    for row in reader:
+n_skipped = 0
+
+# manifeste : une ligne par structure, écrite dès qu'elle est superposée
+manifest_file = chemin_manifeste(output_csv)
+manifeste = charger_manifeste(manifest_file) if INCREMENTAL else {}
+parametres = parametres_run(reference_pdb, reference_chain, PKACA_LOBE_C_START, PKACA_LOBE_C_END,
+                            moteur=SUPERPOSITION_ENGINE, correspondance=RESIDUE_MAPPING,
+                            fichiers_alignes=ALIGNED_CIF, index_transformations=indexer,
+                            qualite=QUALITY_METRICS, statut=STATUS_METRIC)
+f_results, writer = ouvrir_resultats(output_csv)
+
+# Parcourir les entrées du rapport (chaîne ALK choisie par rapport_rcsb.py)
+for index, (entry_id, assembly_id, chain_id) in enumerate(entrees):
 #ICI POUR CHANGER LA TAILLE DU DATASET
-        # if count >= MAX_STRUCTURES:
-        #     break
-            
-
-        entry_id = row["PDB ID"]
-        assembly_id = row["Assembly ID"]
-        chain_id = row["Auth Asym ID"]
-
-        if not entry_id or not assembly_id or not chain_id:
-            continue
-
-        count += 1
-        print(f"\n[{count}] {entry_id} (Assembly {assembly_id}, Chaîne {chain_id})")
-        print("-" * 60)
-
-        try:
-            obj_name = f"{entry_id}_assembly{assembly_id}"
-
-            # Supprimer l'objet s'il existe déjà
-            if obj_name in cmd.get_names():
-                cmd.delete(obj_name)
-
-            # Vérifier si le fichier existe avant de télécharger
-            structure_file = f"{entry_id}-assembly{assembly_id}.cif"
-            if os.path.exists(structure_file):
-                print(f"🕺🏻 Structure déjà présente: {structure_file}, chargement depuis le fichier local")
-                cmd.load(structure_file, obj_name)
-            else:
-                print(f"Téléchargement de la structure {entry_id}...")
-                cmd.do(f"fetch_mmcif {entry_id}, {obj_name}, {assembly_id}")
-            
-            cmd.remove(f"{obj_name} and solvent")
-            print(f"🕺🏻 Structure chargée")
-
-            # Configuration visuelle
-            cmd.hide("everything", obj_name)
-            cmd.show("cartoon", obj_name)
-            cmd.color("cyan", obj_name)
-            cmd.show("sticks", f"{obj_name} and organic")
-            cmd.show("nb_spheres", f"{obj_name} and inorganic")
-
-            # Vérifier la sélection du lobe C
-            lobe_c_target = f"{obj_name} and chain {chain_id} and resi {PKACA_LOBE_C_START}-{PKACA_LOBE_C_END} and name CA"
-            n_atoms_target = cmd.count_atoms(lobe_c_target)
-
-            if n_atoms_target < 20:
-                print(f"🙈 Peu d'atomes trouvés dans le lobe C ({n_atoms_target}). Utilisation de tous les C-alpha.")
-                lobe_c_target = f"{obj_name} and chain {chain_id} and name CA"
-                n_atoms_target = cmd.count_atoms(lobe_c_target)
-
-            if n_atoms_target == 0:
-                print(f"🙈 erreur : Aucun atome trouvé dans {entry_id}. Structure peut être incomplète.")
-                results.append({
-                    'PDB_ID': entry_id,
-                    'Chain': 'ERROR',
-                    'N_CA_aligned': 0,
-                    'RMSD': 'N/A',
-                    'Status': 'ERROR'
-                })
-                continue
-
-            # Superposition finale
-            print(f"Superposition de {n_atoms_target} C-alpha...")
-            alignment = cmd.align(
-                lobe_c_target,
-                lobe_c_ref,
-                cycles=10,
-                cutoff=2.0,
-                transform=1,
-                quiet=0
-            )
-
-            rmsd = alignment[0]
-            n_aligned = alignment[1]
-
-            print(f"🕺🏻 Résultats finaux:")
-            print(f"  RMSD: {rmsd:.2f} Å")
-            print(f"  C-alpha alignés: {n_aligned}")
-
-            # Évaluation détaillée
-            if rmsd > 4.0:
-                print(f"  🙈 RMSD élevé - Vérifier manuellement!")
-                status = "HIGH_RMSD"
-            elif rmsd > 2.5:
-                print(f"  🙈 RMSD modéré - Acceptable mais vérifier")
-                status = "MODERATE"
-            elif rmsd < 2.0:
-                print(f"  🕺🏻 Excellente superposition!")
-                status = "EXCELLENT"
-            else:
-                print(f"  🕺🏻 Bonne superposition")
-                status = "GOOD"
-
-            if n_aligned < 50:
-                print(f"  🙈 Peu d'atomes alignés - Structures très différentes?")
-            elif n_aligned > 100:
-                print(f"  🕺🏻 Bon nombre d'atomes alignés")
-
-            # Sauvegarder les résultats
-            results.append({
-                'PDB_ID': entry_id,
-                'Chain': chain_id,
-                'N_CA_aligned': n_aligned,
-                'RMSD': f"{rmsd:.2f}",
-                'Status': status
-            })
-
-            # Sauvegarder la structure superposée au format mmcif
-            cmd.save(f"{entry_id}_aligned.cif", obj_name)
-            print(f"  ✨ Sauvegardé : {entry_id}_aligned.cif")
-
-        except Exception as e:
-            print(f"🙈 erreur : {e}")
-            results.append({
-                'PDB_ID': entry_id,
-                'Chain': 'ERROR',
-                'N_CA_aligned': 0,
-                'RMSD': 'N/A',
-                'Status': 'ERROR'
-            })
-
-print("\n" + "=" * 60)
-print("RÉSUMÉ DES SUPERPOSITIONS")
-print("=" * 60)
-print(f"\n{'PDB ID':<10} {'Chaîne':<10} {'N C-alpha':<15} {'RMSD (Å)':<10} {'Status':<12}")
-print("-" * 60)
+    # if count >= MAX_STRUCTURES:
+    #     break
+
+    count += 1
+    mesures.commencer(entry_id)
+    journal(f"\n[{count}] {entry_id} (Assembly {assembly_id}, Chaîne {chain_id})")
+    journal("-" * 60)
+
+    cle = cle_entree(entry_id, assembly_id, chain_id)
+    sortie = f"{entry_id}_aligned.cif" if ALIGNED_CIF else index_file
+    sig = signature(entry_id, assembly_id, parametres)
+    if INCREMENTAL and a_jour(manifeste.get(cle), sig):
+        # entrées et paramètres inchangés : résultat repris du manifeste
+        result = manifeste[cle]['result']
+        n_skipped += 1
+        journal(f"🕺🏻 Déjà superposée (entrées inchangées), {manifeste[cle]['output']} conservé")
+    elif nom_assemblage(entry_id, assembly_id) in prefetch_echecs:
+        # pas de téléchargement pendant la boucle : l'entrée est marquée en erreur
+        print(f"🙈 erreur : {prefetch_echecs[nom_assemblage(entry_id, assembly_id)]}")
+        result = resultat_erreur(entry_id)
+    elif index in doublons and doublons[index][0] in transformations:
+        representant, type_doublon = doublons[index]
+        transformation, result_representant = transformations[representant]
+        if index == groupes[representant][-1]:
+            # dernier doublon du groupe : la transformation n'est plus utile
+            del transformations[representant]
+        fichier_representant = f"{entrees[representant][0]}_aligned.cif" if type_doublon == FICHIER else None
+        result = superposer_doublon(cmd, entry_id, assembly_id, chain_id, transformation,
+                                    result_representant, fichier_representant,
+                                    charger=not STREAMING or SESSION_FILE is not None,
+                                    verbose=not HEADLESS, afficher=not HEADLESS, sauvegarder=ALIGNED_CIF)
+        if indexer and result['Status'] != 'ERROR':
+            with etape("index"):
+                enregistrer(index_file, entry_id, assembly_id, chain_id, transformation, result,
+                            parametres=parametres)
+        if RESIDUE_DEVIATIONS and result['Status'] != 'ERROR':
+            # même structure que le représentant : mêmes écarts
+            profils[index] = profils.get(representant)
+        with etape("manifeste"):
+            sig = signature(entry_id, assembly_id, parametres)
+            manifeste[cle] = ajouter(manifest_file, cle, sig, result, sortie)
+    else:
+        details = {} if RESIDUE_DEVIATIONS else None
+        result = superposer_entree(
+            cmd, entry_id, assembly_id, chain_id, lobe_c_ref,
+            PKACA_LOBE_C_START, PKACA_LOBE_C_END,
+            moteur=SUPERPOSITION_ENGINE,
+            cache_dir=COORD_CACHE_DIR, ca_ref=ca_ref,
+            correspondance=RESIDUE_MAPPING,
+            verbose=not HEADLESS, afficher=not HEADLESS, sauvegarder=ALIGNED_CIF,
+            qualite=QUALITY_METRICS, critere=STATUS_METRIC, details=details
+        )
+
+        # transformation gardée pour l'index, les écarts par résidu et les doublons de cette structure
+        if (indexer or index in groupes or RESIDUE_DEVIATIONS) and result['Status'] != 'ERROR':
+            try:
+                ca_avant = ca_entree(f"{entry_id}-assembly{assembly_id}.cif", chain_id, COORD_CACHE_DIR)
+                transformation = matrice_superposition(cmd, f"{entry_id}_assembly{assembly_id}",
+                                                       chain_id, ca_avant)
+                if indexer:
+                    with etape("index"):
+                        enregistrer(index_file, entry_id, assembly_id, chain_id, transformation, result,
+                                    parametres=parametres)
+                if index in groupes:
+                    transformations[index] = (transformation, result)
+            except (ValueError, OSError) as e:
+                print(f"🙈 transformation non récupérée ({e}), les doublons seront superposés normalement")
+                transformation = None
+                if not ALIGNED_CIF:
+                    result = resultat_erreur(entry_id)
+            # un profil manquant ne remet en cause ni la superposition ni sa transformation
+            if RESIDUE_DEVIATIONS and transformation is not None and details.get('paires') is not None:
+                try:
+                    with etape("ecarts"):
+                        profils[index] = ecarts(ca_avant, ca_ref, details['paires'], transformation)
+                except (ValueError, OSError):
+                    profils[index] = None
+
+        # le fichier d'entrée a pu être téléchargé pendant le chargement
+        with etape("manifeste"):
+            sig = signature(entry_id, assembly_id, parametres)
+            manifeste[cle] = ajouter(manifest_file, cle, sig, result, sortie)
+
+    # écrire la ligne tout de suite : un arrêt brutal ne perd pas les résultats déjà calculés
+    with etape("resultats"):
+        writer.writerow(result)
+        f_results.flush()
+    results.append(result)
+
+    # mode flux : fichier aligné (ou transformation) et ligne écrits, l'objet n'est plus utile
+    if STREAMING and SESSION_FILE is None:
+        with etape("liberation"):
+            cmd.delete(f"{entry_id}_assembly{assembly_id}")
+    mesures.finir()
+
+f_results.close()
+compacter(manifest_file, manifeste)
+if indexer:
+    # un seul enregistrement par entrée dans l'index, comme pour le manifeste
+    compacter(index_file, charger_index(index_file))
+
+# écarts par résidu : entrées déjà à jour reprises du tableau précédent (ou recalculées depuis
+# l'index des transformations ou le fichier aligné) ; tableau conservé s'il est illisible et incomplet
+ecarts_file = None
+if RESIDUE_DEVIATIONS:
+    with etape("ecarts"):
+        n_manquants, lisible = completer_profils(
+            chemins_ecarts(output_csv)[0], entrees, results, profils,
+            charger_index(index_file) if indexer else {}, lambda: ca_ref,
+            PKACA_LOBE_C_START, PKACA_LOBE_C_END, COORD_CACHE_DIR, RESIDUE_MAPPING)
+        if n_manquants and not lisible:
+            print(f"🙈 {chemins_ecarts(output_csv)[0]} illisible et {n_manquants} profils non retrouvés : "
+                  f"tableau conservé")
+        else:
+            ecarts_file = chemins_ecarts(output_csv)[0]
+            ecrire_ecarts(ecarts_file, [(entry_id, result['Chain'], profils.get(index))
+                                        for index, ((entry_id, _, _), result) in enumerate(zip(entrees, results))],
+                          reference=[reference_pdb, reference_chain, PKACA_LOBE_C_START, PKACA_LOBE_C_END])
+
+if SESSION_FILE:
+    sauvegarder_session(cmd, SESSION_FILE, f"{reference_pdb}_ref")
+    print(f"🕺🏻 Session sauvegardée dans {SESSION_FILE}")
+
+journal("\n" + "=" * 60)
+journal("RÉSUMÉ DES SUPERPOSITIONS")
+journal("=" * 60)
+journal(f"\n{'PDB ID':<10} {'Chaîne':<10} {'N C-alpha':<15} {'RMSD (Å)':<10} {'Status':<12}")
+journal("-" * 60)
 for result in results:
-    print(f"{result['PDB_ID']:<10} {result['Chain']:<10} {result['N_CA_aligned']:<15} {result['RMSD']:<10} {result['Status']:<12}")
-
-# Sauvegarder les résultats dans un fichier CSV
-output_csv = "superposition_results.csv"
-with open(output_csv, 'w', newline='') as f:
-    writer = csv.DictWriter(f, fieldnames=['PDB_ID', 'Chain', 'N_CA_aligned', 'RMSD', 'Status'])
-    writer.writeheader()
-    writer.writerows(results)
+    journal(f"{result['PDB_ID']:<10} {result['Chain']:<10} {result['N_CA_aligned']:<15} {result['RMSD']:<10} {result['Status']:<12}")
 
 print(f"\n🕺🏻 Résultats sauvegardés dans {output_csv}")
+if n_skipped:
+    print(f"🕺🏻 {n_skipped} structures déjà à jour non recalculées (manifeste : {manifest_file})")
+if indexer:
+    print(f"🕺🏻 Transformations dans {index_file} (fichiers alignés : python3 index_transformations.py {index_file})")
+if ecarts_file:
+    print(f"🕺🏻 Écarts par résidu dans {ecarts_file}")
 
 # Statistiques
 n_total = len(results)
@@ -242,17 +390,25 @@ n_moderate = sum(1 for r in results if r.get('Status') == 'MODERATE')
 n_high_rmsd = sum(1 for r in results if r.get('Status') == 'HIGH_RMSD')
 n_errors = sum(1 for r in results if r.get('Status') == 'ERROR')
 
-print("\n" + "=" * 60)
-print("STATISTIQUES")
-print("=" * 60)
+journal("\n" + "=" * 60)
+journal("STATISTIQUES")
+journal("=" * 60)
 print(f"Total de structures: {n_total}")
 print(f"  Excellent (RMSD < 2.0 Å): {n_excellent}")
 print(f"  Bon (RMSD 2.0-2.5 Å): {n_good}")
 print(f"  Modéré (RMSD 2.5-4.0 Å): {n_moderate}")
 print(f"  RMSD élevé (> 4.0 Å): {n_high_rmsd}")
 print(f"  🙈 erreur : {n_errors}")
-
-print("\n" + "=" * 60)
-print("✨ TRAITEMENT TERMINÉ ✨")
-print("=" * 60)
+pic = pic_memoire()
+if pic is not None:
+    print(f"Pic de mémoire (RSS): {pic:.0f} Mo")
+
+if MEASURE:
+    mesures.afficher_resume()
+    mesures.terminer()
+    print(f"🕺🏻 Mesures par étape dans {MEASURES_FILE}")
+
+journal("\n" + "=" * 60)
+journal("✨ TRAITEMENT TERMINÉ ✨")
+journal("=" * 60)
 
@@ -0,0 +1,199 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Profil des chaînes d'une structure, calculé en un seul passage sur ses C-alpha
+Pour chaque chaîne (auth_asym_id), dans l'ordre du fichier :
+    - nombre de C-alpha (un par résidu, première conformation, premier modèle)
+    - séquence une lettre
+    - premier et dernier label_seq_id, résidus manquants, trous dans la numérotation
+      et complétude (résidus présents / étendue)
+    - entité (label_entity_id) et accessions UniProt de cette entité dans le rapport RCSB
+La chaîne ALK à superposer est choisie dans ce tableau (choisir_chaine) au lieu de
+faire confiance à la première chaîne du rapport. Le profil de chaque fichier est mis
+en cache (JSON nommé par le SHA-256 du fichier, comme cache_coordonnees.py).
+
+Usage (hors PyMOL, depuis le dossier Projet/) :
+    python3 profil_chaines.py 2XB7-assembly1.cif 4FOB-assembly1.cif
+"""
+
+import json
+import os
+import sys
+
+import numpy as np
+
+from cache_coordonnees import cle_fichier
+from correspondance_residus import sequence
+from lecture_cif import MANQUANT, lire_atom_site, valeurs
+from rapport_rcsb import ALK_UNIPROT, instances
+
+# dossier du cache des profils (modifiable par la variable d'environnement PK_PROFIL_DIR)
+PROFIL_DIR = os.environ.get("PK_PROFIL_DIR", os.path.expanduser("~/.cache/pk_analysis/profils_chaines"))
+# la chaîne du rapport (celle qui porte le ligand) est gardée si elle a au moins
+# cette fraction des C-alpha de la meilleure chaîne de l'accession
+FRACTION_RAPPORT = 0.9
+# version du format des profils en cache
+VERSION = 1
+
+
+def profiler(chaines, numeros, noms, entites=None):
+    """
+    Profil de chaque chaîne à partir des colonnes des C-alpha (une valeur par atome) :
+    chaînes, numéros de résidus (label_seq_id), noms des résidus, entités.
+    Renvoie une liste de dictionnaires, chaînes dans l'ordre de première apparition.
+    """
+    chaines = np.asarray(chaines, dtype=str)
+    numeros = np.asarray(numeros)
+    noms = np.asarray(noms, dtype=str)
+    if len(chaines) == 0:
+        return []
+    ordre_chaines, premiers, codes = np.unique(chaines, return_index=True, return_inverse=True)
+
+    # un seul tri (chaîne, numéro) ; le tri stable garde la première conformation de chaque résidu
+    tri = np.lexsort((numeros, codes))
+    codes, numeros, noms = codes[tri], numeros[tri], noms[tri]
+    entites = np.asarray(entites, dtype=str)[tri] if entites is not None else None
+    nouveau = np.ones(len(tri), dtype=bool)
+    nouveau[1:] = (codes[1:] != codes[:-1]) | (numeros[1:] != numeros[:-1])
+    codes, numeros, noms = codes[nouveau], numeros[nouveau], noms[nouveau]
+    if entites is not None:
+        entites = entites[nouveau]
+    bornes = np.searchsorted(codes, np.arange(len(ordre_chaines) + 1))
+
+    profils = []
+    for code in np.argsort(premiers):
+        debut, fin = bornes[code], bornes[code + 1]
+        residus = numeros[debut:fin]
+        etendue = int(residus[-1] - residus[0] + 1)
+        profils.append({
+            'chaine': str(ordre_chaines[code]),
+            'entite': str(entites[debut]) if entites is not None else None,
+            'n_ca': int(fin - debut),
+            'sequence': sequence(noms[debut:fin]),
+            'premier': int(residus[0]),
+            'dernier': int(residus[-1]),
+            'manquants': etendue - int(fin - debut),
+            'trous': int(np.count_nonzero(np.diff(residus) > 1)),
+            'completude': round(float(fin - debut) / etendue, 4),
+        })
+    return profils
+
+
+def profil_structure(structure):
+    """Profil des chaînes d'une structure lue par lecture_cif.lire_atom_site (ca_seulement ou non)"""
+    garder = valeurs(structure, 'label_atom_id') == 'CA'
+    if 'type_symbol' in structure:
+        garder &= valeurs(structure, 'type_symbol') == 'C'
+    if 'pdbx_PDB_model_num' in structure and len(structure['pdbx_PDB_model_num']):
+        garder &= structure['pdbx_PDB_model_num'] == structure['pdbx_PDB_model_num'][0]
+    garder &= structure['label_seq_id'] != MANQUANT
+    lignes = np.flatnonzero(garder)
+    nom_chaine = 'auth_asym_id' if 'auth_asym_id' in structure else 'label_asym_id'
+    entites = valeurs(structure, 'label_entity_id')[lignes] if 'label_entity_id' in structure else None
+    return profiler(valeurs(structure, nom_chaine)[lignes], structure['label_seq_id'][lignes],
+                    valeurs(structure, 'label_comp_id')[lignes], entites)
+
+
+def profil_pymol(cmd, selection):
+    """
+    Profil des chaînes d'un objet PyMOL, avec un seul appel à cmd.iterate
+    (numéros de résidus de PyMOL, pas d'entité : PyMOL ne garde pas label_entity_id)
+    """
+    colonnes = {'chaines': [], 'numeros': [], 'noms': []}
+    cmd.iterate(f"({selection}) and polymer.protein and name CA",
+                "c['chaines'].append(chain); c['numeros'].append(resv); c['noms'].append(resn)",
+                space={'c': colonnes})
+    return profiler(colonnes['chaines'], colonnes['numeros'], colonnes['noms'])
+
+
+def profil_fichier(chemin, cache_dir=PROFIL_DIR):
+    """Profil des chaînes d'un fichier mmCIF, depuis le cache si le fichier n'a pas changé"""
+    chemin_cache = None
+    if cache_dir:
+        chemin_cache = os.path.join(cache_dir, f"{cle_fichier(chemin)}.json")
+        if os.path.exists(chemin_cache):
+            with open(chemin_cache) as f:
+                contenu = json.load(f)
+            if contenu.get('version') == VERSION:
+                return contenu['chaines']
+
+    profils = profil_structure(lire_atom_site(chemin, ca_seulement=True))
+    if chemin_cache:
+        os.makedirs(cache_dir, exist_ok=True)
+        temporaire = f"{chemin_cache}.{os.getpid()}.tmp"
+        with open(temporaire, 'w') as f:
+            json.dump({'version': VERSION, 'source': os.path.basename(chemin), 'chaines': profils}, f)
+        os.replace(temporaire, chemin_cache)
+    return profils
+
+
+def associer_uniprot(profils, table, i):
+    """
+    Ajoute à chaque profil les accessions UniProt de l'entrée i du rapport RCSB (rapport_rcsb.py) :
+    par entité (les copies d'un assemblage gardent leur label_entity_id), sinon par chaîne.
+    """
+    tranche = instances(table, i)
+    par_entite, par_chaine = {}, {}
+    for entite, chaine, codes in zip(table['polymer_entity_id'][tranche], table['polymer_auth_asym_id'][tranche],
+                                     table['polymer_accessions'][tranche]):
+        accessions = [c.strip() for c in codes.split(",") if c.strip()]
+        par_entite.setdefault(entite, accessions)
+        par_chaine[chaine] = accessions
+    for profil in profils:
+        profil['accessions'] = par_entite.get(profil['entite'], par_chaine.get(profil['chaine'], []))
+    return profils
+
+
+def choisir_chaine(profils, accession=ALK_UNIPROT, chaine_rapport=None, fraction=FRACTION_RAPPORT):
+    """
+    Meilleure chaîne de l'accession : le plus de C-alpha, puis la plus complète.
+    Sans accessions dans les profils (associer_uniprot non appelé), toutes les chaînes sont candidates.
+    La chaîne du rapport est préférée si elle a au moins `fraction` des C-alpha de la meilleure.
+    Renvoie None si aucune chaîne ne convient.
+    """
+    candidates = [p for p in profils if 'accessions' not in p or accession in p['accessions']]
+    if not candidates:
+        return None
+    meilleure = max(candidates, key=lambda p: (p['n_ca'], p['completude']))
+    for profil in candidates:
+        if profil['chaine'] == chaine_rapport and profil['n_ca'] >= fraction * meilleure['n_ca']:
+            return chaine_rapport
+    return meilleure['chaine']
+
+
+def choisir_chaines(entrees, table, accession=ALK_UNIPROT, cache_dir=PROFIL_DIR):
+    """
+    Chaîne de chaque entrée (entry_id, assembly_id, chain_id) choisie sur le profil
+    du fichier local {entry_id}-assembly{assembly_id}.cif ; les entrées sans fichier
+    gardent la chaîne du rapport. Renvoie (entrées, changements [(entry_id, avant, après)]).
+    """
+    lignes = {(str(e), str(a)): i for i, (e, a) in enumerate(zip(table['entry_id'], table['assembly_id']))}
+    choisies, changements = [], []
+    for entry_id, assembly_id, chain_id in entrees:
+        structure_file = f"{entry_id}-assembly{assembly_id}.cif"
+        chaine = chain_id
+        if os.path.exists(structure_file) and (entry_id, assembly_id) in lignes:
+            profils = associer_uniprot(profil_fichier(structure_file, cache_dir), table,
+                                       lignes[(entry_id, assembly_id)])
+            chaine = choisir_chaine(profils, accession, chain_id) or chain_id
+        if chaine != chain_id:
+            changements.append((entry_id, chain_id, chaine))
+        choisies.append((entry_id, assembly_id, chaine))
+    return choisies, changements
+
+
+def afficher(profils):
+    """Tableau des profils d'une structure"""
+    print(f"  {'Chaîne':<8} {'Entité':<7} {'CA':>5} {'Résidus':>11} {'Manq.':>6} {'Trous':>6} {'Compl.':>7}  UniProt")
+    for p in profils:
+        print(f"  {p['chaine']:<8} {p['entite'] or '':<7} {p['n_ca']:>5} {p['premier']:>5}-{p['dernier']:<5} "
+              f"{p['manquants']:>6} {p['trous']:>6} {p['completude']:>7.2f}  {','.join(p.get('accessions', []))}")
+
+
+if __name__ == "__main__":
+    if len(sys.argv) < 2:
+        print("Usage : python3 profil_chaines.py structure.cif [structure.cif ...]")
+        sys.exit(1)
+    for chemin in sys.argv[1:]:
+        print(f"🕺🏻 {chemin}")
+        afficher(profil_fichier(chemin, cache_dir=None))
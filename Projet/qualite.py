@@ -0,0 +1,200 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Métriques de qualité des superpositions indépendantes de la taille, calculées sur les
+C-alpha déjà appariés (mêmes paires que la superposition), en NumPy vectorisé :
+    - TM-score : Σ 1 / (1 + (d/d0)²) / L, d0 = 1.24·∛(L-15) - 1.8 (Zhang & Skolnick 2004),
+      maximisé sur quelques superpositions candidates (Kabsch sur les paires proches, empilé)
+    - GDT_TS : moyenne des fractions de résidus à moins de 1, 2, 4 et 8 Å
+      (meilleure superposition candidate pour chaque seuil)
+    - LDDT : fraction des distances internes de la référence (< 15 Å) conservées dans la
+      cible à 0.5, 1, 2 et 4 Å près, sans superposition
+L = nombre de C-alpha de la référence dans le lobe C : les trois scores (entre 0 et 1) se
+comparent d'une structure à l'autre, quel que soit le nombre de résidus appariés.
+Une seule matrice de distances (candidates × paires) sert au TM-score et au GDT_TS.
+
+Usage (hors PyMOL, depuis le dossier Projet/) : scores de structures déjà superposées
+    python3 qualite.py ../Super/2XB7_aligned.cif ../Super/4FOB_aligned.cif --reference 4WB8-assembly1.cif
+"""
+
+import argparse
+import os
+
+import numpy as np
+
+import kabsch
+
+# colonnes ajoutées au fichier de résultats
+METRIQUES = ['TM_score', 'GDT_TS', 'LDDT']
+# seuils du GDT_TS et du LDDT (Å), rayon d'inclusion des distances du LDDT
+SEUILS_GDT = (1.0, 2.0, 4.0, 8.0)
+SEUILS_LDDT = (0.5, 1.0, 2.0, 4.0)
+RAYON_LDDT = 15.0
+# recherche de la superposition du TM-score : paires à moins de k·d0, répétée ITERATIONS_TM fois
+FACTEURS_TM = (1.0, 2.0, 4.0)
+ITERATIONS_TM = 3
+# valeur minimale pour EXCELLENT, GOOD et MODERATE ; en dessous le statut est HIGH_RMSD
+# (même libellé que pour le RMSD : rapports et mauvais_alignements inchangés)
+SEUILS_STATUT = {
+    'TM_score': (0.8, 0.6, 0.5),
+    'GDT_TS': (0.8, 0.6, 0.4),
+    'LDDT': (0.8, 0.7, 0.6),
+}
+
+
+def d0(longueur):
+    """Échelle de distance du TM-score (Å) pour une référence de `longueur` résidus"""
+    return max(1.24 * np.cbrt(max(longueur - 15, 0)) - 1.8, 0.5)
+
+
+def distances(mobile, cible, transformations):
+    """Distances (S, N) des N paires après chacune des S transformations 4x4 appliquées à mobile"""
+    transformations = np.asarray(transformations)
+    deplaces = mobile @ np.swapaxes(transformations[:, :3, :3], -1, -2) + transformations[:, None, :3, 3]
+    return np.linalg.norm(deplaces - cible, axis=-1)
+
+
+def tm_scores(d, longueur):
+    """TM-score de chaque ligne de la matrice de distances (S, N)"""
+    return (1.0 / (1.0 + (d / d0(longueur)) ** 2)).sum(axis=-1) / longueur
+
+
+def superpositions_tm(mobile, cible, longueur, iterations=ITERATIONS_TM):
+    """
+    Transformations candidates (S, 4, 4) : identité (superposition déjà faite) puis, à chaque
+    itération, Kabsch sur les paires à moins de FACTEURS_TM·d0 après la meilleure candidate
+    (les ajustements d'une itération sont faits en un seul appel à kabsch)
+    """
+    candidates = np.eye(4)[None]
+    meilleure = candidates[0]
+    limites = d0(longueur) * np.asarray(FACTEURS_TM)
+    for _ in range(iterations):
+        masques = distances(mobile, cible, meilleure[None])[0] < limites[:, None]
+        masques = masques[masques.sum(axis=1) >= kabsch.MIN_ATOMES]
+        if not len(masques):
+            break
+        r, t = kabsch.kabsch(np.broadcast_to(mobile, (len(masques),) + mobile.shape),
+                             np.broadcast_to(cible, (len(masques),) + cible.shape), masques)
+        candidates = np.concatenate([candidates, kabsch.matrice_4x4(r, t)])
+        scores = tm_scores(distances(mobile, cible, candidates), longueur)
+        if np.array_equal(candidates[np.argmax(scores)], meilleure):
+            break
+        meilleure = candidates[np.argmax(scores)]
+    return candidates
+
+
+def gdt_ts(d, longueur):
+    """GDT_TS de la matrice de distances (S, N) : meilleure candidate pour chaque seuil"""
+    fractions = (d[..., None] <= np.asarray(SEUILS_GDT)).sum(axis=-2).max(axis=0) / longueur
+    return float(fractions.mean())
+
+
+def lddt(mobile, reference, positions):
+    """
+    LDDT des C-alpha `mobile` (N, 3) appariés aux lignes `positions` de `reference` (L, 3) :
+    les distances de la référence absentes de la cible comptent comme non conservées
+    """
+    dr = np.linalg.norm(reference[:, None] - reference[None], axis=-1)
+    incluses = (dr < RAYON_LDDT) & ~np.eye(len(reference), dtype=bool)
+    total = incluses.sum()
+    if total == 0 or len(mobile) < 2:
+        return 0.0
+    dm = np.linalg.norm(mobile[:, None] - mobile[None], axis=-1)
+    grille = np.ix_(positions, positions)
+    ecart = np.abs(dr[grille] - dm)[incluses[grille]]
+    conservees = (ecart[:, None] < np.asarray(SEUILS_LDDT)).sum(axis=0)
+    return float(conservees.mean() / total)
+
+
+def scores(mobile, reference, positions):
+    """
+    TM-score, GDT_TS et LDDT des C-alpha `mobile` (N, 3), déjà superposés, appariés aux
+    lignes `positions` de `reference` (C-alpha du lobe C de la référence, (L, 3))
+    """
+    mobile = np.asarray(mobile, dtype=np.float64)
+    reference = np.asarray(reference, dtype=np.float64)
+    positions = np.asarray(positions, dtype=np.intp)
+    longueur = len(reference)
+    if longueur == 0 or len(mobile) < kabsch.MIN_ATOMES:
+        return dict.fromkeys(METRIQUES, 0.0)
+    cible = reference[positions]
+    d = distances(mobile, cible, superpositions_tm(mobile, cible, longueur))
+    return {
+        'TM_score': float(tm_scores(d, longueur).max()),
+        'GDT_TS': gdt_ts(d, longueur),
+        'LDDT': lddt(mobile, reference, positions),
+    }
+
+
+def scores_superposition(ca_cible, ca_ref, paires, lobe_start, lobe_end, transformation=None):
+    """
+    Scores d'une superposition à partir des C-alpha appariés.
+    ca_cible, ca_ref : (numéros triés, noms, coordonnées) ; paires : (résidus cible, résidus référence) ;
+    transformation : matrice 4x4 qui place la cible sur la référence (None si ca_cible est déjà superposée).
+    La référence comprend ses C-alpha du lobe C et ses résidus appariés hors du lobe (repli sur tous les C-alpha).
+    """
+    from superposition import coordonnees_residus
+
+    residus_cible = np.asarray(paires[0])
+    residus_ref = np.asarray(paires[1])
+    mobile = coordonnees_residus(ca_cible, residus_cible)
+    coordonnees_residus(ca_ref, residus_ref)  # vérifie que les résidus appariés existent
+    if transformation is not None:
+        mobile = kabsch.appliquer(np.asarray(transformation, dtype=np.float64), mobile)
+    numeros = ca_ref[0]
+    garder = ((numeros >= lobe_start) & (numeros <= lobe_end)) | np.isin(numeros, residus_ref)
+    return scores(mobile, ca_ref[2][garder], np.searchsorted(numeros[garder], residus_ref))
+
+
+def formater(valeurs):
+    """Colonnes METRIQUES du fichier de résultats ('N/A' si les scores n'ont pas été calculés)"""
+    if valeurs is None:
+        return dict.fromkeys(METRIQUES, 'N/A')
+    return {metrique: f"{valeurs[metrique]:.3f}" for metrique in METRIQUES}
+
+
+def statut_qualite(valeur, metrique):
+    """Statut d'une superposition selon une métrique (seuils de SEUILS_STATUT)"""
+    excellent, bon, modere = SEUILS_STATUT[metrique]
+    if valeur >= excellent:
+        return "EXCELLENT"
+    elif valeur >= bon:
+        return "GOOD"
+    elif valeur >= modere:
+        return "MODERATE"
+    return "HIGH_RMSD"
+
+
+def main():
+    from lecture_cif import lire_atom_site, residus_ca
+    from superposition import paires_residus
+
+    parser = argparse.ArgumentParser(description="TM-score, GDT_TS et LDDT de structures déjà superposées")
+    parser.add_argument("structures", nargs="+", help="structures superposées (*_aligned.cif)")
+    parser.add_argument("--chaine", default="A", help="chaîne des structures")
+    parser.add_argument("--reference", default="4WB8-assembly1.cif", help="fichier de la référence")
+    parser.add_argument("--chaine-ref", default="A", help="chaîne de la référence")
+    parser.add_argument("--lobe", type=int, nargs=2, default=(127, 350), metavar=("DEBUT", "FIN"),
+                        help="lobe C de la référence")
+    parser.add_argument("--sans-correspondance", action="store_true",
+                        help="apparier par numéros de résidus au lieu de la correspondance de séquence")
+    args = parser.parse_args()
+
+    ca_ref = residus_ca(lire_atom_site(args.reference, ca_seulement=True, chaines=[args.chaine_ref]),
+                        args.chaine_ref)
+    print(f"🕺🏻 Référence {os.path.basename(args.reference)} : lobe C {args.lobe[0]}-{args.lobe[1]}")
+    print(f"  {'Structure':<24} {'Paires':>6} {'TM-score':>9} {'GDT_TS':>7} {'LDDT':>6}")
+    for chemin in args.structures:
+        try:
+            ca_cible = residus_ca(lire_atom_site(chemin, ca_seulement=True, chaines=[args.chaine]), args.chaine)
+            paires = paires_residus(ca_cible, ca_ref, *args.lobe, not args.sans_correspondance)
+            valeurs = scores_superposition(ca_cible, ca_ref, paires, *args.lobe)
+        except (ValueError, OSError) as e:
+            print(f"  🙈 {os.path.basename(chemin)} : {e}")
+            continue
+        print(f"  {os.path.basename(chemin):<24} {len(paires[0]):>6} {valeurs['TM_score']:>9.3f} "
+              f"{valeurs['GDT_TS']:>7.3f} {valeurs['LDDT']:>6.3f}")
+
+
+if __name__ == "__main__":
+    main()
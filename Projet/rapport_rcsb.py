@@ -0,0 +1,206 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Lecture en colonnes du rapport personnalisé RCSB (rcsb_pdb_custom_report.csv)
+Le rapport a un en-tête sur deux lignes (groupes puis colonnes, avec des noms
+répétés comme "Entity ID" ou "Auth Asym ID") et une entrée s'étale sur plusieurs
+lignes : les lignes de continuation (sans identifiant) ajoutent des entités
+polymères, des chaînes ou des ligands à l'entrée précédente.
+
+Le fichier est lu ligne par ligne (sans readlines) et regroupé en un tableau
+en colonnes, une ligne par (PDB ID, assemblage) :
+    - entry_id, assembly_id, oligomeric_state, oligomeric_count
+    - polymères : tableaux à plat + offsets (instances de l'entrée i :
+      polymer_*[polymer_offsets[i]:polymer_offsets[i + 1]])
+    - ligands : même principe avec ligand_* / ligand_offsets
+
+Usage (hors PyMOL) :
+    python3 rapport_rcsb.py rcsb_pdb_custom_report.csv
+"""
+
+import csv
+import sys
+
+import numpy as np
+
+# ALK humaine
+ALK_UNIPROT = "Q9UM73"
+
+# (groupe, colonne) du rapport -> nom dans le tableau
+COLONNES_ENTREE = {
+    ('Identifier', 'Assembly ID'): 'identifier',
+    ('StructureData', 'PDB ID'): 'entry_id',
+    ('AssemblyData', 'Assembly ID'): 'assembly_id',
+    ('AssemblyData', 'Oligomeric Count'): 'oligomeric_count',
+    ('AssemblyData', 'Oligomeric State'): 'oligomeric_state',
+}
+COLONNES_POLYMERE = {
+    ('Polymer EntityData', 'Entity Polymer Type'): 'type',
+    ('Polymer EntityData', 'Polymer Entity Sequence Length'): 'length',
+    ('Polymer EntityData', 'Entity ID'): 'entity_id',
+    ('Polymer EntityData', 'Accession Code(s)'): 'accessions',
+    ('Polymer EntityData', 'Asym ID'): 'asym_id',
+    ('Polymer EntityData', 'Auth Asym ID'): 'auth_asym_id',
+}
+COLONNES_LIGAND = {
+    ('Non-polymer EntityData', 'Ligand ID'): 'ligand_id',
+    ('Non-polymer EntityData', 'Ligand Name'): 'name',
+    ('Non-polymer EntityData', 'Entity ID'): 'entity_id',
+    ('Non-polymer EntityData', 'Asym ID'): 'asym_id',
+    ('Non-polymer EntityData', 'Auth Asym ID'): 'auth_asym_id',
+}
+# champs d'une entité répétés implicitement sur les lignes qui n'ajoutent qu'une chaîne
+ENTITE_POLYMERE = ('type', 'length', 'entity_id', 'accessions')
+ENTITE_LIGAND = ('ligand_id', 'name', 'entity_id')
+
+
+def _positions(groupes, colonnes, correspondance):
+    """Index des colonnes du CSV pour chaque nom du tableau (groupes propagés vers la droite)"""
+    complets = []
+    groupe = ""
+    for i, colonne in enumerate(colonnes):
+        if i < len(groupes) and groupes[i]:
+            groupe = groupes[i]
+        complets.append((groupe, colonne))
+    return {nom: complets.index(cle) for cle, nom in correspondance.items() if cle in complets}
+
+
+def _instances(lignes, positions, champs_entite):
+    """
+    Instances (une par chaîne) d'un bloc de lignes, sans doublons :
+    une ligne sans champs d'entité reprend l'entité de la ligne précédente.
+    """
+    instances = []
+    vues = set()
+    entite = {champ: "" for champ in champs_entite}
+    for ligne in lignes:
+        valeurs = {nom: ligne[j].strip() if j < len(ligne) else "" for nom, j in positions.items()}
+        if not any(valeurs.values()):
+            continue
+        if any(valeurs.get(champ) for champ in champs_entite):
+            entite = {champ: valeurs.get(champ, "") for champ in champs_entite}
+        else:
+            valeurs.update(entite)
+        cle = (valeurs.get('entity_id'), valeurs.get('asym_id'), valeurs.get('auth_asym_id'))
+        if cle in vues:
+            continue
+        vues.add(cle)
+        instances.append(valeurs)
+    return instances
+
+
+def _blocs(reader, identifiant):
+    """Regroupe les lignes par entrée : une ligne avec identifiant ouvre une nouvelle entrée"""
+    bloc = []
+    for ligne in reader:
+        if not any(ligne):
+            continue
+        if identifiant < len(ligne) and ligne[identifiant].strip():
+            if bloc:
+                yield bloc
+            bloc = [ligne]
+        elif bloc:
+            bloc.append(ligne)
+    if bloc:
+        yield bloc
+
+
+def lire_rapport(csv_file):
+    """
+    Lit le rapport RCSB et renvoie le tableau en colonnes (voir l'en-tête du module).
+    L'assemblage est pris dans l'identifiant "<PDB ID>-<assemblage>" s'il est présent.
+    """
+    entrees = {nom: [] for nom in ('entry_id', 'assembly_id', 'oligomeric_count', 'oligomeric_state')}
+    polymeres = {nom: [] for nom in COLONNES_POLYMERE.values()}
+    ligands = {nom: [] for nom in COLONNES_LIGAND.values()}
+    polymer_offsets = [0]
+    ligand_offsets = [0]
+
+    with open(csv_file, newline='') as f:
+        reader = csv.reader(f)
+        # en-tête sur deux lignes : groupes puis colonnes
+        groupes = next(reader)
+        colonnes = next(reader)
+        pos_entree = _positions(groupes, colonnes, COLONNES_ENTREE)
+        pos_polymere = _positions(groupes, colonnes, COLONNES_POLYMERE)
+        pos_ligand = _positions(groupes, colonnes, COLONNES_LIGAND)
+        identifiant = pos_entree.get('identifier', pos_entree['entry_id'])
+
+        for bloc in _blocs(reader, identifiant):
+            premiere = bloc[0]
+            champ = {nom: premiere[j].strip() if j < len(premiere) else ""
+                     for nom, j in pos_entree.items()}
+            entry_id = champ.get('entry_id', "")
+            assembly_id = champ.get('assembly_id', "")
+            identifier = champ.get('identifier', "")
+            if "-" in identifier:
+                entry_id = entry_id or identifier.rsplit("-", 1)[0]
+                assembly_id = identifier.rsplit("-", 1)[1]
+            entrees['entry_id'].append(entry_id)
+            entrees['assembly_id'].append(assembly_id)
+            entrees['oligomeric_count'].append(champ.get('oligomeric_count', ""))
+            entrees['oligomeric_state'].append(champ.get('oligomeric_state', ""))
+
+            for instance in _instances(bloc, pos_polymere, ENTITE_POLYMERE):
+                for nom in polymeres:
+                    polymeres[nom].append(instance.get(nom, ""))
+            polymer_offsets.append(len(polymeres['asym_id']))
+
+            for instance in _instances(bloc, pos_ligand, ENTITE_LIGAND):
+                for nom in ligands:
+                    ligands[nom].append(instance.get(nom, ""))
+            ligand_offsets.append(len(ligands['asym_id']))
+
+    table = {nom: np.array(valeurs, dtype=str) for nom, valeurs in entrees.items()}
+    table.update({f"polymer_{nom}": np.array(valeurs, dtype=str) for nom, valeurs in polymeres.items()})
+    table.update({f"ligand_{nom}": np.array(valeurs, dtype=str) for nom, valeurs in ligands.items()})
+    table['polymer_offsets'] = np.array(polymer_offsets, dtype=np.int64)
+    table['ligand_offsets'] = np.array(ligand_offsets, dtype=np.int64)
+    return table
+
+
+def instances(table, i, type_="polymer"):
+    """Tranche des instances ("polymer" ou "ligand") de l'entrée i"""
+    offsets = table[f"{type_}_offsets"]
+    return slice(offsets[i], offsets[i + 1])
+
+
+def chaines_accession(table, i, accession=ALK_UNIPROT):
+    """Chaînes (auth_asym_id) de l'entrée i dont l'entité contient l'accession UniProt"""
+    tranche = instances(table, i)
+    return [chaine for chaine, codes in zip(table['polymer_auth_asym_id'][tranche],
+                                            table['polymer_accessions'][tranche])
+            if accession in [c.strip() for c in codes.split(",")]]
+
+
+def selectionner(table, accession=ALK_UNIPROT, avec_ligand=True):
+    """
+    Entrées à superposer : (entry_id, assembly_id, chain_id) dans l'ordre du rapport.
+    La chaîne est celle de l'accession qui porte le premier ligand, sinon la première
+    chaîne de l'accession. Sont écartées les entrées sans chaîne de l'accession et,
+    si `avec_ligand`, celles sans ligand.
+    """
+    entrees = []
+    for i, (entry_id, assembly_id) in enumerate(zip(table['entry_id'], table['assembly_id'])):
+        if not entry_id or not assembly_id:
+            continue
+        chaines = chaines_accession(table, i, accession)
+        ligands = table['ligand_auth_asym_id'][instances(table, i, "ligand")]
+        if not chaines or (avec_ligand and len(ligands) == 0):
+            continue
+        chaine = chaines[0]
+        for chaine_ligand in ligands:
+            if chaine_ligand in chaines:
+                chaine = chaine_ligand
+                break
+        entrees.append((str(entry_id), str(assembly_id), str(chaine)))
+    return entrees
+
+
+if __name__ == "__main__":
+    csv_file = sys.argv[1] if len(sys.argv) > 1 else "rcsb_pdb_custom_report.csv"
+    table = lire_rapport(csv_file)
+    entrees = selectionner(table)
+    print(f"{len(table['entry_id'])} entrées, {len(table['polymer_asym_id'])} chaînes polymères, "
+          f"{len(table['ligand_asym_id'])} ligands")
+    print(f"🕺🏻 {len(entrees)} entrées avec une chaîne {ALK_UNIPROT} et un ligand")
@@ -0,0 +1,186 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Recherche du registre du lobe C de la cible par fenêtre glissante, en NumPy pur
+Au lieu d'essayer quelques plages de résidus avec un cmd.align chacune, tous les
+décalages de numérotation d (résidu r de la référence <-> résidu r + d de la cible)
+et toutes les fenêtres de `longueur` résidus du lobe C de la référence sont évalués en une fois :
+    - les C-alpha de la cible sont rangés sur une grille indexée par numéro de résidu,
+      vue glissante (D, L, 3) sur tous les décalages
+    - sommes cumulées le long du lobe (présence, x, y, x.yT, |x|², |y|²) :
+      les statistiques d'une fenêtre s'obtiennent par une soustraction
+    - RMSD de Kabsch de chaque (décalage, fenêtre) par les valeurs singulières
+      des matrices de covariance 3x3 (SVD par lots), sans calculer les rotations
+Score comme dans not_submit/test_superposition.py : RMSD - n / 100 (favorise les
+fenêtres avec plus d'atomes appariés), avec au moins MIN_PAIRES paires.
+
+Usage (hors PyMOL, depuis le dossier Projet/) :
+    python3 registre_lobe.py cible.cif A reference.cif E --lobe 127 300
+"""
+
+import argparse
+
+import numpy as np
+
+# nombre minimal de C-alpha appariés pour un lobe C (comme test_superposition.py)
+MIN_PAIRES = 40
+
+
+def _grille(numeros, coords, debut, fin):
+    """C-alpha rangés par numéro de résidu de debut à fin : (coordonnées (M, 3), présents (M,))"""
+    taille = fin - debut + 1
+    grille = np.zeros((taille, 3))
+    presents = np.zeros(taille, dtype=bool)
+    garder = (numeros >= debut) & (numeros <= fin) & ~np.isnan(coords).any(axis=1)
+    grille[numeros[garder] - debut] = coords[garder]
+    presents[numeros[garder] - debut] = True
+    return grille, presents
+
+
+def _cumul(valeurs):
+    """Sommes cumulées le long de l'axe 1, précédées de 0 : fenêtre [a, b) = c[:, b] - c[:, a]"""
+    forme = list(valeurs.shape)
+    forme[1] = 1
+    return np.concatenate([np.zeros(forme), np.cumsum(valeurs, axis=1)], axis=1)
+
+
+def profil_registre(ca_cible, ca_ref, lobe_start, lobe_end, longueur=None, decalages=None,
+                    min_paires=MIN_PAIRES):
+    """
+    RMSD de Kabsch (sans rejet d'outliers) de chaque décalage et de chaque fenêtre.
+    ca_cible, ca_ref : (numéros, noms, coordonnées) triés par numéro (lecture_cif.residus_ca,
+    superposition.ca_pymol) ; seul le lobe [lobe_start, lobe_end] de la référence est utilisé.
+    longueur : taille des fenêtres dans la référence (défaut : tout le lobe)
+    decalages : décalages à évaluer (défaut : tous ceux où la cible recouvre le lobe)
+    Renvoie un dictionnaire de tableaux (D, A) : decalages (D,), debuts (A,) (numéros de la
+    référence), rmsd, n (paires), score (inf si moins de min_paires paires).
+    """
+    numeros_cible = np.asarray(ca_cible[0])
+    coords_cible = np.asarray(ca_cible[2], dtype=np.float64)
+    taille = lobe_end - lobe_start + 1
+    longueur = taille if longueur is None else min(longueur, taille)
+
+    ref, presents_ref = _grille(np.asarray(ca_ref[0]), np.asarray(ca_ref[2], dtype=np.float64),
+                                lobe_start, lobe_end)
+    if decalages is None:
+        decalages = np.arange(numeros_cible.min() - lobe_end, numeros_cible.max() - lobe_start + 1)
+    decalages = np.asarray(decalages)
+
+    # grille de la cible couvrant tous les décalages, puis vue glissante (D, L, 3)
+    debut_grille = lobe_start + decalages.min()
+    cible, presents_cible = _grille(numeros_cible, coords_cible, debut_grille, lobe_end + decalages.max())
+    # coordonnées centrées : sommes cumulées plus précises
+    cible -= cible[presents_cible].mean(axis=0) if presents_cible.any() else 0.0
+    ref -= ref[presents_ref].mean(axis=0) if presents_ref.any() else 0.0
+    lignes = decalages - decalages.min()
+    x = np.lib.stride_tricks.sliding_window_view(cible, taille, axis=0)[lignes].transpose(0, 2, 1)
+    poids = np.lib.stride_tricks.sliding_window_view(presents_cible, taille)[lignes] & presents_ref
+    w = poids.astype(np.float64)
+    y = ref[None]
+
+    # statistiques de chaque fenêtre [a, a + longueur) par différence de sommes cumulées
+    debuts = np.arange(taille - longueur + 1)
+
+    def fenetres(valeurs):
+        c = _cumul(valeurs)
+        return c[:, debuts + longueur] - c[:, debuts]
+
+    n = fenetres(w)
+    sx = fenetres(w[..., None] * x)
+    sy = fenetres(w[..., None] * y)
+    sxy = fenetres(w[..., None, None] * x[..., :, None] * y[..., None, :])
+    sxx = fenetres(w * (x ** 2).sum(axis=-1))
+    syy = fenetres(w * (y ** 2).sum(axis=-1))
+
+    with np.errstate(invalid='ignore', divide='ignore'):
+        inverse = np.where(n > 0, 1.0 / n, 0.0)
+        h = sxy - sx[..., :, None] * sy[..., None, :] * inverse[..., None, None]
+        inertie = (sxx - (sx ** 2).sum(axis=-1) * inverse) + (syy - (sy ** 2).sum(axis=-1) * inverse)
+        sigma = np.linalg.svd(h, compute_uv=False)
+        # réflexion : la plus petite valeur singulière change de signe
+        signe = np.where(np.linalg.det(h) < 0, -1.0, 1.0)
+        ecart = inertie - 2.0 * (sigma[..., 0] + sigma[..., 1] + signe * sigma[..., 2])
+        rmsd = np.sqrt(np.maximum(ecart, 0.0) * inverse)
+
+    n = n.round().astype(np.int32)
+    score = np.where(n >= min_paires, rmsd - n / 100.0, np.inf)
+    return {
+        'decalages': decalages,
+        'debuts': lobe_start + debuts,
+        'longueur': longueur,
+        'rmsd': np.where(n > 0, rmsd, np.nan),
+        'n': n,
+        'score': score,
+    }
+
+
+def chercher_registre(ca_cible, ca_ref, lobe_start, lobe_end, longueur=None, decalages=None,
+                      min_paires=MIN_PAIRES):
+    """
+    Meilleur registre du lobe C (voir profil_registre pour les paramètres).
+    Renvoie None si aucune fenêtre n'a min_paires paires, sinon un dictionnaire :
+    decalage, debut_ref/fin_ref, debut_cible/fin_cible, rmsd, n_paires,
+    paires (résidus cible, résidus référence), profil (tableaux de profil_registre)
+    et score_par_decalage (meilleur score de chaque décalage).
+    """
+    profil = profil_registre(ca_cible, ca_ref, lobe_start, lobe_end, longueur, decalages, min_paires)
+    score = profil['score']
+    if not np.isfinite(score).any():
+        return None
+    i, a = np.unravel_index(np.argmin(score), score.shape)
+    decalage = int(profil['decalages'][i])
+    debut_ref = int(profil['debuts'][a])
+    fin_ref = debut_ref + profil['longueur'] - 1
+
+    # paires de la fenêtre retenue (résidus présents dans les deux structures)
+    residus_ref = np.asarray(ca_ref[0])
+    residus_ref = residus_ref[(residus_ref >= debut_ref) & (residus_ref <= fin_ref)]
+    residus_ref = residus_ref[np.isin(residus_ref + decalage, ca_cible[0])]
+    return {
+        'decalage': decalage,
+        'debut_ref': debut_ref,
+        'fin_ref': fin_ref,
+        'debut_cible': debut_ref + decalage,
+        'fin_cible': fin_ref + decalage,
+        'rmsd': float(profil['rmsd'][i, a]),
+        'n_paires': int(profil['n'][i, a]),
+        'paires': (residus_ref + decalage, residus_ref),
+        'profil': profil,
+        'score_par_decalage': score.min(axis=1),
+    }
+
+
+if __name__ == "__main__":
+    import time
+
+    from lecture_cif import lire_atom_site, residus_ca
+
+    parser = argparse.ArgumentParser(description="Registre du lobe C de la cible par fenêtre glissante")
+    parser.add_argument("cible")
+    parser.add_argument("chaine_cible")
+    parser.add_argument("reference")
+    parser.add_argument("chaine_reference")
+    parser.add_argument("--lobe", type=int, nargs=2, default=(127, 300), metavar=("DEBUT", "FIN"),
+                        help="lobe C de la référence (défaut : 127 300)")
+    parser.add_argument("--longueur", type=int, default=None, help="taille des fenêtres (défaut : tout le lobe)")
+    parser.add_argument("--min-paires", type=int, default=MIN_PAIRES)
+    args = parser.parse_args()
+
+    ca_cible = residus_ca(lire_atom_site(args.cible, ca_seulement=True), args.chaine_cible)
+    ca_ref = residus_ca(lire_atom_site(args.reference, ca_seulement=True), args.chaine_reference)
+    debut = time.perf_counter()
+    registre = chercher_registre(ca_cible, ca_ref, *args.lobe, longueur=args.longueur,
+                                 min_paires=args.min_paires)
+    duree = time.perf_counter() - debut
+    if registre is None:
+        print(f"🙈 aucune fenêtre avec au moins {args.min_paires} C-alpha appariés")
+    else:
+        profil = registre['profil']
+        print(f"🕺🏻 {profil['score'].size} fenêtres évaluées en {duree * 1e3:.1f} ms")
+        print(f"  décalage {registre['decalage']:+d} : cible {registre['debut_cible']}-{registre['fin_cible']}"
+              f" ↔ référence {registre['debut_ref']}-{registre['fin_ref']}")
+        print(f"  RMSD {registre['rmsd']:.2f} Å sur {registre['n_paires']} C-alpha")
+        meilleurs = np.argsort(registre['score_par_decalage'])[:5]
+        print("  meilleurs décalages : " + ", ".join(
+            f"{profil['decalages'][i]:+d} ({registre['score_par_decalage'][i]:.2f})"
+            for i in meilleurs if np.isfinite(registre['score_par_decalage'][i])))
@@ -0,0 +1,221 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Statistiques de l'ensemble superposé (Super/*_aligned.cif), calculées en flux
+Les C-alpha sont lus une structure à la fois (fichiers mmCIF, ou lignes du tenseur de
+tenseur_ensemble.py) ; la mémoire ne dépend que du nombre de résidus :
+    - 1er passage : moyenne et écart quadratique de chaque résidu par les mises à jour
+      de Welford -> structure moyenne et RMSF par résidu (numérotation ALK)
+    - 2e passage : RMSD de chaque structure à la structure moyenne sur ses résidus présents
+      dans la plupart des structures (--presence) ; le médoïde est la structure la plus proche
+      de la moyenne (calcul exact des N² distances inutile, mémoire constante)
+Sorties :
+    statistiques_ensemble.npz       : résidus, noms, nombre de structures, moyenne, RMSF, médoïde
+    statistiques_ensemble.csv       : PDB_ID, Chain, N_CA, RMSD_moyenne (écrit au fil du 2e passage)
+    structure_moyenne.cif           : C-alpha moyens, B-factor = 8π²/3 · RMSF², occupancy = fraction
+                                      des structures où le résidu est présent (PyMOL : spectrum b)
+
+Usage (hors PyMOL, depuis le dossier Projet/) :
+    python3 statistiques_ensemble.py ../Super
+    python3 statistiques_ensemble.py --ensemble ensemble_ca.npy --presence 0.8
+"""
+
+import argparse
+import csv
+import time
+
+import numpy as np
+
+from lecture_cif import residus_ca, lire_atom_site
+from tenseur_ensemble import entrees_dossier
+
+# fraction minimale des structures où un résidu est présent pour l'écrire dans structure_moyenne.cif
+PRESENCE = 0.5
+# B-factor isotrope équivalent à une fluctuation RMSF (Å²)
+FACTEUR_B = 8.0 * np.pi ** 2 / 3.0
+
+
+def statistiques_vides():
+    """Statistiques de Welford sans résidu : étendues au fur et à mesure des numéros rencontrés"""
+    return {
+        'premier': None,
+        'n': np.zeros(0, dtype=np.int64),
+        'moyenne': np.zeros((0, 3)),
+        'm2': np.zeros(0),
+        'noms': np.zeros(0, dtype=object),
+        'n_structures': 0,
+    }
+
+
+def _etendre(stats, debut, fin):
+    """Agrandit les tableaux pour couvrir les résidus debut-fin"""
+    if stats['premier'] is None:
+        stats['premier'] = debut
+    avant = max(stats['premier'] - debut, 0)
+    apres = max(fin - (stats['premier'] + len(stats['n']) - 1), 0)
+    if avant or apres:
+        stats['n'] = np.pad(stats['n'], (avant, apres))
+        stats['moyenne'] = np.pad(stats['moyenne'], ((avant, apres), (0, 0)))
+        stats['m2'] = np.pad(stats['m2'], (avant, apres))
+        stats['noms'] = np.pad(stats['noms'], (avant, apres), constant_values=None)
+        stats['premier'] -= avant
+
+
+def accumuler(stats, numeros, noms, coords):
+    """Mise à jour de Welford avec les C-alpha d'une structure (numéros uniques)"""
+    garder = ~np.isnan(coords).any(axis=1)
+    numeros, noms, coords = numeros[garder], noms[garder], np.asarray(coords[garder], dtype=np.float64)
+    stats['n_structures'] += 1
+    if not len(numeros):
+        return
+    _etendre(stats, int(numeros.min()), int(numeros.max()))
+    lignes = numeros - stats['premier']
+    stats['n'][lignes] += 1
+    delta = coords - stats['moyenne'][lignes]
+    stats['moyenne'][lignes] += delta / stats['n'][lignes, None]
+    stats['m2'][lignes] += (delta * (coords - stats['moyenne'][lignes])).sum(axis=1)
+    nouveaux = stats['noms'][lignes] == None  # noqa: E711 (tableau d'objets)
+    stats['noms'][lignes[nouveaux]] = noms[nouveaux]
+
+
+def rmsf(stats):
+    """RMSF de chaque résidu (Å), NaN pour les résidus jamais vus"""
+    with np.errstate(invalid='ignore', divide='ignore'):
+        return np.where(stats['n'] > 0, np.sqrt(stats['m2'] / stats['n']), np.nan)
+
+
+def communs(stats, presence=PRESENCE):
+    """Résidus présents dans au moins `presence` des structures (masque sur les tableaux de stats)"""
+    return (stats['n'] > 0) & (stats['n'] >= presence * stats['n_structures'])
+
+
+def rmsd_moyenne(stats, numeros, coords, valides=None):
+    """
+    RMSD d'une structure à la structure moyenne sur ses résidus présents, limités aux
+    résidus `valides` (voir communs) : (rmsd, nombre de C-alpha)
+    """
+    lignes = numeros - stats['premier']
+    garder = (lignes >= 0) & (lignes < len(stats['n'])) & ~np.isnan(coords).any(axis=1)
+    if valides is not None:
+        garder[garder] = valides[lignes[garder]]
+    if not garder.any():
+        return np.nan, 0
+    ecart = coords[garder] - stats['moyenne'][lignes[garder]]
+    return float(np.sqrt((ecart ** 2).sum(axis=1).mean())), int(garder.sum())
+
+
+def structures_fichiers(entrees, cache_dir=None):
+    """(PDB ID, chaîne, (numéros, noms, coordonnées)) de chaque fichier, lus un par un"""
+    for pdb_id, chaine, chemin in entrees:
+        if cache_dir:
+            from cache_coordonnees import charger_coordonnees
+            structure = charger_coordonnees(chemin, cache_dir, ca_seulement=True)
+        else:
+            structure = lire_atom_site(chemin, ca_seulement=True, chaines=[chaine])
+        yield pdb_id, chaine, residus_ca(structure, chaine)
+
+
+def structures_tenseur(chemin):
+    """Mêmes éléments, lus ligne par ligne dans le tenseur des C-alpha (tenseur_ensemble.py)"""
+    from tenseur_ensemble import ouvrir_ensemble
+
+    coords, masque, index = ouvrir_ensemble(chemin)
+    if index['registre'] != 'ALK' or index['atomes'] != ['CA']:
+        raise ValueError(f"{chemin} : tenseur des C-alpha en numérotation ALK attendu")
+    residus = np.asarray(index['residus'])
+    noms = np.asarray(index.get('noms') or ['UNK'] * len(residus))
+    for ligne, (pdb_id, chaine, _) in enumerate(index['entrees']):
+        presents = np.asarray(masque[ligne])
+        yield pdb_id, chaine, (residus[presents], noms[presents], np.asarray(coords[ligne][presents]))
+
+
+def ecrire_structure_moyenne(stats, destination, presence=PRESENCE, nom="moyenne"):
+    """
+    C-alpha de la structure moyenne en mmCIF (chaîne A, numérotation ALK), pour les résidus
+    présents dans au moins `presence` des structures. Renvoie le nombre d'atomes écrits.
+    """
+    fluctuations = rmsf(stats)
+    fraction = stats['n'] / max(stats['n_structures'], 1)
+    lignes = np.flatnonzero(communs(stats, presence))
+    colonnes = ['group_PDB', 'id', 'type_symbol', 'label_atom_id', 'label_alt_id', 'label_comp_id',
+                'label_asym_id', 'label_entity_id', 'label_seq_id', 'pdbx_PDB_ins_code',
+                'Cartn_x', 'Cartn_y', 'Cartn_z', 'occupancy', 'B_iso_or_equiv',
+                'auth_seq_id', 'auth_comp_id', 'auth_asym_id', 'auth_atom_id', 'pdbx_PDB_model_num']
+    sortie = [f"# generated by statistiques_ensemble.py\n#\ndata_{nom}\n_entry.id {nom}\n#\nloop_\n"]
+    sortie.extend(f"_atom_site.{colonne}\n" for colonne in colonnes)
+    for atome, i in enumerate(lignes, 1):
+        numero = stats['premier'] + i
+        residu = stats['noms'][i] or 'UNK'
+        x, y, z = stats['moyenne'][i]
+        b = FACTEUR_B * fluctuations[i] ** 2
+        sortie.append(f"ATOM {atome} C CA . {residu} A 1 {numero} ? {x:.3f} {y:.3f} {z:.3f} "
+                      f"{fraction[i]:.2f} {b:.2f} {numero} {residu} A CA 1\n")
+    sortie.append("#\n")
+    with open(destination, 'w') as f:
+        f.writelines(sortie)
+    return len(lignes)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Structure moyenne, RMSF et médoïde de l'ensemble superposé")
+    parser.add_argument("dossier", nargs="?", default="../Super", help="dossier des structures *_aligned.cif")
+    parser.add_argument("--resultats", default="superposition_results.csv",
+                        help="résultats de la superposition (chaîne de chaque structure)")
+    parser.add_argument("--ensemble", default=None,
+                        help="tenseur des C-alpha (tenseur_ensemble.py) au lieu des fichiers mmCIF")
+    parser.add_argument("--cache-dir", default=None, help="cache binaire des coordonnées (cache_coordonnees.py)")
+    parser.add_argument("--presence", type=float, default=PRESENCE,
+                        help="fraction minimale des structures pour écrire un résidu dans la structure moyenne")
+    parser.add_argument("--output", default="statistiques_ensemble.npz", help="tableaux des statistiques")
+    parser.add_argument("--ecarts", default="statistiques_ensemble.csv", help="RMSD de chaque structure à la moyenne")
+    parser.add_argument("--cif", default="structure_moyenne.cif", help="structure moyenne annotée (B-factor)")
+    args = parser.parse_args()
+
+    if args.ensemble:
+        def structures():
+            return structures_tenseur(args.ensemble)
+    else:
+        entrees = entrees_dossier(args.dossier, resultats=args.resultats)
+
+        def structures():
+            return structures_fichiers(entrees, args.cache_dir)
+
+    debut = time.perf_counter()
+    stats = statistiques_vides()
+    for _, _, (numeros, noms, coords) in structures():
+        accumuler(stats, numeros, noms, coords)
+    t1 = time.perf_counter()
+
+    # 2e passage : écart de chaque structure à la moyenne, médoïde = la plus proche
+    medoide, rmsd_medoide = None, np.inf
+    valides = communs(stats, args.presence)
+    with open(args.ecarts, 'w', newline='') as f:
+        writer = csv.writer(f)
+        writer.writerow(['PDB_ID', 'Chain', 'N_CA', 'RMSD_moyenne'])
+        for pdb_id, chaine, (numeros, _, coords) in structures():
+            rmsd, n = rmsd_moyenne(stats, numeros, coords, valides)
+            writer.writerow([pdb_id, chaine, n, f"{rmsd:.3f}" if n else 'N/A'])
+            if n and rmsd < rmsd_medoide:
+                medoide, rmsd_medoide = pdb_id, rmsd
+    t2 = time.perf_counter()
+
+    fluctuations = rmsf(stats)
+    residus = stats['premier'] + np.arange(len(stats['n'])) if stats['premier'] is not None else np.zeros(0, int)
+    np.savez(args.output, residus=residus, noms=stats['noms'].astype(str), n=stats['n'],
+             moyenne=stats['moyenne'].astype(np.float32), rmsf=fluctuations.astype(np.float32),
+             n_structures=stats['n_structures'], medoide=str(medoide), rmsd_medoide=rmsd_medoide)
+    n_atomes = ecrire_structure_moyenne(stats, args.cif, args.presence)
+
+    print(f"{stats['n_structures']} structures, {int((stats['n'] > 0).sum())} résidus "
+          f"(moyenne et RMSF {t1 - debut:.2f} s, écarts à la moyenne {t2 - t1:.2f} s)")
+    if medoide is not None:
+        print(f"  médoïde : {medoide} (RMSD à la moyenne {rmsd_medoide:.2f} Å)")
+    vus = np.flatnonzero(valides & (stats['n'] >= 2))
+    for i in vus[np.argsort(-fluctuations[vus])][:5]:
+        print(f"  RMSF {stats['premier'] + i} {stats['noms'][i]} : {fluctuations[i]:.2f} Å")
+    print(f"🕺🏻 Statistiques dans {args.output}, écarts dans {args.ecarts}")
+    print(f"✨ Structure moyenne ({n_atomes} C-alpha) dans {args.cif} (PyMOL : spectrum b)")
+
+
+if __name__ == "__main__":
+    main()
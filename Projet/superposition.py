@@ -0,0 +1,572 @@
+"""
+Fonctions communes pour la superposition des structures ALK sur PKACA
+Utilisées par open_pdb_csv.py (dans PyMOL) et superposition_parallele.py (hors PyMOL)
+Chaque fonction reçoit l'API `cmd` de PyMOL : pymol.cmd ou l'instance pymol2.PyMOL().cmd
+"""
+
+import csv
+import os
+
+from mesures import etape
+from rapport_rcsb import ALK_UNIPROT, lire_rapport, selectionner
+
+# colonnes du fichier superposition_results.csv (TM_score, GDT_TS, LDDT : voir qualite.py)
+RESULTS_FIELDS = ['PDB_ID', 'Chain', 'N_CA_aligned', 'RMSD', 'Status', 'TM_score', 'GDT_TS', 'LDDT']
+# critères possibles pour le statut : le RMSD ou une métrique de qualite.py
+CRITERES_STATUT = ['RMSD', 'TM_score', 'GDT_TS', 'LDDT']
+
+
+def lire_entrees(csv_file, accession=ALK_UNIPROT, avec_ligand=True):
+    """
+    Lit le rapport RCSB (rapport_rcsb.py) et renvoie la liste des (entry_id, assembly_id, chain_id)
+    dans l'ordre du fichier. La chaîne est celle de l'accession UniProt (ALK par défaut) ;
+    les entrées sans cette chaîne (ou sans ligand si `avec_ligand`) sont ignorées.
+    """
+    return selectionner(lire_rapport(csv_file), accession, avec_ligand)
+
+
+def charger_structure(cmd, pdb_id, assembly_id, obj_name, verbose=True):
+    """
+    Charge l'assemblage biologique depuis le fichier local s'il existe,
+    sinon le télécharge avec fetch_mmcif. Le solvant est supprimé.
+    """
+    # supprimer l'objet s'il existe déjà
+    if obj_name in cmd.get_names():
+        cmd.delete(obj_name)
+
+    structure_file = f"{pdb_id}-assembly{assembly_id}.cif"
+    if os.path.exists(structure_file):
+        if verbose:
+            print(f"🕺🏻 Structure déjà présente: {structure_file}, chargement depuis le fichier local")
+        with etape("chargement"):
+            cmd.load(structure_file, obj_name)
+    else:
+        if verbose:
+            print(f"Téléchargement de la structure {pdb_id}...")
+        with etape("telechargement"):
+            cmd.do(f"fetch_mmcif {pdb_id}, {obj_name}, {assembly_id}")
+
+    with etape("solvant"):
+        cmd.remove(f"{obj_name} and solvent")
+
+
+def charger_reference(cmd, reference_pdb, reference_chain, lobe_start, lobe_end, verbose=True):
+    """
+    Charge la référence et renvoie la sélection des C-alpha de son lobe C.
+    Lève une ValueError si le lobe C est vide.
+    """
+    ref_obj = f"{reference_pdb}_ref"
+    charger_structure(cmd, reference_pdb, 1, ref_obj, verbose=verbose)
+
+    lobe_c_ref = f"{ref_obj} and chain {reference_chain} and resi {lobe_start}-{lobe_end} and name CA"
+    if cmd.count_atoms(lobe_c_ref) == 0:
+        raise ValueError(f"aucun atome trouvé dans le lobe C (résidus {lobe_start}-{lobe_end})")
+    return lobe_c_ref
+
+
+def afficher_cible(cmd, obj_name, couleur="cyan"):
+    """Configuration visuelle d'une structure ALK (ou de la référence en vert)"""
+    cmd.hide("everything", obj_name)
+    cmd.show("cartoon", obj_name)
+    cmd.color(couleur, obj_name)
+    cmd.show("sticks", f"({obj_name}) and organic")
+    cmd.show("nb_spheres", f"({obj_name}) and inorganic")
+
+
+def sauvegarder_session(cmd, session_file, ref_obj):
+    """
+    Mode sans affichage : configuration visuelle appliquée en une fois à toutes les
+    structures chargées (*_assembly*) et à la référence, puis session PyMOL sauvegardée.
+    """
+    afficher_cible(cmd, "*_assembly*")
+    afficher_cible(cmd, ref_obj, couleur="green")
+    cmd.save(session_file)
+
+
+def index_objets(cmd):
+    """
+    PDB ID -> objets PyMOL chargés ('2XB7' -> ['2XB7_assembly1', '2XB7_aligned']),
+    construit avec un seul appel à get_names quel que soit le nombre de structures
+    """
+    index = {}
+    for nom in cmd.get_names("objects"):
+        index.setdefault(nom.split('_')[0], []).append(nom)
+    return index
+
+
+def selection_objets(index, pdb_ids):
+    """
+    Objets chargés des PDB ID donnés (voir index_objets) et expression de sélection
+    qui les réunit, pour colorer/afficher tout un groupe en un seul appel à cmd
+    """
+    objets = [obj for pdb_id in pdb_ids for obj in index.get(pdb_id, ())]
+    return objets, " or ".join(objets)
+
+
+def mauvais_alignements(csv_path, seuil=4.0):
+    """
+    PDB ID mal superposés de superposition_results.csv, lus en un seul passage :
+    {'erreur': [...] (ERROR ou RMSD absent), 'rmsd_eleve': [...] (RMSD > seuil)}
+    """
+    groupes = {'erreur': [], 'rmsd_eleve': []}
+    with open(csv_path, newline='') as f:
+        for row in csv.DictReader(f):
+            try:
+                rmsd = float(row['RMSD']) if row['RMSD'] != 'N/A' else None
+            except ValueError:
+                rmsd = None
+            if row['Status'] == "ERROR" or rmsd is None:
+                groupes['erreur'].append(row['PDB_ID'])
+            elif rmsd > seuil:
+                groupes['rmsd_eleve'].append(row['PDB_ID'])
+    return groupes
+
+
+def statut_rmsd(rmsd):
+    """Classe une superposition selon son RMSD (mêmes seuils que le README)"""
+    if rmsd > 4.0:
+        return "HIGH_RMSD"
+    elif rmsd > 2.5:
+        return "MODERATE"
+    elif rmsd < 2.0:
+        return "EXCELLENT"
+    return "GOOD"
+
+
+def statut(rmsd, scores=None, critere="RMSD"):
+    """
+    Statut selon le RMSD ou une métrique de qualite.py (seuils de qualite.SEUILS_STATUT) ;
+    le RMSD est utilisé si les scores n'ont pas été calculés
+    """
+    if critere == "RMSD" or scores is None:
+        return statut_rmsd(rmsd)
+    from qualite import statut_qualite
+
+    return statut_qualite(scores[critere], critere)
+
+
+def resultat_erreur(entry_id):
+    """Ligne de résultats pour une structure en erreur"""
+    return {
+        'PDB_ID': entry_id,
+        'Chain': 'ERROR',
+        'N_CA_aligned': 0,
+        'RMSD': 'N/A',
+        'Status': 'ERROR',
+        'TM_score': 'N/A',
+        'GDT_TS': 'N/A',
+        'LDDT': 'N/A',
+    }
+
+
+def ca_pymol(cmd, selection):
+    """
+    C-alpha d'une sélection PyMOL, un par résidu, triés par numéro :
+    (numéros de résidus, noms des résidus, coordonnées (N, 3))
+    """
+    import numpy as np
+
+    ca = {}
+    cmd.iterate_state(1, selection, "ca.setdefault(resv, (resn, x, y, z))", space={'ca': ca})
+    numeros = sorted(ca)
+    return (np.array(numeros, dtype=np.int32),
+            np.array([ca[n][0] for n in numeros], dtype=str),
+            np.array([ca[n][1:] for n in numeros]).reshape(-1, 3))
+
+
+def ca_fichier(structure_file, chain_id, cache_dir):
+    """
+    Mêmes tableaux que ca_pymol pour une chaîne, lus depuis le cache binaire
+    (cache_coordonnees.py) au lieu de PyMOL.
+    """
+    from cache_coordonnees import charger_coordonnees
+    from lecture_cif import residus_ca
+
+    structure = charger_coordonnees(structure_file, cache_dir, ca_seulement=True)
+    return residus_ca(structure, chain_id)
+
+
+def coordonnees_residus(ca, voulus):
+    """Coordonnées des résidus `voulus` dans ca = (numéros triés, noms, coordonnées)"""
+    import numpy as np
+
+    numeros, coords = ca[0], ca[2]
+    lignes = np.searchsorted(numeros, voulus)
+    lignes = np.minimum(lignes, len(numeros) - 1)
+    if len(numeros) == 0 or not np.array_equal(numeros[lignes], voulus):
+        raise ValueError("résidus appariés absents des coordonnées")
+    return coords[lignes]
+
+
+def paires_residus(ca_cible, ca_ref, lobe_start, lobe_end, correspondance=True, min_paires=20,
+                   cache_dir=None):
+    """
+    Résidus appariés (cible, référence) sans PyMOL : correspondance de séquence dans le
+    lobe C (correspondance_residus.py), sinon mêmes numéros dans le lobe C, sinon mêmes
+    numéros sur toute la chaîne (mêmes replis que superposer_entree)
+    cache_dir : dossier du cache des correspondances (défaut : CORRESPONDANCE_DIR)
+    """
+    import numpy as np
+
+    if correspondance:
+        from correspondance_residus import CORRESPONDANCE_DIR, paires_lobe_c
+
+        paires = paires_lobe_c(ca_cible, ca_ref, lobe_start, lobe_end, cache_dir or CORRESPONDANCE_DIR)
+        if len(paires[0]) >= min_paires:
+            return paires
+    communs = np.intersect1d(ca_cible[0], ca_ref[0])
+    dans_lobe = communs[(communs >= lobe_start) & (communs <= lobe_end)]
+    communs = dans_lobe if len(dans_lobe) >= min_paires else communs
+    return communs, communs
+
+
+def selection_residus(numeros):
+    """Expression 'resi' PyMOL compacte : [1,2,3,7,8] -> '1-3+7-8'"""
+    morceaux = []
+    debut = precedent = None
+    for n in sorted(int(n) for n in numeros):
+        if precedent is not None and n == precedent + 1:
+            precedent = n
+            continue
+        if debut is not None:
+            morceaux.append(f"{debut}-{precedent}" if precedent != debut else f"{debut}")
+        debut = precedent = n
+    if debut is not None:
+        morceaux.append(f"{debut}-{precedent}" if precedent != debut else f"{debut}")
+    return "+".join(morceaux)
+
+
+def paires_pymol(cmd, obj_name, lobe_c_target, lobe_c_ref):
+    """
+    Apparie les C-alpha de la cible et de la référence par l'alignement de séquence
+    de PyMOL (sans superposition). Renvoie (résidus cible, résidus référence).
+    """
+    aln_name = f"{obj_name}_aln"
+    cmd.align(lobe_c_target, lobe_c_ref, cycles=0, transform=0, object=aln_name, quiet=1)
+    return paires_alignement(cmd, aln_name, lobe_c_target, lobe_c_ref)
+
+
+def paires_alignement(cmd, aln_name, lobe_c_target, lobe_c_ref):
+    """
+    (résidus cible, résidus référence) de l'objet d'alignement `aln_name` créé par
+    cmd.align(..., object=aln_name) ; l'objet est supprimé.
+    """
+    import numpy as np
+
+    try:
+        paires = cmd.get_raw_alignment(aln_name)
+    finally:
+        cmd.delete(aln_name)
+
+    resv_target, resv_ref = {}, {}
+    cmd.iterate(lobe_c_target, "resv_[(model, index)] = resv", space={'resv_': resv_target})
+    cmd.iterate(lobe_c_ref, "resv_[(model, index)] = resv", space={'resv_': resv_ref})
+    residus_target, residus_ref = [], []
+    for atome_1, atome_2 in paires:
+        # l'ordre des deux atomes de la paire dépend des objets
+        if atome_1 in resv_ref:
+            atome_1, atome_2 = atome_2, atome_1
+        if atome_1 in resv_target and atome_2 in resv_ref:
+            residus_target.append(resv_target[atome_1])
+            residus_ref.append(resv_ref[atome_2])
+    return np.array(residus_target, dtype=np.int32), np.array(residus_ref, dtype=np.int32)
+
+
+def superposer_numpy(cmd, obj_name, lobe_c_target, lobe_c_ref, cycles=10, cutoff=2.0,
+                     ca_target=None, ca_ref=None, paires=None):
+    """
+    Superposition par le moteur NumPy (kabsch.py) au lieu de cmd.align.
+    Les C-alpha sont appariés par `paires` (résidus cible, résidus référence) si
+    elles sont données (correspondance_residus.py), sinon par l'alignement de
+    séquence de PyMOL. PyMOL applique ensuite la matrice 4x4 finale à l'objet.
+    ca_target / ca_ref : C-alpha déjà lus (voir ca_fichier), sinon lus dans PyMOL.
+    Renvoie (rmsd, nombre de C-alpha gardés, transformation 4x4).
+    """
+    import kabsch
+
+    if paires is None:
+        paires = paires_pymol(cmd, obj_name, lobe_c_target, lobe_c_ref)
+    residus_target, residus_ref = paires
+    if ca_target is None:
+        ca_target = ca_pymol(cmd, lobe_c_target)
+    if ca_ref is None:
+        ca_ref = ca_pymol(cmd, lobe_c_ref)
+    mobile = coordonnees_residus(ca_target, residus_target)
+    cible = coordonnees_residus(ca_ref, residus_ref)
+
+    rmsd, n_aligned, transformation = kabsch.superposer(mobile, cible, cycles=cycles, cutoff=cutoff)
+    cmd.transform_selection(obj_name, transformation.flatten().tolist(), homogenous=1)
+    return rmsd, n_aligned, transformation
+
+
+def superposer_entree(cmd, entry_id, assembly_id, chain_id, lobe_c_ref,
+                      lobe_start, lobe_end, verbose=True, moteur="pymol",
+                      cache_dir=None, ca_ref=None, correspondance=False, afficher=True,
+                      sauvegarder=True, qualite=True, critere="RMSD", details=None):
+    """
+    Charge une structure ALK, superpose le lobe C de la chaîne `chain_id` sur
+    `lobe_c_ref` et sauvegarde la structure superposée dans {entry_id}_aligned.cif.
+    `moteur` : "pymol" (cmd.align) ou "numpy" (kabsch.py, mêmes cycles et cutoff).
+    `cache_dir` : les C-alpha de la cible sont lus dans le cache binaire ;
+    `ca_ref` : C-alpha de la chaîne de référence déjà lus (voir ca_fichier).
+    `correspondance` : apparier les résidus par correspondance_residus.py
+    (alignement de séquence mis en cache) au lieu de la plage resi lobe_start-lobe_end.
+    `afficher` : configuration visuelle de la structure (False en mode sans affichage).
+    `sauvegarder` : écrire {entry_id}_aligned.cif (False si seule la transformation est
+    gardée, voir index_transformations.py).
+    `qualite` : TM-score, GDT_TS et LDDT calculés sur les C-alpha appariés (qualite.py),
+    'N/A' sinon ; `critere` : RMSD ou métrique utilisée pour le statut (CRITERES_STATUT).
+    `details` : dictionnaire rempli avec 'paires' (résidus cible, résidus référence) effectivement
+    appariés par la superposition (ex: écarts par résidu, voir ecarts_residus.py).
+    Renvoie la ligne de résultats (dictionnaire au format RESULTS_FIELDS).
+    """
+    try:
+        lobe_c_ref_complet = lobe_c_ref
+        obj_name = f"{entry_id}_assembly{assembly_id}"
+        charger_structure(cmd, entry_id, assembly_id, obj_name, verbose=verbose)
+        if verbose:
+            print(f"🕺🏻 Structure chargée")
+        if afficher:
+            with etape("affichage"):
+                afficher_cible(cmd, obj_name)
+
+        # C-alpha de la chaîne cible (cache binaire si possible), lus seulement si nécessaire
+        ca_target = None
+        if moteur == "numpy" or correspondance:
+            structure_file = f"{entry_id}-assembly{assembly_id}.cif"
+            with etape("coordonnees"):
+                if cache_dir and os.path.exists(structure_file):
+                    ca_target = ca_fichier(structure_file, chain_id, cache_dir)
+                else:
+                    ca_target = ca_pymol(cmd, f"{obj_name} and chain {chain_id} and name CA")
+
+        # Paires de résidus ALK / lobe C de la référence déjà calculées
+        paires = None
+        if correspondance:
+            from correspondance_residus import paires_lobe_c
+
+            with etape("correspondance"):
+                if ca_ref is None:
+                    ca_ref = ca_pymol(cmd, lobe_c_ref)
+                residus_target, residus_ref = paires_lobe_c(ca_target, ca_ref, lobe_start, lobe_end)
+            if len(residus_target) >= 20:
+                paires = (residus_target, residus_ref)
+                lobe_c_target = f"{obj_name} and chain {chain_id} and resi {selection_residus(residus_target)} and name CA"
+                lobe_c_ref = f"({lobe_c_ref}) and resi {selection_residus(residus_ref)}"
+                n_atoms_target = len(residus_target)
+                if verbose:
+                    print(f"🕺🏻 {n_atoms_target} C-alpha appariés au lobe C de la référence")
+            elif verbose:
+                print(f"🙈 Correspondance insuffisante ({len(residus_target)} C-alpha), sélection par numéros de résidus.")
+
+        if paires is None:
+            # Vérifier la sélection du lobe C
+            lobe_c_target = f"{obj_name} and chain {chain_id} and resi {lobe_start}-{lobe_end} and name CA"
+            n_atoms_target = cmd.count_atoms(lobe_c_target)
+
+            if n_atoms_target < 20:
+                if verbose:
+                    print(f"🙈 Peu d'atomes trouvés dans le lobe C ({n_atoms_target}). Utilisation de tous les C-alpha.")
+                lobe_c_target = f"{obj_name} and chain {chain_id} and name CA"
+                n_atoms_target = cmd.count_atoms(lobe_c_target)
+
+        if n_atoms_target == 0:
+            if verbose:
+                print(f"🙈 erreur : Aucun atome trouvé dans {entry_id}. Structure peut être incomplète.")
+            return resultat_erreur(entry_id)
+
+        # Moteur numpy sans correspondance : paires de l'alignement de séquence de PyMOL,
+        # partagées avec les scores et l'appelant
+        if moteur == "numpy" and paires is None:
+            with etape("appariement"):
+                paires = paires_pymol(cmd, obj_name, lobe_c_target, lobe_c_ref)
+
+        # Superposition finale
+        if verbose:
+            print(f"Superposition de {n_atoms_target} C-alpha...")
+        with etape("alignement"):
+            if moteur == "numpy":
+                rmsd, n_aligned, _ = superposer_numpy(cmd, obj_name, lobe_c_target, lobe_c_ref,
+                                                      cycles=10, cutoff=2.0, ca_target=ca_target,
+                                                      ca_ref=ca_ref, paires=paires)
+            else:
+                # objet d'alignement créé seulement s'il faut les paires (scores, écarts par résidu) :
+                # elles sont lues sur ce cmd.align, sans second alignement
+                garder_paires = (qualite or details is not None) and paires is None
+                aln_name = f"{obj_name}_aln"
+                alignment = cmd.align(
+                    lobe_c_target,
+                    lobe_c_ref,
+                    cycles=10,
+                    cutoff=2.0,
+                    transform=1,
+                    quiet=0 if verbose else 1,
+                    **({'object': aln_name} if garder_paires else {})
+                )
+                rmsd = alignment[0]
+                n_aligned = alignment[1]
+                if garder_paires:
+                    paires = paires_alignement(cmd, aln_name, lobe_c_target, lobe_c_ref)
+        if details is not None:
+            details['paires'] = paires
+
+        # Scores indépendants de la taille sur les mêmes paires, C-alpha relus après superposition
+        from qualite import formater, scores_superposition
+
+        scores = None
+        if qualite:
+            with etape("qualite"):
+                try:
+                    if ca_ref is None:
+                        ca_ref = ca_pymol(cmd, lobe_c_ref_complet)
+                    ca_apres = ca_pymol(cmd, f"{obj_name} and chain {chain_id} and name CA")
+                    scores = scores_superposition(ca_apres, ca_ref, paires, lobe_start, lobe_end)
+                except ValueError as e:
+                    if verbose:
+                        print(f"🙈 Scores de qualité non calculés ({e})")
+        status = statut(rmsd, scores, critere)
+
+        if verbose:
+            print(f"🕺🏻 Résultats finaux:")
+            print(f"  RMSD: {rmsd:.2f} Å")
+            print(f"  C-alpha alignés: {n_aligned}")
+            if scores is not None:
+                print(f"  TM-score: {scores['TM_score']:.3f}  GDT_TS: {scores['GDT_TS']:.3f}  "
+                      f"LDDT: {scores['LDDT']:.3f}")
+            if status == "HIGH_RMSD":
+                print(f"  🙈 RMSD élevé - Vérifier manuellement!")
+            elif status == "MODERATE":
+                print(f"  🙈 RMSD modéré - Acceptable mais vérifier")
+            elif status == "EXCELLENT":
+                print(f"  🕺🏻 Excellente superposition!")
+            else:
+                print(f"  🕺🏻 Bonne superposition")
+
+            if n_aligned < 50:
+                print(f"  🙈 Peu d'atomes alignés - Structures très différentes?")
+            elif n_aligned > 100:
+                print(f"  🕺🏻 Bon nombre d'atomes alignés")
+
+        # Sauvegarder la structure superposée au format mmcif
+        if sauvegarder:
+            with etape("sauvegarde"):
+                cmd.save(f"{entry_id}_aligned.cif", obj_name)
+            if verbose:
+                print(f"  ✨ Sauvegardé : {entry_id}_aligned.cif")
+
+        return {
+            'PDB_ID': entry_id,
+            'Chain': chain_id,
+            'N_CA_aligned': n_aligned,
+            'RMSD': f"{rmsd:.2f}",
+            'Status': status,
+            **formater(scores),
+        }
+
+    except Exception as e:
+        if verbose:
+            print(f"🙈 erreur : {e}")
+        return resultat_erreur(entry_id)
+
+
+def matrice_superposition(cmd, obj_name, chain_id, ca_avant):
+    """
+    Transformation 4x4 appliquée à l'objet par la superposition (cmd.align ou NumPy),
+    retrouvée en ajustant les C-alpha de la chaîne avant (`ca_avant`, lus dans le
+    fichier d'entrée) sur leurs positions actuelles dans PyMOL.
+    """
+    import numpy as np
+    import kabsch
+
+    with etape("transformation"):
+        ca_apres = ca_pymol(cmd, f"{obj_name} and chain {chain_id} and name CA")
+        communs = np.intersect1d(ca_avant[0], ca_apres[0])
+        _, _, transformation = kabsch.superposer(coordonnees_residus(ca_avant, communs),
+                                                 coordonnees_residus(ca_apres, communs), cycles=0)
+    return transformation
+
+
+def superposer_doublon(cmd, entry_id, assembly_id, chain_id, transformation, result_representant,
+                       fichier_representant=None, charger=True, verbose=True, afficher=True,
+                       sauvegarder=True):
+    """
+    Superpose un doublon (doublons.py) sans nouvel alignement : la transformation du
+    représentant est appliquée telle quelle et sa ligne de résultats est reprise.
+    `fichier_representant` : fichier aligné du représentant, partagé par lien physique
+    quand les fichiers d'entrée sont identiques (pas de nouvelle sauvegarde).
+    `charger` : charger le doublon dans PyMOL (inutile sans interface si le fichier est partagé).
+    `sauvegarder` : écrire {entry_id}_aligned.cif (False si seule la transformation est gardée).
+    """
+    import shutil
+
+    try:
+        obj_name = f"{entry_id}_assembly{assembly_id}"
+        output = f"{entry_id}_aligned.cif"
+        if charger or (sauvegarder and fichier_representant is None):
+            charger_structure(cmd, entry_id, assembly_id, obj_name, verbose=verbose)
+            if afficher:
+                with etape("affichage"):
+                    afficher_cible(cmd, obj_name)
+            with etape("alignement"):
+                cmd.transform_selection(obj_name, transformation.flatten().tolist(), homogenous=1)
+
+        if sauvegarder:
+            with etape("sauvegarde"):
+                if fichier_representant is not None:
+                    if os.path.exists(output):
+                        os.remove(output)
+                    try:
+                        os.link(fichier_representant, output)
+                    except OSError:
+                        shutil.copyfile(fichier_representant, output)
+                else:
+                    cmd.save(output, obj_name)
+        if verbose:
+            print(f"🕺🏻 Doublon de {result_representant['PDB_ID']} : transformation reprise")
+            if sauvegarder:
+                print(f"  ✨ Sauvegardé : {output}")
+
+        return dict(result_representant, PDB_ID=entry_id, Chain=chain_id)
+
+    except Exception as e:
+        if verbose:
+            print(f"🙈 erreur : {e}")
+        return resultat_erreur(entry_id)
+
+
+def pic_memoire(enfants=False):
+    """
+    Pic de mémoire résidente (RSS) du processus en Mo, ou du plus gros processus
+    fils terminé si `enfants` (processus de superposition_parallele.py).
+    None si le module resource n'existe pas (Windows).
+    """
+    try:
+        import resource
+    except ImportError:
+        return None
+    import sys
+
+    qui = resource.RUSAGE_CHILDREN if enfants else resource.RUSAGE_SELF
+    pic = resource.getrusage(qui).ru_maxrss
+    # ru_maxrss est en octets sous macOS, en kilo-octets sous Linux
+    return pic / 1024 ** 2 if sys.platform == "darwin" else pic / 1024
+
+
+def ouvrir_resultats(output_csv):
+    """
+    Ouvre le fichier de résultats pour y écrire les lignes au fur et à mesure
+    (writer.writerow puis f.flush() après chaque structure). Renvoie (fichier, writer).
+    """
+    f = open(output_csv, 'w', newline='')
+    writer = csv.DictWriter(f, fieldnames=RESULTS_FIELDS)
+    writer.writeheader()
+    f.flush()
+    return f, writer
+
+
+def ecrire_resultats(results, output_csv):
+    """Sauvegarde les résultats dans le fichier CSV"""
+    with open(output_csv, 'w', newline='') as f:
+        writer = csv.DictWriter(f, fieldnames=RESULTS_FIELDS)
+        writer.writeheader()
+        writer.writerows(results)
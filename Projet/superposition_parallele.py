@@ -0,0 +1,404 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Superposition parallèle des structures ALK sur PKACA (sans interface graphique)
+Les lignes du CSV sont réparties entre N processus, chacun avec sa propre
+instance PyMOL (pymol2) et la référence 4WB8 chargée une seule fois.
+Les résultats sont fusionnés dans superposition_results.csv dans l'ordre du CSV.
+
+Usage (hors PyMOL, depuis le dossier Projet/) :
+    python3 superposition_parallele.py --workers 64
+"""
+
+import argparse
+import os
+from multiprocessing import Pool
+
+from superposition import (CRITERES_STATUT, charger_reference, superposer_entree,
+                           ecrire_resultats, resultat_erreur, ca_fichier, ca_pymol,
+                           matrice_superposition, superposer_doublon, pic_memoire)
+from doublons import TOLERANCE, FICHIER, grouper, ca_entree
+from manifeste import (chemin_manifeste, cle_entree, parametres_run, signature,
+                       charger_manifeste, a_jour, ajouter, compacter)
+from index_transformations import chemin_index, enregistrer as enregistrer_transformation, charger_index
+from ecarts_residus import chemins_ecarts, completer_profils, ecarts, ecrire_ecarts
+import mesures
+from rapport_rcsb import ALK_UNIPROT, lire_rapport, selectionner
+from profil_chaines import PROFIL_DIR, choisir_chaines
+from telechargement import SOURCE_RCSB, N_REQUETES, nom_assemblage, prefetch
+
+# mêmes paramètres que open_pdb_csv.py
+csv_file = "rcsb_pdb_custom_report.csv"
+output_csv = "superposition_results.csv"
+reference_pdb = "4WB8"
+reference_chain = "A"
+PKACA_LOBE_C_START = 127
+PKACA_LOBE_C_END = 350
+
+# extension fetch_mmcif (pymol2 ne lit pas ~/.pymolrc)
+FETCH_MMCIF_SCRIPT = os.path.expanduser("~/PROGRAMS/PYMOL_SCRIPTS/fetch_mmcif.py")
+
+# état propre à chaque processus : instance PyMOL, sélection du lobe C de la référence
+# et options passées à superposer_entree ; _indexer : renvoyer la transformation de chaque entrée ;
+# _ecarts : renvoyer le profil des écarts par résidu (ecarts_residus.py) ;
+# _erreur_init : erreur de _init_worker, relevée à la première tâche (pas de relance sans fin du Pool)
+_pymol = None
+_lobe_c_ref = None
+_options = {}
+_indexer = False
+_ecarts = False
+_erreur_init = None
+
+
+def verifier_environnement(fetch_script=FETCH_MMCIF_SCRIPT):
+    """
+    Vérifie dans le processus principal, avant de créer le Pool, que pymol2 s'importe et que
+    la référence se charge (fichier local ou fetch_mmcif). Lève une RuntimeError sinon :
+    une erreur dans l'initialiseur ferait relancer les processus sans fin.
+    """
+    try:
+        import pymol2
+    except ImportError as e:
+        raise RuntimeError(f"pymol2 introuvable ({e}) : lancer avec le Python de PyMOL")
+    instance = pymol2.PyMOL()
+    instance.start()
+    try:
+        cmd = instance.cmd
+        cmd.feedback("disable", "all", "everything")
+        if fetch_script and os.path.exists(fetch_script):
+            cmd.run(fetch_script)
+        charger_reference(cmd, reference_pdb, reference_chain, PKACA_LOBE_C_START, PKACA_LOBE_C_END,
+                          verbose=False)
+    except Exception as e:
+        raise RuntimeError(f"référence {reference_pdb} chaîne {reference_chain} non chargée : {e}")
+    finally:
+        instance.stop()
+
+
+def _init_worker(fetch_script, options, indexer=False, options_mesures=None, ecarts=False):
+    """
+    Démarre une instance PyMOL par processus et y charge la référence.
+    options_mesures : arguments de mesures.activer (relevés renvoyés au processus principal)
+    Une erreur est gardée dans _erreur_init et relevée par _traiter_entree.
+    """
+    global _erreur_init
+    try:
+        _demarrer_worker(fetch_script, options, indexer, options_mesures, ecarts)
+    except Exception as e:
+        _erreur_init = f"{type(e).__name__}: {e}"
+
+
+def _demarrer_worker(fetch_script, options, indexer, options_mesures, ecarts):
+    global _pymol, _lobe_c_ref, _options, _indexer, _ecarts
+    import pymol2
+
+    _indexer = indexer
+    _ecarts = ecarts
+    if options_mesures is not None:
+        mesures.activer(None, **options_mesures)
+    _pymol = pymol2.PyMOL()
+    _pymol.start()
+    cmd = _pymol.cmd
+    cmd.feedback("disable", "all", "everything")
+    if fetch_script and os.path.exists(fetch_script):
+        cmd.run(fetch_script)
+
+    _lobe_c_ref = charger_reference(cmd, reference_pdb, reference_chain,
+                                    PKACA_LOBE_C_START, PKACA_LOBE_C_END, verbose=False)
+
+    # C-alpha de la chaîne de référence lus une seule fois par processus
+    # pas d'interface : aucune représentation ni couleur
+    _options = dict(options, afficher=False)
+    if _options.get('moteur') == "numpy" or _options.get('correspondance') or _options.get('qualite') or ecarts:
+        ref_file = f"{reference_pdb}-assembly1.cif"
+        if _options.get('cache_dir') and os.path.exists(ref_file):
+            _options['ca_ref'] = ca_fichier(ref_file, reference_chain, _options['cache_dir'])
+        else:
+            _options['ca_ref'] = ca_pymol(cmd, f"{reference_pdb}_ref and chain {reference_chain} and name CA")
+
+
+def _superposer(entry_id, assembly_id, chain_id, details=None):
+    try:
+        return superposer_entree(_pymol.cmd, entry_id, assembly_id, chain_id, _lobe_c_ref,
+                                 PKACA_LOBE_C_START, PKACA_LOBE_C_END, verbose=False,
+                                 details=details, **_options)
+    except Exception:
+        return resultat_erreur(entry_id)
+
+
+def _traiter_entree(tache):
+    """
+    Superpose une entrée du CSV puis ses doublons (transformation reprise, voir doublons.py).
+    Renvoie la liste des (position dans le CSV, ligne de résultats, transformation 4x4 ou None,
+    profil des écarts ou None) et les relevés de mesures.py faits pendant la tâche ;
+    la transformation n'est renvoyée que pour l'index des transformations,
+    le profil (voir ecarts_residus.ecarts) seulement si les écarts sont demandés, calculé
+    sur les paires effectivement superposées par superposer_entree.
+    """
+    if _erreur_init is not None:
+        raise RuntimeError(f"initialisation du processus de calcul impossible : {_erreur_init}")
+    index, (entry_id, assembly_id, chain_id), doublons = tache
+    cmd = _pymol.cmd
+    mesures.commencer(entry_id)
+    details = {} if _ecarts else None
+    result = _superposer(entry_id, assembly_id, chain_id, details)
+
+    transformation = profil = None
+    if (doublons or _indexer or _ecarts) and result['Status'] != 'ERROR':
+        try:
+            ca_avant = ca_entree(f"{entry_id}-assembly{assembly_id}.cif", chain_id, _options.get('cache_dir'))
+            transformation = matrice_superposition(cmd, f"{entry_id}_assembly{assembly_id}", chain_id, ca_avant)
+        except (ValueError, OSError):
+            transformation = None
+            if not _options.get('sauvegarder', True):
+                # ni fichier aligné ni transformation : rien à reconstruire pour cette entrée
+                result = resultat_erreur(entry_id)
+        # un profil manquant ne remet en cause ni la superposition ni sa transformation
+        if _ecarts and transformation is not None and details.get('paires') is not None:
+            try:
+                with mesures.etape("ecarts"):
+                    profil = ecarts(ca_avant, _options['ca_ref'], details['paires'], transformation)
+            except (ValueError, OSError):
+                profil = None
+    # libérer la mémoire de l'instance : seul le fichier aligné (ou la transformation) est conservé
+    cmd.delete(f"{entry_id}_assembly{assembly_id}")
+    mesures.finir()
+    results = [(index, result, transformation if _indexer else None, profil)]
+
+    for index_doublon, (entry_doublon, assembly_doublon, chain_doublon), type_doublon in doublons:
+        mesures.commencer(entry_doublon)
+        if transformation is None:
+            result_doublon = _superposer(entry_doublon, assembly_doublon, chain_doublon)
+            results.append((index_doublon, result_doublon, None, None))
+        else:
+            fichier = f"{entry_id}_aligned.cif" if type_doublon == FICHIER else None
+            result_doublon = superposer_doublon(cmd, entry_doublon, assembly_doublon, chain_doublon,
+                                                transformation, result, fichier, charger=False,
+                                                verbose=False, afficher=False,
+                                                sauvegarder=_options.get('sauvegarder', True))
+            # même structure que le représentant : mêmes écarts
+            results.append((index_doublon, result_doublon, transformation if _indexer else None, profil))
+        cmd.delete(f"{entry_doublon}_assembly{assembly_doublon}")
+        mesures.finir()
+    return results, mesures.a_envoyer()
+
+
+def superposer_en_parallele(entrees, n_workers, fetch_script=FETCH_MMCIF_SCRIPT, chunksize=1,
+                            au_resultat=None, doublons=None, indexer=False, options_mesures=None,
+                            ecarts=None, **options):
+    """
+    Superpose toutes les entrées avec `n_workers` processus.
+    `options` : arguments de superposer_entree (moteur, cache_dir, correspondance, sauvegarder,
+    qualite, critere).
+    `au_resultat(index, result, transformation)` est appelé dans le processus principal dès
+    qu'une structure est terminée (ex: écriture du manifeste et de l'index des transformations) ;
+    `transformation` est la matrice 4x4 si `indexer`, None sinon.
+    `options_mesures` : mesures par étape dans les processus (arguments de mesures.activer),
+    les relevés sont ajoutés à ceux du processus principal (mesures.activer doit y avoir été appelé).
+    `doublons` : index -> (index du représentant, type) (voir doublons.grouper) ;
+    chaque doublon est traité par le processus de son représentant, sans nouvel alignement.
+    `ecarts` : dictionnaire index -> profil des écarts par résidu (ecarts_residus.ecarts),
+    rempli au fur et à mesure ; None pour ne pas les calculer.
+    Les résultats sont renvoyés dans l'ordre des entrées, quel que soit l'ordre d'arrivée.
+    Lève une RuntimeError si PyMOL ou la référence ne sont pas disponibles (verifier_environnement)
+    ou si un processus n'a pas pu s'initialiser.
+    """
+    doublons = doublons or {}
+    results = [None] * len(entrees)
+    if not entrees:
+        return results
+    verifier_environnement(fetch_script)
+    taches = {i: (i, entree, []) for i, entree in enumerate(entrees) if i not in doublons}
+    for i, (representant, type_doublon) in sorted(doublons.items()):
+        taches[representant][2].append((i, entrees[i], type_doublon))
+
+    done = 0
+    with Pool(n_workers, initializer=_init_worker,
+              initargs=(fetch_script, options, indexer, options_mesures, ecarts is not None)) as pool:
+        for resultats_tache, releves in pool.imap_unordered(_traiter_entree, taches.values(), chunksize=chunksize):
+            mesures.ajouter(releves)
+            for index, result, transformation, profil in resultats_tache:
+                done += 1
+                results[index] = result
+                if ecarts is not None:
+                    ecarts[index] = profil
+                if au_resultat is not None:
+                    au_resultat(index, result, transformation)
+                print(f"[{done}/{len(entrees)}] {result['PDB_ID']:<6} {result['RMSD']:>6} {result['Status']}")
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Superposition parallèle des structures ALK sur PKACA")
+    parser.add_argument("--csv", default=csv_file, help="rapport RCSB contenant les structures")
+    parser.add_argument("--output", default=output_csv, help="fichier de résultats")
+    parser.add_argument("--workers", type=int, default=os.cpu_count(), help="nombre de processus")
+    parser.add_argument("--chunksize", type=int, default=1, help="entrées envoyées à la fois à un processus")
+    parser.add_argument("--accession", default=ALK_UNIPROT, help="accession UniProt de la chaîne à superposer")
+    parser.add_argument("--sans-ligand", action="store_true", help="garder aussi les entrées sans ligand")
+    parser.add_argument("--max-structures", type=int, default=None, help="limiter le nombre de structures")
+    parser.add_argument("--moteur", choices=["pymol", "numpy"], default="pymol",
+                        help="moteur de superposition (cmd.align ou Kabsch NumPy)")
+    parser.add_argument("--cache-dir", default=None,
+                        help="cache binaire des coordonnées (moteur numpy), voir cache_coordonnees.py")
+    parser.add_argument("--sans-correspondance", action="store_true",
+                        help="sélectionner le lobe C par numéros de résidus (resi 127-350) au lieu de la correspondance de séquence")
+    parser.add_argument("--sans-qualite", action="store_true",
+                        help="ne pas calculer TM-score, GDT_TS et LDDT (voir qualite.py)")
+    parser.add_argument("--statut", choices=CRITERES_STATUT, default="RMSD",
+                        help="critère du statut EXCELLENT/GOOD/MODERATE/HIGH_RMSD")
+    parser.add_argument("--tout-refaire", action="store_true",
+                        help="ignorer le manifeste et resuperposer toutes les structures")
+    parser.add_argument("--source", default=SOURCE_RCSB,
+                        help="source du pré-téléchargement : modèle d'URL avec {nom} ou dossier miroir local")
+    parser.add_argument("--prefetch-workers", type=int, default=N_REQUETES,
+                        help="téléchargements simultanés avant la superposition")
+    parser.add_argument("--sans-prefetch", action="store_true",
+                        help="ne pas pré-télécharger (fetch_mmcif dans chaque processus si besoin)")
+    parser.add_argument("--sans-profil-chaines", action="store_true",
+                        help="garder la première chaîne du rapport au lieu de la choisir sur le profil "
+                             "des chaînes (voir profil_chaines.py)")
+    parser.add_argument("--sans-doublons", action="store_true",
+                        help="superposer aussi les structures identiques au lieu de reprendre la transformation")
+    parser.add_argument("--tolerance-doublons", type=float, default=TOLERANCE,
+                        help="écart maximal entre C-alpha (Å) pour considérer deux structures identiques")
+    parser.add_argument("--sortie", choices=["cif", "transformation", "les-deux"], default="les-deux",
+                        help="fichiers {entry_id}_aligned.cif, index des transformations "
+                             "(voir index_transformations.py) ou les deux")
+    parser.add_argument("--sans-ecarts", action="store_true",
+                        help="ne pas écrire les écarts par résidu à la référence (voir ecarts_residus.py)")
+    parser.add_argument("--mesures", default=None,
+                        help="fichier des mesures par étape (.jsonl ou .csv), voir mesures.py")
+    parser.add_argument("--sans-tracemalloc", action="store_true",
+                        help="mesures sans suivi des allocations Python (plus rapide)")
+    parser.add_argument("--profils", type=int, default=0,
+                        help="profils cProfile des N structures les plus lentes (dossier profils/)")
+    parser.add_argument("--fetch-script", default=FETCH_MMCIF_SCRIPT, help="chemin de fetch_mmcif.py")
+    args = parser.parse_args()
+
+    table = lire_rapport(args.csv)
+    entrees = selectionner(table, args.accession, avec_ligand=not args.sans_ligand)
+    if args.max_structures is not None:
+        entrees = entrees[:args.max_structures]
+
+    fichiers_alignes = args.sortie != "transformation"
+    indexer = args.sortie != "cif"
+    options = dict(moteur=args.moteur, cache_dir=args.cache_dir,
+                   correspondance=not args.sans_correspondance, sauvegarder=fichiers_alignes,
+                   qualite=not args.sans_qualite, critere=args.statut)
+
+    options_mesures = None
+    if args.mesures:
+        options_mesures = dict(memoire=not args.sans_tracemalloc, profils=args.profils)
+        mesures.activer(args.mesures, **options_mesures)
+
+    # tous les assemblages sont téléchargés avant de démarrer les instances PyMOL
+    echecs = {}
+    if not args.sans_prefetch:
+        noms = [nom_assemblage(reference_pdb, 1)] + [nom_assemblage(e, a) for e, a, _ in entrees]
+        with mesures.etape("prefetch"):
+            echecs = prefetch(noms, args.source, n_workers=args.prefetch_workers)
+        if nom_assemblage(reference_pdb, 1) in echecs:
+            raise SystemExit(f"🙈 erreur : référence {reference_pdb} non disponible")
+
+    # chaîne de chaque entrée choisie sur le profil des chaînes des fichiers locaux
+    if not args.sans_profil_chaines:
+        with mesures.etape("chaines"):
+            entrees, changements = choisir_chaines(entrees, table, args.accession, PROFIL_DIR)
+        for entry_id, avant, apres in changements:
+            print(f"🕺🏻 {entry_id} : chaîne {apres} au lieu de {avant} (profil des chaînes)")
+
+    # manifeste : les structures déjà superposées avec les mêmes entrées sont reprises telles quelles
+    manifest_file = chemin_manifeste(args.output)
+    manifeste = {} if args.tout_refaire else charger_manifeste(manifest_file)
+    parametres = parametres_run(reference_pdb, reference_chain, PKACA_LOBE_C_START, PKACA_LOBE_C_END,
+                                moteur=args.moteur, correspondance=not args.sans_correspondance,
+                                fichiers_alignes=fichiers_alignes, index_transformations=indexer,
+                                qualite=not args.sans_qualite, statut=args.statut)
+    index_file = chemin_index(args.output)
+    results = [None] * len(entrees)
+    a_faire = []
+    for index, (entry_id, assembly_id, chain_id) in enumerate(entrees):
+        record = manifeste.get(cle_entree(entry_id, assembly_id, chain_id))
+        if a_jour(record, signature(entry_id, assembly_id, parametres)):
+            results[index] = record['result']
+        elif nom_assemblage(entry_id, assembly_id) in echecs:
+            results[index] = resultat_erreur(entry_id)
+        else:
+            a_faire.append(index)
+
+    def enregistrer(index_a_faire, result, transformation):
+        entry_id, assembly_id, chain_id = entrees[a_faire[index_a_faire]]
+        if transformation is not None:
+            enregistrer_transformation(index_file, entry_id, assembly_id, chain_id, transformation, result,
+                                       parametres=parametres)
+        cle = cle_entree(entry_id, assembly_id, chain_id)
+        sortie = f"{entry_id}_aligned.cif" if fichiers_alignes else index_file
+        manifeste[cle] = ajouter(manifest_file, cle, signature(entry_id, assembly_id, parametres),
+                                 result, sortie)
+
+    # doublons parmi les entrées à refaire (index dans a_faire)
+    doublons = {}
+    if not args.sans_doublons:
+        with mesures.etape("doublons"):
+            doublons = grouper([entrees[i] for i in a_faire], args.cache_dir, args.tolerance_doublons)
+        if doublons:
+            print(f"🕺🏻 {len(doublons)} doublons superposés avec la transformation de leur représentant")
+
+    n_workers = max(1, min(args.workers, len(a_faire)))
+    print(f"{len(entrees)} structures, {len(entrees) - len(a_faire)} déjà à jour, "
+          f"{len(a_faire)} réparties sur {n_workers} processus")
+
+    profils = None if args.sans_ecarts else {}
+    try:
+        nouveaux = superposer_en_parallele([entrees[i] for i in a_faire], n_workers, args.fetch_script,
+                                           args.chunksize, au_resultat=enregistrer, doublons=doublons,
+                                           indexer=indexer, options_mesures=options_mesures, ecarts=profils,
+                                           **options)
+    except RuntimeError as e:
+        raise SystemExit(f"🙈 erreur : {e}")
+    for index, result in zip(a_faire, nouveaux):
+        results[index] = result
+
+    ecrire_resultats(results, args.output)
+    compacter(manifest_file, manifeste)
+    if indexer:
+        compacter(index_file, charger_index(index_file))
+
+    # écarts par résidu des entrées déjà à jour : lignes du tableau précédent, sinon recalculés
+    # depuis l'index des transformations ou le fichier aligné ; le tableau précédent n'est pas
+    # remplacé s'il est illisible et que des profils ne peuvent pas être retrouvés
+    ecarts_ecrits = False
+    if profils is not None:
+        ecarts_file, _ = chemins_ecarts(args.output)
+        with mesures.etape("ecarts"):
+            ecarts_par_entree = {a_faire[i]: profil for i, profil in profils.items()}
+            n_manquants, lisible = completer_profils(
+                ecarts_file, entrees, results, ecarts_par_entree, charger_index(index_file) if indexer else {},
+                lambda: ca_entree(nom_assemblage(reference_pdb, 1), reference_chain, args.cache_dir),
+                PKACA_LOBE_C_START, PKACA_LOBE_C_END, args.cache_dir, not args.sans_correspondance)
+            if n_manquants and not lisible:
+                print(f"🙈 {ecarts_file} illisible et {n_manquants} profils non retrouvés : tableau conservé "
+                      f"(--tout-refaire pour le reconstruire)")
+            else:
+                ecrire_ecarts(ecarts_file, [(entry_id, result['Chain'], ecarts_par_entree.get(index))
+                                            for index, ((entry_id, _, _), result) in enumerate(zip(entrees, results))],
+                              reference=[reference_pdb, reference_chain, PKACA_LOBE_C_START, PKACA_LOBE_C_END])
+                ecarts_ecrits = True
+    print(f"\n🕺🏻 Résultats sauvegardés dans {args.output}")
+    if indexer:
+        print(f"🕺🏻 Transformations dans {index_file}")
+    if ecarts_ecrits:
+        print(f"🕺🏻 Écarts par résidu dans {ecarts_file}")
+    # les processus sont terminés : leur pic de mémoire est disponible
+    pic, pic_processus = pic_memoire(), pic_memoire(enfants=True)
+    if pic is not None:
+        print(f"Pic de mémoire (RSS): {pic:.0f} Mo (principal), {pic_processus:.0f} Mo (plus gros processus)")
+    if args.mesures:
+        mesures.afficher_resume()
+        mesures.terminer()
+        print(f"🕺🏻 Mesures par étape dans {args.mesures}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,234 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Pré-téléchargement des assemblages biologiques listés dans le rapport RCSB
+Tous les fichiers <PDB_ID>-assembly<N>.cif sont récupérés avant la superposition,
+avec plusieurs requêtes en parallèle : la boucle de superposition ne lit ensuite
+que des fichiers locaux.
+
+- requêtes simultanées limitées (--workers), une connexion HTTP réutilisée par thread
+- nouvelles tentatives avec attente croissante (erreurs réseau, 429, 5xx)
+- contrôle d'intégrité : CRC gzip, bloc data_ et boucle _atom_site présents, dernière ligne complète,
+  écriture dans un fichier temporaire puis renommage
+- source au choix :
+    * modèle d'URL avec {nom} (RCSB par défaut, ou un serveur HTTP local pour les tests)
+    * dossier miroir local contenant les fichiers .cif ou .cif.gz
+
+Usage (hors PyMOL, depuis le dossier Projet/) :
+    python3 telechargement.py --workers 16
+    python3 telechargement.py --source /data/pdb_miroir
+    python3 telechargement.py --source "http://127.0.0.1:8000/{nom}.gz"
+"""
+
+import argparse
+import gzip
+import http.client
+import os
+import sys
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from urllib.parse import urlsplit
+
+from superposition import lire_entrees
+
+# fichiers compressés du serveur de téléchargement RCSB (même source que fetch_mmcif)
+SOURCE_RCSB = "https://files.rcsb.org/download/{nom}.gz"
+# requêtes simultanées (le RCSB limite le nombre de connexions par client)
+N_REQUETES = 8
+N_ESSAIS = 4
+ATTENTE = 1.0
+TIMEOUT = 60
+
+# connexions HTTP ouvertes par le thread courant, par (schéma, hôte)
+_connexions = threading.local()
+
+
+def nom_assemblage(pdb_id, assembly_id):
+    """Nom du fichier local lu par superposition.charger_structure"""
+    return f"{pdb_id}-assembly{assembly_id}.cif"
+
+
+def verifier(contenu):
+    """Lève une ValueError si le contenu n'est pas un mmCIF complet avec des coordonnées"""
+    # le bloc data_ peut être précédé de lignes de commentaires
+    if not (contenu.startswith(b"data_") or b"\ndata_" in contenu[:4096]):
+        raise ValueError("pas de bloc data_ en tête du fichier")
+    if b"\n_atom_site." not in contenu:
+        raise ValueError("pas de boucle _atom_site")
+    # un fichier tronqué s'arrête au milieu d'une ligne
+    if not contenu.endswith(b"\n"):
+        raise ValueError("fichier tronqué (pas de fin de ligne finale)")
+
+
+def _decompresser(contenu):
+    """Décompresse le contenu s'il est en gzip (le CRC est vérifié par le module gzip)"""
+    if contenu[:2] == b"\x1f\x8b":
+        return gzip.decompress(contenu)
+    return contenu
+
+
+def _connexion(schema, hote):
+    """Connexion réutilisée par le thread courant pour cet hôte (keep-alive)"""
+    if not hasattr(_connexions, "ouvertes"):
+        _connexions.ouvertes = {}
+    cle = (schema, hote)
+    if cle not in _connexions.ouvertes:
+        classe = http.client.HTTPSConnection if schema == "https" else http.client.HTTPConnection
+        _connexions.ouvertes[cle] = classe(hote, timeout=TIMEOUT)
+    return _connexions.ouvertes[cle]
+
+
+def _fermer_connexion(schema, hote):
+    connexion = getattr(_connexions, "ouvertes", {}).pop((schema, hote), None)
+    if connexion is not None:
+        connexion.close()
+
+
+def lire_http(url):
+    """
+    Télécharge une URL sur la connexion du thread.
+    Renvoie le contenu ; lève FileNotFoundError (404) ou OSError (erreur à retenter).
+    """
+    morceaux = urlsplit(url)
+    chemin = morceaux.path + (f"?{morceaux.query}" if morceaux.query else "")
+    connexion = _connexion(morceaux.scheme, morceaux.netloc)
+    try:
+        connexion.request("GET", chemin, headers={"Connection": "keep-alive"})
+        reponse = connexion.getresponse()
+        contenu = reponse.read()
+    except (http.client.HTTPException, OSError) as e:
+        # connexion fermée par le serveur ou réponse tronquée : repartir d'une connexion neuve
+        _fermer_connexion(morceaux.scheme, morceaux.netloc)
+        raise OSError(f"{url} : {e!r}") from e
+    if reponse.will_close:
+        _fermer_connexion(morceaux.scheme, morceaux.netloc)
+    if reponse.status == 404:
+        raise FileNotFoundError(f"absent de la source : {url}")
+    if reponse.status != 200:
+        raise OSError(f"{url} : HTTP {reponse.status}")
+    return contenu
+
+
+def lire_miroir(dossier, nom):
+    """Contenu du fichier dans un miroir local (nom.cif ou nom.cif.gz, en majuscules ou minuscules)"""
+    for candidat in (nom, nom.lower()):
+        for extension in ("", ".gz"):
+            chemin = os.path.join(dossier, candidat + extension)
+            if os.path.exists(chemin):
+                with open(chemin, 'rb') as f:
+                    return f.read()
+    raise FileNotFoundError(os.path.join(dossier, nom))
+
+
+def lire_source(source, nom):
+    """Contenu brut de `nom` depuis la source (modèle d'URL ou dossier miroir)"""
+    if source.startswith(("http://", "https://")):
+        return lire_http(source.format(nom=nom))
+    return lire_miroir(source, nom)
+
+
+def fichier_valide(chemin):
+    """True si le fichier local existe et passe le contrôle d'intégrité"""
+    if not os.path.exists(chemin):
+        return False
+    with open(chemin, 'rb') as f:
+        contenu = f.read()
+    try:
+        verifier(contenu)
+    except ValueError:
+        return False
+    return True
+
+
+def telecharger(nom, source=SOURCE_RCSB, dossier=".", essais=N_ESSAIS, attente=ATTENTE):
+    """
+    Récupère `nom` dans `dossier` s'il n'y est pas déjà (ou s'il est incomplet).
+    Renvoie True si le fichier a été téléchargé, False s'il était déjà présent.
+    Lève FileNotFoundError si la source ne le contient pas, OSError/ValueError après `essais` échecs.
+    """
+    destination = os.path.join(dossier, nom)
+    if fichier_valide(destination):
+        return False
+
+    for essai in range(essais):
+        try:
+            contenu = _decompresser(lire_source(source, nom))
+            verifier(contenu)
+            break
+        except FileNotFoundError:
+            raise
+        except (OSError, EOFError, ValueError):
+            # réseau, gzip tronqué ou contenu incomplet : nouvel essai après une attente croissante
+            if essai == essais - 1:
+                raise
+            time.sleep(attente * 2 ** essai)
+
+    # écriture atomique : un arrêt brutal ne laisse pas de fichier à moitié écrit
+    fd, temporaire = tempfile.mkstemp(dir=dossier, suffix=".tmp")
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            f.write(contenu)
+        os.chmod(temporaire, 0o644)
+        os.replace(temporaire, destination)
+    except BaseException:
+        os.unlink(temporaire)
+        raise
+    return True
+
+
+def prefetch(noms, source=SOURCE_RCSB, dossier=".", n_workers=N_REQUETES, verbose=True):
+    """
+    Télécharge tous les fichiers `noms` avec au plus `n_workers` requêtes simultanées.
+    Renvoie le dictionnaire nom -> message d'erreur des fichiers non récupérés.
+    """
+    noms = list(dict.fromkeys(noms))
+    echecs = {}
+    n_telecharges = 0
+    if not noms:
+        return echecs
+    with ThreadPoolExecutor(max_workers=max(1, n_workers)) as pool:
+        taches = {pool.submit(telecharger, nom, source, dossier): nom for nom in noms}
+        for done, tache in enumerate(as_completed(taches), 1):
+            nom = taches[tache]
+            try:
+                if tache.result():
+                    n_telecharges += 1
+                    if verbose:
+                        print(f"[{done}/{len(noms)}] {nom} téléchargé")
+            except Exception as e:
+                echecs[nom] = str(e) or type(e).__name__
+                if verbose:
+                    print(f"[{done}/{len(noms)}] 🙈 {nom} : {echecs[nom]}")
+    if verbose:
+        print(f"🕺🏻 {n_telecharges} fichiers téléchargés, {len(noms) - n_telecharges - len(echecs)} déjà présents, "
+              f"{len(echecs)} échecs")
+    return echecs
+
+
+def prefetch_csv(csv_file, reference_pdb=None, source=SOURCE_RCSB, dossier=".",
+                 n_workers=N_REQUETES, verbose=True):
+    """Télécharge les assemblages de toutes les entrées du CSV (et de la référence)"""
+    noms = [nom_assemblage(entry_id, assembly_id) for entry_id, assembly_id, _ in lire_entrees(csv_file)]
+    if reference_pdb is not None:
+        noms.insert(0, nom_assemblage(reference_pdb, 1))
+    return prefetch(noms, source, dossier, n_workers, verbose)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Pré-téléchargement des assemblages biologiques du CSV")
+    parser.add_argument("--csv", default="rcsb_pdb_custom_report.csv", help="rapport RCSB contenant les structures")
+    parser.add_argument("--reference", default="4WB8", help="structure de référence à télécharger aussi")
+    parser.add_argument("--source", default=SOURCE_RCSB,
+                        help="modèle d'URL avec {nom} ou dossier miroir local")
+    parser.add_argument("--dossier", default=".", help="dossier de destination")
+    parser.add_argument("--workers", type=int, default=N_REQUETES, help="requêtes simultanées")
+    args = parser.parse_args()
+
+    echecs = prefetch_csv(args.csv, args.reference, args.source, args.dossier, args.workers)
+    sys.exit(1 if echecs else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,247 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Tenseur des coordonnées superposées de tout l'ensemble (Super/*_aligned.cif), ouvert en np.memmap
+Construit une seule fois, il remplace la lecture des 64 fichiers (ou leur chargement dans PyMOL) :
+    - coordonnées float32 (N, R, 3) des C-alpha, ou (N, R, 4, 3) avec le squelette (N, CA, C, O)
+    - masque de validité bool (N, R) ou (N, R, 4) ; les atomes absents valent NaN
+    - index JSON : ligne -> (PDB ID, chaîne, fichier), colonne -> numéro et nom de résidu
+Les colonnes suivent un registre commun à l'ensemble :
+    - numérotation ALK (UniProt Q9UM73), par défaut
+    - ou résidus de la chaîne de référence (--reference) : chaque structure y est placée
+      par la correspondance de séquence (correspondance_residus.py, mise en cache)
+Les lignes sont écrites une par une dans le fichier (mémoire indépendante du nombre de structures).
+Ouverture : ouvrir_ensemble(chemin) ; tranches sans copie par plage de résidus (colonnes_residus)
+ou par structure (ligne).
+
+Usage (hors PyMOL, depuis le dossier Projet/) :
+    python3 tenseur_ensemble.py construire ../Super -o ensemble_ca.npy
+    python3 tenseur_ensemble.py construire ../Super -o ensemble_squelette.npy --squelette --residus 1100 1400
+    python3 tenseur_ensemble.py construire ../Super -o ensemble_pkaca.npy --reference 4WB8-assembly1.cif A --lobe 127 350
+    python3 tenseur_ensemble.py infos ensemble_ca.npy
+"""
+
+import argparse
+import glob
+import json
+import os
+import time
+
+import numpy as np
+
+from lecture_cif import lire_atom_site, numeros_residus, residus_ca, valeurs
+from matrice_rmsd import chaines_resultats
+
+ATOMES_CA = ('CA',)
+ATOMES_SQUELETTE = ('N', 'CA', 'C', 'O')
+
+
+def chemins_tenseur(chemin):
+    """ensemble_ca.npy -> (coordonnées, masque, index) : ensemble_ca.npy, ensemble_ca_masque.npy, ensemble_ca.json"""
+    base = os.path.splitext(chemin)[0]
+    return base + ".npy", base + "_masque.npy", base + ".json"
+
+
+def lire_structure(chemin, chaine, atomes=ATOMES_CA, cache_dir=None):
+    """
+    Atomes `atomes` d'une chaîne, un par résidu et par nom (premier modèle, première conformation).
+    Renvoie (numéros de résidus (M,), noms des résidus (M,), coordonnées (M, A, 3), présents (M, A)).
+    """
+    if cache_dir:
+        from cache_coordonnees import charger_coordonnees
+        structure = charger_coordonnees(chemin, cache_dir, ca_seulement=atomes == ATOMES_CA)
+    else:
+        structure = lire_atom_site(chemin, ca_seulement=atomes == ATOMES_CA, chaines=[chaine])
+    if atomes == ATOMES_CA:
+        numeros, noms, coords = residus_ca(structure, chaine)
+        return numeros, noms, np.asarray(coords)[:, None, :], np.ones((len(numeros), 1), dtype=bool)
+
+    nom_chaine = 'auth_asym_id' if 'auth_asym_id' in structure else 'label_asym_id'
+    garder = (valeurs(structure, nom_chaine) == chaine) & np.isin(valeurs(structure, 'label_atom_id'), atomes)
+    if 'pdbx_PDB_model_num' in structure and len(structure['pdbx_PDB_model_num']):
+        garder &= structure['pdbx_PDB_model_num'] == structure['pdbx_PDB_model_num'][0]
+    lignes = np.flatnonzero(garder)
+    numeros_atomes = numeros_residus(structure)[lignes]
+    types = np.searchsorted(atomes, valeurs(structure, 'label_atom_id')[lignes], sorter=np.argsort(atomes))
+    types = np.argsort(atomes)[types]
+    numeros, rangs = np.unique(numeros_atomes, return_inverse=True)
+    # première occurrence de chaque (résidu, atome) : conformation A
+    _, premiers = np.unique(rangs * len(atomes) + types, return_index=True)
+    coords = np.full((len(numeros), len(atomes), 3), np.nan, dtype=np.float32)
+    presents = np.zeros((len(numeros), len(atomes)), dtype=bool)
+    coords[rangs[premiers], types[premiers]] = structure['coords'][lignes[premiers]]
+    presents[rangs[premiers], types[premiers]] = True
+    noms = np.empty(len(numeros), dtype=object)
+    noms[rangs[premiers]] = valeurs(structure, 'label_comp_id')[lignes[premiers]]
+    return numeros, noms.astype(str), coords, presents
+
+
+def construire(entrees, destination, atomes=ATOMES_CA, residus=None, reference=None, description=None,
+               cache_dir=None, verbose=True):
+    """
+    Écrit le tenseur de l'ensemble. entrees : liste de (PDB ID, chaîne, chemin du fichier superposé).
+    residus : (début, fin) des colonnes en numérotation ALK (défaut : les numéros présents
+    dans au moins une structure, triés).
+    reference : (C-alpha de la chaîne de référence (voir lecture_cif.residus_ca), début, fin du lobe),
+    les colonnes sont alors les résidus de la référence dans [début, fin] ;
+    description : description de la référence gardée dans l'index (ex: ['4WB8-assembly1.cif', 'A', 127, 350]).
+    Renvoie l'index.
+    """
+    chemin_coords, chemin_masque, chemin_index = chemins_tenseur(destination)
+    if reference is not None:
+        from correspondance_residus import paires_lobe_c
+
+        ca_ref, debut, fin = reference
+        registre = ca_ref[0][(ca_ref[0] >= debut) & (ca_ref[0] <= fin)]
+    elif residus is not None:
+        registre = np.arange(residus[0], residus[1] + 1)
+    else:
+        # premier passage sur les seuls C-alpha : numéros présents dans au moins une structure
+        registre = np.zeros(0, dtype=np.int64)
+        for _, chaine, chemin in entrees:
+            try:
+                registre = np.union1d(registre, lire_structure(chemin, chaine, cache_dir=cache_dir)[0])
+            except (ValueError, OSError):
+                continue
+
+    forme = (len(entrees), len(registre)) + ((len(atomes),) if len(atomes) > 1 else ())
+    temporaires = [f"{chemin}.{os.getpid()}.tmp.npy" for chemin in (chemin_coords, chemin_masque)]
+    coords = np.lib.format.open_memmap(temporaires[0], mode='w+', dtype=np.float32, shape=forme + (3,))
+    masque = np.lib.format.open_memmap(temporaires[1], mode='w+', dtype=bool, shape=forme)
+
+    index_entrees = []
+    # nom de résidu de chaque colonne : premier rencontré
+    noms_colonnes = np.full(len(registre), None, dtype=object)
+    for ligne, (pdb_id, chaine, chemin) in enumerate(entrees):
+        rangee = np.full(coords.shape[1:], np.nan, dtype=np.float32).reshape(len(registre), -1, 3)
+        valide = np.zeros(rangee.shape[:2], dtype=bool)
+        try:
+            numeros, noms, xyz, presents = lire_structure(chemin, chaine, atomes, cache_dir)
+            if reference is not None:
+                # résidus de la cible appariés aux résidus de la référence
+                apparies, residus_ref = paires_lobe_c((numeros, noms, xyz[:, atomes.index('CA')]), ca_ref, debut, fin)
+                sources = np.searchsorted(numeros, apparies)
+                cibles = np.searchsorted(registre, residus_ref)
+            else:
+                dans = np.isin(numeros, registre)
+                sources = np.flatnonzero(dans)
+                cibles = np.searchsorted(registre, numeros[dans])
+            rangee[cibles] = xyz[sources]
+            valide[cibles] = presents[sources]
+            libres = noms_colonnes[cibles] == None  # noqa: E711 (tableau d'objets)
+            noms_colonnes[cibles[libres]] = noms[sources[libres]]
+        except (ValueError, OSError) as e:
+            if verbose:
+                print(f"🙈 {pdb_id} : {e}")
+        coords[ligne] = rangee.reshape(coords.shape[1:])
+        masque[ligne] = valide.reshape(masque.shape[1:])
+        index_entrees.append([pdb_id, chaine, os.path.basename(chemin)])
+    coords.flush()
+    masque.flush()
+    del coords, masque
+
+    index = {
+        'coordonnees': os.path.basename(chemin_coords),
+        'masque': os.path.basename(chemin_masque),
+        'forme': list(forme) + [3],
+        'atomes': list(atomes),
+        'registre': 'reference' if reference is not None else 'ALK',
+        'reference': description,
+        'residus': registre.tolist(),
+        'noms': [nom or 'UNK' for nom in noms_colonnes],
+        'entrees': index_entrees,
+    }
+    os.replace(temporaires[0], chemin_coords)
+    os.replace(temporaires[1], chemin_masque)
+    with open(chemin_index, 'w') as f:
+        json.dump(index, f)
+    return index
+
+
+def ouvrir_ensemble(chemin):
+    """Coordonnées et masque ouverts en np.memmap (lecture seule, sans copie) et index"""
+    chemin_coords, chemin_masque, chemin_index = chemins_tenseur(chemin)
+    with open(chemin_index) as f:
+        index = json.load(f)
+    return np.load(chemin_coords, mmap_mode='r'), np.load(chemin_masque, mmap_mode='r'), index
+
+
+def colonnes_residus(index, debut, fin):
+    """Tranche (sans copie) des colonnes des résidus debut-fin inclus"""
+    residus = index['residus']
+    return slice(int(np.searchsorted(residus, debut)), int(np.searchsorted(residus, fin, side='right')))
+
+
+def ligne(index, pdb_id):
+    """Ligne d'une structure (ValueError si absente)"""
+    for i, (entree, _, _) in enumerate(index['entrees']):
+        if entree == pdb_id:
+            return i
+    raise ValueError(f"{pdb_id} absent de l'ensemble")
+
+
+def entrees_dossier(dossier="../Super", motif="*_aligned.cif", resultats="superposition_results.csv"):
+    """(PDB ID, chaîne, chemin) des fichiers du dossier ; chaîne de superposition_results.csv, sinon la première"""
+    chaines = chaines_resultats(resultats)
+    entrees = []
+    for chemin in sorted(glob.glob(os.path.join(dossier, motif))):
+        pdb_id = os.path.basename(chemin).split('_')[0]
+        chaine = chaines.get(pdb_id)
+        if chaine is None:
+            structure = lire_atom_site(chemin, ca_seulement=True)
+            if len(structure['coords']) == 0:
+                continue
+            nom_chaine = 'auth_asym_id' if 'auth_asym_id' in structure else 'label_asym_id'
+            chaine = str(valeurs(structure, nom_chaine)[0])
+        entrees.append((pdb_id, chaine, chemin))
+    return entrees
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Tenseur des coordonnées superposées de l'ensemble")
+    commandes = parser.add_subparsers(dest="commande", required=True)
+    creer = commandes.add_parser("construire", help="construire le tenseur depuis les fichiers superposés")
+    creer.add_argument("dossier", nargs="?", default="../Super", help="dossier des structures *_aligned.cif")
+    creer.add_argument("-o", "--sortie", default="ensemble_ca.npy", help="tenseur à créer (.npy)")
+    creer.add_argument("--resultats", default="superposition_results.csv",
+                       help="résultats de la superposition (chaîne de chaque structure)")
+    creer.add_argument("--squelette", action="store_true", help="atomes N, CA, C, O au lieu des seuls C-alpha")
+    creer.add_argument("--residus", type=int, nargs=2, default=None, metavar=("DEBUT", "FIN"),
+                       help="résidus ALK gardés (défaut : tous ceux de l'ensemble)")
+    creer.add_argument("--reference", nargs=2, default=None, metavar=("FICHIER", "CHAÎNE"),
+                       help="colonnes dans le registre de la référence (ex: 4WB8-assembly1.cif A)")
+    creer.add_argument("--lobe", type=int, nargs=2, default=(127, 350), metavar=("DEBUT", "FIN"),
+                       help="résidus de la référence gardés (avec --reference)")
+    creer.add_argument("--cache-dir", default=None, help="cache binaire des coordonnées (cache_coordonnees.py)")
+    infos = commandes.add_parser("infos", help="dimensions du tenseur et temps d'ouverture")
+    infos.add_argument("tenseur")
+    args = parser.parse_args()
+
+    if args.commande == "construire":
+        reference = None
+        if args.reference:
+            ca_ref = residus_ca(lire_atom_site(args.reference[0], ca_seulement=True), args.reference[1])
+            reference = (ca_ref, *args.lobe)
+        debut = time.perf_counter()
+        entrees = entrees_dossier(args.dossier, resultats=args.resultats)
+        index = construire(entrees, args.sortie, ATOMES_SQUELETTE if args.squelette else ATOMES_CA,
+                           args.residus, reference, [*args.reference, *args.lobe] if args.reference else None,
+                           args.cache_dir)
+        _, chemin_masque, chemin_index = chemins_tenseur(args.sortie)
+        print(f"🕺🏻 {index['forme']} ({index['registre']}) en {time.perf_counter() - debut:.2f} s")
+        print(f"✨ {args.sortie}, {chemin_masque}, {chemin_index}")
+
+    else:
+        debut = time.perf_counter()
+        coords, masque, index = ouvrir_ensemble(args.tenseur)
+        duree = time.perf_counter() - debut
+        residus = index['residus']
+        print(f"🕺🏻 {coords.shape[0]} structures × {coords.shape[1]} résidus "
+              f"({residus[0] if residus else '-'}-{residus[-1] if residus else '-'}, registre {index['registre']}), "
+              f"atomes {', '.join(index['atomes'])}, ouvert en {duree * 1e3:.1f} ms")
+        print(f"  {masque.reshape(masque.shape[0], -1).any(axis=1).sum()} structures avec des atomes, "
+              f"{masque.mean() * 100:.1f} % des positions renseignées")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,14 +1,25 @@
 """
 Fonctions pour la procédure : 
 - highlight lobe C pour montrer l'alignement des lobes C
+- coloration / isolement des structures mal superposées : les objets chargés sont
+  indexés une fois par PDB ID et chaque groupe est traité en un seul appel à cmd
 """
 #librairies 
 from pymol import cmd
-import csv
 import os
+import sys
+
+# pour importer superposition.py depuis PyMOL (run visualisation.py depuis Projet/)
+sys.path.insert(0, os.getcwd())
+from superposition import index_objets, mauvais_alignements, selection_objets
 
 # Configuration
 results_csv = "superposition_results.csv"
+# couleur de chaque groupe de mauvais alignements (voir superposition.mauvais_alignements)
+COULEURS_MAUVAIS = [
+    ('erreur', "gray", "GRIS (Erreur/Non alignée)"),
+    ('rmsd_eleve', "brown", "MARRON (RMSD > 4 Å)"),
+]
 
 #fonctions
 def highlight_lobes(selection="all"):
@@ -40,30 +51,14 @@ def color_bad_rmsd(csv_path):
         print(f"Erreur : Le fichier {csv_path} est introuvable.")
         return
     
-    with open(csv_path, mode='r') as f:
-        reader = csv.DictReader(f)
-        for row in reader:
-            pdb_id = row['PDB_ID']
-            assembly_id = "1" 
-            # reconstruction du nom de l'objet comme il apparaît dans PyMOL
-            obj_name = f"{pdb_id}_assembly{assembly_id}"
-
-            status = row['Status']
-            try:
-                rmsd_val = float(row['RMSD']) if row['RMSD'] != 'N/A' else None
-            except ValueError:
-                rmsd_val = None
-
-            # coloration des mauvais alignements (rmsd>4 ou erreur)
-            if status == "ERROR" or rmsd_val is None:
-                # les structures non alignées ou en erreur -> GRIS
-                cmd.color("gray", obj_name)
-                print(f"Structure {obj_name} colorée en GRIS (Erreur/Non alignée)")
-            
-            elif rmsd_val > 4.0:
-                # RMSD > 4 -> MARRON
-                cmd.color("brown", obj_name)
-                print(f"Structure {obj_name} colorée en NOIR (RMSD: {rmsd_val})")
+    mauvais = mauvais_alignements(csv_path)
+    # objets chargés indexés une seule fois, puis une commande color par groupe
+    index = index_objets(cmd)
+    for groupe, couleur, libelle in COULEURS_MAUVAIS:
+        objets, selection = selection_objets(index, mauvais[groupe])
+        if objets:
+            cmd.color(couleur, selection)
+            print(f"{len(objets)} structures colorées en {libelle}")
 
     print("✨ Coloration terminée ✨")
 
@@ -71,7 +66,6 @@ def color_bad_rmsd(csv_path):
 color_bad_rmsd(results_csv)
 
 from pymol import cmd
-import csv
 import os
 
 def isoler_mauvais_alignements(csv_path="superposition_results.csv"):
@@ -86,31 +80,16 @@ def isoler_mauvais_alignements(csv_path="superposition_results.csv"):
     # 1. Cacher tous les objets chargés pour repartir de zéro
     cmd.hide("everything", "all")
     
-    mauvais_structures = []
-    
-    with open(csv_path, mode='r') as f:
-        reader = csv.DictReader(f)
-        for row in reader:
-            pdb_id = row['PDB_ID']
-            status = row['Status']
-            try:
-                rmsd_val = float(row['RMSD']) if row['RMSD'] != 'N/A' else None
-            except ValueError:
-                rmsd_val = None
-
-            # 2. Identifier les objets correspondants dans PyMOL
-            # On cherche les objets qui commencent par le PDB_ID (ex: 4WB8_assembly1)
-            obj_names = [n for n in cmd.get_names() if n.startswith(pdb_id)]
-            
-            for obj in obj_names:
-                # Condition : RMSD élevé (> 4) ou Erreur d'alignement
-                if status == "ERROR" or (rmsd_val is not None and rmsd_val > 4.0):
-                    cmd.show("cartoon", obj)
-                    mauvais_structures.append(obj)
+    # 2. Identifier les objets correspondants dans PyMOL (ex: 4WB8_assembly1),
+    # RMSD élevé (> 4) ou erreur d'alignement, avec un seul parcours des objets chargés
+    mauvais = mauvais_alignements(csv_path)
+    mauvais_structures, selection = selection_objets(index_objets(cmd),
+                                                     mauvais['erreur'] + mauvais['rmsd_eleve'])
     
     if mauvais_structures:
+        cmd.show("cartoon", selection)
         # Zoomer sur les structures problématiques
-        cmd.zoom(" + ".join(mauvais_structures))
+        cmd.zoom(selection)
         print(f"Affichage de {len(mauvais_structures)} structures (RMSD > 4 ou ERROR).")
     else:
         print("Aucune structure avec RMSD > 4 ou ERROR n'a été trouvée.")
@@ -4,637 +4,749 @@
 Script pour générer un rapport automatique des résultats de superposition
 Conforme aux exigences du projet : stratégie, tableau, analyse des cas problématiques
 À exécuter HORS de PyMOL (Python normal)
+
+Les résultats sont lus en un seul passage : comptes par statut, moyennes, histogramme
+des RMSD et meilleures/pires superpositions (tas de taille 5) sont cumulés ligne par ligne.
+Le tableau et les cas problématiques sont mis de côté dans des fichiers temporaires,
+puis le rapport est écrit au fur et à mesure : mémoire constante quel que soit le nombre de lignes.
 """
 
 import csv
+import heapq
 import os
+import shutil
+import tempfile
+from bisect import bisect_right
 from datetime import datetime
 
-def generate_report():
-    """Génère un rapport Markdown à partir des résultats de superposition"""
-    
-    results_file = "superposition_results.csv"
-    output_file = "rapport_resultats.md"
-    
-    if not os.path.exists(results_file):
-        print(f"❌ Fichier {results_file} non trouvé!")
-        print("   Lancez d'abord le script open-csv.py dans PyMOL")
+STATUTS = ['EXCELLENT', 'GOOD', 'MODERATE', 'HIGH_RMSD', 'ERROR']
+
+# intervalles de l'histogramme des RMSD (bornes : min <= RMSD < max)
+RMSD_RANGES = [
+    (0, 1.5, "0-1.5 Å (Excellent)"),
+    (1.5, 2.0, "1.5-2.0 Å (Très bon)"),
+    (2.0, 2.5, "2.0-2.5 Å (Bon)"),
+    (2.5, 4.0, "2.5-4.0 Å (Modéré)"),
+    (4.0, float('inf'), "> 4.0 Å (Problématique)")
+]
+_BORNES = [min_val for min_val, _, _ in RMSD_RANGES]
+
+# scores indépendants de la taille (Projet/qualite.py), absents des anciens fichiers de résultats
+METRIQUES = ['TM_score', 'GDT_TS', 'LDDT']
+
+STATUS_MAP = {
+    'EXCELLENT': 'Excellent',
+    'GOOD': 'Bon',
+    'MODERATE': 'Modéré',
+    'HIGH_RMSD': 'RMSD élevé',
+    'ERROR': 'Erreur'
+}
+
+# nombre de meilleures/pires superpositions et d'exemples pour la figure
+TOP_K = 5
+N_EXEMPLES = 10
+
+
+def statistiques_vides(k=TOP_K):
+    """Accumulateurs du passage unique sur les résultats"""
+    return {
+        'total': 0,
+        'statuts': dict.fromkeys(STATUTS, 0),
+        'n_valides': 0,
+        'somme_rmsd': 0.0,
+        'somme_alignes': 0,
+        'qualite': {metrique: [0, 0.0] for metrique in METRIQUES},
+        'histogramme': [0] * len(RMSD_RANGES),
+        'n_problemes': 0,
+        # tas de taille k : (-RMSD, -rang, ligne) pour les meilleures, (RMSD, -rang, ligne) pour les pires
+        'meilleurs': [],
+        'pires': [],
+        'k': k,
+        'exemples': [],
+    }
+
+
+def _garder(tas, cle, k):
+    """Garde dans le tas les k plus grandes clés vues (ordre des lignes en cas d'égalité)"""
+    if len(tas) < k:
+        heapq.heappush(tas, cle)
+    elif cle[:2] > tas[0][:2]:
+        heapq.heapreplace(tas, cle)
+
+
+def accumuler(stats, rang, r):
+    """Ajoute la ligne r (rang-ième du fichier) aux statistiques"""
+    stats['total'] += 1
+    if r['Status'] in stats['statuts']:
+        stats['statuts'][r['Status']] += 1
+    if r['Status'] in ('ERROR', 'HIGH_RMSD'):
+        stats['n_problemes'] += 1
+    if r['Status'] == 'EXCELLENT' and len(stats['exemples']) < N_EXEMPLES:
+        stats['exemples'].append(r['PDB_ID'])
+
+    if r['Status'] == 'ERROR' or r['RMSD'] == 'N/A':
         return
-    
-    # Lire les résultats
-    results = []
+    rmsd = float(r['RMSD'])
+    stats['n_valides'] += 1
+    stats['somme_rmsd'] += rmsd
+    stats['somme_alignes'] += int(r['N_CA_aligned'])
+    for metrique in METRIQUES:
+        if r.get(metrique) not in (None, '', 'N/A'):
+            stats['qualite'][metrique][0] += 1
+            stats['qualite'][metrique][1] += float(r[metrique])
+    intervalle = bisect_right(_BORNES, rmsd) - 1
+    if intervalle >= 0:
+        stats['histogramme'][intervalle] += 1
+
+    ligne = (r['PDB_ID'], r['Chain'], r['RMSD'], r['N_CA_aligned'], r['Status'])
+    _garder(stats['meilleurs'], (-rmsd, -rang, ligne), stats['k'])
+    _garder(stats['pires'], (rmsd, -rang, ligne), stats['k'])
+
+
+def classement(tas):
+    """Lignes du tas de la meilleure à la moins bonne"""
+    return [ligne for *_, ligne in sorted(tas, reverse=True)]
+
+
+def section_probleme(r):
+    """Lignes de la section d'une structure en erreur ou avec un RMSD élevé"""
+    lignes = []
+    ecrire = lignes.append
+    ecrire(f"### Structure {r['PDB_ID']} (Chaîne {r['Chain']})")
+    ecrire("")
+    
+    if r['Status'] == 'ERROR':
+        ecrire("**Type de problème :** ❌ Échec complet du chargement ou de la superposition")
+        ecrire("")
+        ecrire("**Raisons possibles :**")
+        ecrire("")
+        ecrire("1. **Structure non disponible** dans la Protein Data Bank")
+        ecrire("   - Le fichier mmCIF n'existe pas ou est inaccessible")
+        ecrire("   - Solution : Vérifier manuellement sur https://www.rcsb.org/structure/" + r['PDB_ID'])
+        ecrire("")
+        ecrire("2. **Assemblage biologique non défini**")
+        ecrire("   - L'assemblage spécifié dans le CSV n'existe pas pour cette structure")
+        ecrire("   - Solution : Utiliser l'assemblage 1 par défaut ou la structure asymétrique")
+        ecrire("")
+        ecrire("3. **Chaîne manquante ou incorrecte**")
+        ecrire(f"   - La chaîne {r['Chain']} n'existe pas dans cette structure")
+        ecrire("   - Possible erreur dans le fichier CSV source")
+        ecrire("")
+        ecrire("4. **Absence complète du domaine kinase**")
+        ecrire("   - Structure ne contient pas le lobe C catalytique")
+        ecrire("   - Fragment protéique incomplet ou domaine différent")
+        ecrire("")
+        ecrire("**Impact :** Structure non incluse dans l'analyse finale")
+        ecrire("")
+        
+    elif r['Status'] == 'HIGH_RMSD':
+        ecrire(f"**Type de problème :** ⚠️ RMSD très élevé ({r['RMSD']} Å > 4.0 Å)")
+        ecrire("")
+        ecrire(f"**Données de la superposition :**")
+        ecrire(f"- RMSD : {r['RMSD']} Å")
+        ecrire(f"- C-alpha superposés : {r['N_CA_aligned']}")
+        ecrire("")
+        
+        n_aligned = int(r['N_CA_aligned'])
+        rmsd_val = float(r['RMSD'])
+        
+        ecrire("**Analyse détaillée :**")
+        ecrire("")
+        
+        if n_aligned < 20:
+            ecrire(f"1. **Très peu d'atomes alignés** ({n_aligned} vs ~228 attendus)")
+            ecrire("   - Structure très incomplète ou très différente")
+            ecrire("   - Domaine kinase partiellement absent")
+            ecrire("   - Région du lobe C non homologue")
+            ecrire("")
+        
+        if rmsd_val > 10.0:
+            ecrire(f"2. **RMSD extrêmement élevé** ({rmsd_val:.2f} Å)")
+            ecrire("   - Structures probablement dans des **conformations très différentes**")
+            ecrire("   - État **actif vs inactif** de la kinase")
+            ecrire("   - Présence de **domaines supplémentaires** non présents dans PKACA")
+            ecrire("   - Possible **erreur dans l'identification** de la région du lobe C")
+            ecrire("")
+        elif rmsd_val > 4.0:
+            ecrire(f"2. **RMSD élevé** ({rmsd_val:.2f} Å)")
+            ecrire("   - Conformation différente (possiblement inactive)")
+            ecrire("   - Variations structurales importantes dans le lobe C")
+            ecrire("   - Insertions ou délétions dans la séquence")
+            ecrire("")
+        
+        ecrire("**Recommandation :**")
+        ecrire("- Vérification visuelle dans PyMOL **impérative**")
+        ecrire("- Comparer avec la structure de référence 4WB8")
+        ecrire("- Identifier les régions de forte divergence")
+        ecrire("- Évaluer si la structure est exploitable pour l'analyse")
+        ecrire("")
+        ecrire("**Code PyMOL pour vérification :**")
+        ecrire("```python")
+        ecrire(f"load Super/4WB8-assembly1.cif, reference")
+        ecrire(f"load Super/{r['PDB_ID']}_aligned.cif, problematic")
+        ecrire(f"hide everything")
+        ecrire(f"show ribbon, all")
+        ecrire(f"color green, reference")
+        ecrire(f"color red, problematic")
+        ecrire(f"zoom reference and chain A and resi 127-350")
+        ecrire(f"# Observer les différences structurales")
+        ecrire("```")
+        ecrire("")
+    return lignes
+
+
+def ecrivain(f):
+    """Fonction ecrire(ligne) qui ajoute une ligne au fichier f"""
+    def ecrire(ligne=""):
+        f.write(ligne + "\n")
+    return ecrire
+
+
+def parcourir(results_file, tableau, problemes, k=TOP_K):
+    """
+    Passage unique sur le CSV des résultats : cumule les statistiques et écrit
+    au fil de la lecture les lignes du tableau 2.2 et les sections des cas problématiques.
+    """
+    stats = statistiques_vides(k)
     with open(results_file, 'r') as f:
-        reader = csv.DictReader(f)
-        for row in reader:
-            results.append(row)
-    
-    # Statistiques basées sur le champ 'Status'
-    total = len(results)
-    n_excellent = sum(1 for r in results if r['Status'] == 'EXCELLENT')
-    n_good = sum(1 for r in results if r['Status'] == 'GOOD')
-    n_moderate = sum(1 for r in results if r['Status'] == 'MODERATE')
-    n_high_rmsd = sum(1 for r in results if r['Status'] == 'HIGH_RMSD')
-    n_errors = sum(1 for r in results if r['Status'] == 'ERROR')
-    
+        for rang, r in enumerate(csv.DictReader(f)):
+            accumuler(stats, rang, r)
+            if r['Status'] != 'ERROR':
+                tableau.write(f"| {r['PDB_ID']} | {r['Chain']} | {r['N_CA_aligned']} | {r['RMSD']} |\n")
+            else:
+                tableau.write(f"| {r['PDB_ID']} | {r['Chain']} | - | - |\n")
+            if r['Status'] in ('ERROR', 'HIGH_RMSD'):
+                problemes.write("\n".join(section_probleme(r)) + "\n")
+    return stats
+
+
+def recopier(source, f):
+    """Recopie un fichier temporaire dans le rapport"""
+    source.seek(0)
+    shutil.copyfileobj(source, f)
+
+
+def ecrire_rapport(f, stats, tableau, problemes):
+    """Écrit le rapport Markdown section par section"""
+    ecrire = ecrivain(f)
+
+    total = stats['total']
+    n_excellent = stats['statuts']['EXCELLENT']
+    n_good = stats['statuts']['GOOD']
+    n_moderate = stats['statuts']['MODERATE']
+    n_high_rmsd = stats['statuts']['HIGH_RMSD']
+    n_errors = stats['statuts']['ERROR']
     success = total - n_errors
-    
-    # Calculs moyens (uniquement pour les structures sans erreur)
-    valid_results = [r for r in results if r['Status'] != 'ERROR' and r['RMSD'] != 'N/A']
-    avg_rmsd = sum(float(r['RMSD']) for r in valid_results) / max(len(valid_results), 1)
-    avg_aligned = sum(int(r['N_CA_aligned']) for r in valid_results) / max(len(valid_results), 1)
-    
-    # Générer le rapport
-    report = []
-    report.append("# Rapport de Superposition des Structures ALK sur PKACA")
-    report.append("")
-    report.append(f"**Date:** {datetime.now().strftime('%d/%m/%Y %H:%M')}")
-    report.append(f"**Auteur:** Najat")
-    report.append("")
-    report.append("---")
-    report.append("")
+    n_valides = stats['n_valides']
+    avg_rmsd = stats['somme_rmsd'] / max(n_valides, 1)
+    avg_aligned = stats['somme_alignes'] / max(n_valides, 1)
+
+    ecrire("# Rapport de Superposition des Structures ALK sur PKACA")
+    ecrire("")
+    ecrire(f"**Date:** {datetime.now().strftime('%d/%m/%Y %H:%M')}")
+    ecrire(f"**Auteur:** Najat")
+    ecrire("")
+    ecrire("---")
+    ecrire("")
     
     # ========================================================================
     # 1. STRATÉGIE ET ORGANISATION DU CODE
     # ========================================================================
-    report.append("## 1. Stratégie Utilisée et Organisation du Code")
-    report.append("")
-    
-    report.append("### 1.1 Approche Globale")
-    report.append("")
-    report.append("La stratégie adoptée pour superposer les structures ALK sur PKACA comprend les étapes suivantes :")
-    report.append("")
-    report.append("1. **Choix de la structure de référence :**")
-    report.append("   - Structure **4WB8** (PKACA humaine, *Homo sapiens*)")
-    report.append("   - UniProt : **P17612** (cAMP-dependent protein kinase catalytic subunit alpha)")
-    report.append("   - Résolution : **1.55 Å** (haute qualité cristallographique)")
-    report.append("   - Référence : Cheung et al. (2015) PNAS 112: 1374-1379")
-    report.append("   - Résidus présents : **14-350** (délétion de l'exon 1)")
-    report.append("")
-    report.append("2. **Région d'alignement :**")
-    report.append("   - Alignement sur le **lobe C uniquement** (résidus 127-350)")
-    report.append("   - Le lobe C est la région catalytique conservée des protéines kinases")
-    report.append("   - 228 C-alpha de la structure de référence utilisés pour l'alignement")
-    report.append("")
-    report.append("3. **Méthode de superposition :**")
-    report.append("   - Utilisation **uniquement des atomes C-alpha** comme repère (backbone)")
-    report.append("   - Algorithme : `cmd.align()` de PyMOL")
-    report.append("   - Paramètres : 10 cycles d'optimisation, cutoff à 2.0 Å")
-    report.append("")
-    report.append("4. **Critères de validation :**")
-    report.append("   - **RMSD < 2.0 Å** : Excellente superposition")
-    report.append("   - **RMSD 2.0-2.5 Å** : Bonne superposition")
-    report.append("   - **RMSD 2.5-4.0 Å** : Superposition modérée (à vérifier)")
-    report.append("   - **RMSD > 4.0 Å** : Problème détecté (structures non similaires ou erreur)")
-    report.append("   - **Nombre de C-alpha < 20** : Structure incomplète ou très différente")
-    report.append("")
-    
-    report.append("### 1.2 Organisation du Code")
-    report.append("")
-    report.append("Le projet est organisé en plusieurs fichiers :")
-    report.append("")
-    report.append("```")
-    report.append("Projet/")
-    report.append("├── open-csv.py                              # Script principal (PyMOL)")
-    report.append("├── generate_report.py                       # Génération du rapport (Python)")
-    report.append("├── rcsb_pdb_custom_report_20260110111300_new.csv  # Liste des structures ALK")
-    report.append("├── superposition_results.csv                # Résultats bruts")
-    report.append("└── rapport_resultats.md                     # Rapport final")
-    report.append("")
-    report.append("Super/")
-    report.append("├── 4WB8-assembly1.cif                       # Structure de référence PKACA")
-    report.append("├── 2XB7_aligned.cif                         # Structures ALK superposées")
-    report.append("├── 2XBA_aligned.cif")
-    report.append("└── ... (toutes les structures *_aligned.cif)")
-    report.append("```")
-    report.append("")
-    
-    report.append("### 1.3 Comment Exécuter le Code")
-    report.append("")
-    report.append("**Étape 1 : Superposition des structures (dans PyMOL)**")
-    report.append("")
-    report.append("```bash")
-    report.append("# Lancer PyMOL")
-    report.append("pymol")
-    report.append("")
-    report.append("# Dans PyMOL, exécuter le script")
-    report.append("run Projet/open-csv.py")
-    report.append("```")
-    report.append("")
-    report.append("Le script va :")
-    report.append("- Charger la structure de référence 4WB8")
-    report.append("- Lire le fichier CSV contenant les structures ALK")
-    report.append("- Pour chaque structure :")
-    report.append("  - Télécharger l'assemblage biologique (ou charger depuis le cache)")
-    report.append("  - Supprimer les molécules d'eau")
-    report.append("  - Superposer le lobe C sur celui de PKACA (C-alpha uniquement)")
-    report.append("  - Calculer RMSD et nombre de C-alpha alignés")
-    report.append("  - Sauvegarder la structure superposée au format mmCIF")
-    report.append("- Générer un fichier CSV avec les résultats")
-    report.append("")
-    report.append("**Étape 2 : Génération du rapport (Python standard)**")
-    report.append("")
-    report.append("```bash")
-    report.append("# Sortir de PyMOL, puis dans un terminal")
-    report.append("cd Projet/")
-    report.append("python3 generate_report.py")
-    report.append("```")
-    report.append("")
-    report.append("Cela génère le fichier `rapport_resultats.md` contenant toutes les analyses.")
-    report.append("")
-    
-    report.append("### 1.4 Vérifications Visuelles")
-    report.append("")
-    report.append("Pour vérifier visuellement les superpositions dans PyMOL :")
-    report.append("")
-    report.append("```python")
-    report.append("# Charger les structures superposées")
-    report.append("load Super/4WB8-assembly1.cif, reference")
-    report.append("load Super/2XBA_aligned.cif, alk_example")
-    report.append("")
-    report.append("# Configuration de l'affichage (selon les consignes)")
-    report.append("hide everything")
-    report.append("show ribbon, all                    # Chaînes polymères en ribbon")
-    report.append("show sticks, organic                # Ligands en sticks")
-    report.append("show nb_spheres, inorganic         # Ions en sphères")
-    report.append("hide everything, solvent           # Cacher l'eau")
-    report.append("")
-    report.append("# Couleurs pour distinction")
-    report.append("color green, reference              # PKACA en vert")
-    report.append("color cyan, alk_example            # ALK en cyan")
-    report.append("```")
-    report.append("")
-    report.append("---")
-    report.append("")
+    ecrire("## 1. Stratégie Utilisée et Organisation du Code")
+    ecrire("")
+    
+    ecrire("### 1.1 Approche Globale")
+    ecrire("")
+    ecrire("La stratégie adoptée pour superposer les structures ALK sur PKACA comprend les étapes suivantes :")
+    ecrire("")
+    ecrire("1. **Choix de la structure de référence :**")
+    ecrire("   - Structure **4WB8** (PKACA humaine, *Homo sapiens*)")
+    ecrire("   - UniProt : **P17612** (cAMP-dependent protein kinase catalytic subunit alpha)")
+    ecrire("   - Résolution : **1.55 Å** (haute qualité cristallographique)")
+    ecrire("   - Référence : Cheung et al. (2015) PNAS 112: 1374-1379")
+    ecrire("   - Résidus présents : **14-350** (délétion de l'exon 1)")
+    ecrire("")
+    ecrire("2. **Région d'alignement :**")
+    ecrire("   - Alignement sur le **lobe C uniquement** (résidus 127-350)")
+    ecrire("   - Le lobe C est la région catalytique conservée des protéines kinases")
+    ecrire("   - 228 C-alpha de la structure de référence utilisés pour l'alignement")
+    ecrire("")
+    ecrire("3. **Méthode de superposition :**")
+    ecrire("   - Utilisation **uniquement des atomes C-alpha** comme repère (backbone)")
+    ecrire("   - Algorithme : `cmd.align()` de PyMOL")
+    ecrire("   - Paramètres : 10 cycles d'optimisation, cutoff à 2.0 Å")
+    ecrire("")
+    ecrire("4. **Critères de validation :**")
+    ecrire("   - **RMSD < 2.0 Å** : Excellente superposition")
+    ecrire("   - **RMSD 2.0-2.5 Å** : Bonne superposition")
+    ecrire("   - **RMSD 2.5-4.0 Å** : Superposition modérée (à vérifier)")
+    ecrire("   - **RMSD > 4.0 Å** : Problème détecté (structures non similaires ou erreur)")
+    ecrire("   - **Nombre de C-alpha < 20** : Structure incomplète ou très différente")
+    ecrire("")
+    
+    ecrire("### 1.2 Organisation du Code")
+    ecrire("")
+    ecrire("Le projet est organisé en plusieurs fichiers :")
+    ecrire("")
+    ecrire("```")
+    ecrire("Projet/")
+    ecrire("├── open-csv.py                              # Script principal (PyMOL)")
+    ecrire("├── generate_report.py                       # Génération du rapport (Python)")
+    ecrire("├── rcsb_pdb_custom_report_20260110111300_new.csv  # Liste des structures ALK")
+    ecrire("├── superposition_results.csv                # Résultats bruts")
+    ecrire("└── rapport_resultats.md                     # Rapport final")
+    ecrire("")
+    ecrire("Super/")
+    ecrire("├── 4WB8-assembly1.cif                       # Structure de référence PKACA")
+    ecrire("├── 2XB7_aligned.cif                         # Structures ALK superposées")
+    ecrire("├── 2XBA_aligned.cif")
+    ecrire("└── ... (toutes les structures *_aligned.cif)")
+    ecrire("```")
+    ecrire("")
+    
+    ecrire("### 1.3 Comment Exécuter le Code")
+    ecrire("")
+    ecrire("**Étape 1 : Superposition des structures (dans PyMOL)**")
+    ecrire("")
+    ecrire("```bash")
+    ecrire("# Lancer PyMOL")
+    ecrire("pymol")
+    ecrire("")
+    ecrire("# Dans PyMOL, exécuter le script")
+    ecrire("run Projet/open-csv.py")
+    ecrire("```")
+    ecrire("")
+    ecrire("Le script va :")
+    ecrire("- Charger la structure de référence 4WB8")
+    ecrire("- Lire le fichier CSV contenant les structures ALK")
+    ecrire("- Pour chaque structure :")
+    ecrire("  - Télécharger l'assemblage biologique (ou charger depuis le cache)")
+    ecrire("  - Supprimer les molécules d'eau")
+    ecrire("  - Superposer le lobe C sur celui de PKACA (C-alpha uniquement)")
+    ecrire("  - Calculer RMSD et nombre de C-alpha alignés")
+    ecrire("  - Sauvegarder la structure superposée au format mmCIF")
+    ecrire("- Générer un fichier CSV avec les résultats")
+    ecrire("")
+    ecrire("**Étape 2 : Génération du rapport (Python standard)**")
+    ecrire("")
+    ecrire("```bash")
+    ecrire("# Sortir de PyMOL, puis dans un terminal")
+    ecrire("cd Projet/")
+    ecrire("python3 generate_report.py")
+    ecrire("```")
+    ecrire("")
+    ecrire("Cela génère le fichier `rapport_resultats.md` contenant toutes les analyses.")
+    ecrire("")
+    
+    ecrire("### 1.4 Vérifications Visuelles")
+    ecrire("")
+    ecrire("Pour vérifier visuellement les superpositions dans PyMOL :")
+    ecrire("")
+    ecrire("```python")
+    ecrire("# Charger les structures superposées")
+    ecrire("load Super/4WB8-assembly1.cif, reference")
+    ecrire("load Super/2XBA_aligned.cif, alk_example")
+    ecrire("")
+    ecrire("# Configuration de l'affichage (selon les consignes)")
+    ecrire("hide everything")
+    ecrire("show ribbon, all                    # Chaînes polymères en ribbon")
+    ecrire("show sticks, organic                # Ligands en sticks")
+    ecrire("show nb_spheres, inorganic         # Ions en sphères")
+    ecrire("hide everything, solvent           # Cacher l'eau")
+    ecrire("")
+    ecrire("# Couleurs pour distinction")
+    ecrire("color green, reference              # PKACA en vert")
+    ecrire("color cyan, alk_example            # ALK en cyan")
+    ecrire("```")
+    ecrire("")
+    ecrire("---")
+    ecrire("")
     
     # ========================================================================
     # 2. TABLEAU DES RÉSULTATS (FORMAT DEMANDÉ)
     # ========================================================================
-    report.append("## 2. Tableau des Résultats de Superposition")
-    report.append("")
-    report.append("### 2.1 Structure de Référence")
-    report.append("")
-    report.append("- **PDB ID :** 4WB8")
-    report.append("- **Chaîne :** A")
-    report.append("- **Protéine :** PKACA humaine (*Homo sapiens*)")
-    report.append("- **UniProt :** P17612")
-    report.append("- **Résolution :** 1.55 Å")
-    report.append("- **Région superposée :** Lobe C (résidus 127-350, 228 C-alpha)")
-    report.append("")
-    
-    report.append("### 2.2 Résultats de Superposition (Format Demandé)")
-    report.append("")
-    report.append("| PDB ID | Chaîne utilisée | Nb. C-alpha superposés | RMSD (Å) |")
-    report.append("|--------|-----------------|------------------------|----------|")
-    
-    for r in results:
-        if r['Status'] != 'ERROR':
-            report.append(f"| {r['PDB_ID']} | {r['Chain']} | {r['N_CA_aligned']} | {r['RMSD']} |")
-        else:
-            report.append(f"| {r['PDB_ID']} | {r['Chain']} | - | - |")
-    
-    report.append("")
-    
-    report.append("### 2.3 Statistiques Globales")
-    report.append("")
-    report.append(f"- **Nombre total de structures traitées :** {total}")
-    report.append(f"- **Succès :** {success} structures ({success*100/total:.1f}%)")
-    report.append(f"- **Échecs :** {n_errors} structures ({n_errors*100/total:.1f}%)")
-    report.append(f"- **RMSD moyen :** {avg_rmsd:.2f} Å")
-    report.append(f"- **Nombre moyen de C-alpha alignés :** {avg_aligned:.0f}")
-    report.append("")
-    
-    report.append("### 2.4 Répartition par Qualité")
-    report.append("")
-    report.append(f"- ✅ **Excellente** (RMSD < 2.0 Å) : {n_excellent} structures ({n_excellent*100/max(success,1):.1f}%)")
-    report.append(f"- ✅ **Bonne** (2.0 ≤ RMSD < 2.5 Å) : {n_good} structures ({n_good*100/max(success,1):.1f}%)")
-    report.append(f"- ⚠️ **Modérée** (2.5 ≤ RMSD < 4.0 Å) : {n_moderate} structures ({n_moderate*100/max(success,1):.1f}%)")
-    report.append(f"- ❌ **RMSD élevé** (≥ 4.0 Å) : {n_high_rmsd} structures ({n_high_rmsd*100/max(success,1):.1f}%)")
-    report.append("")
-    report.append("---")
-    report.append("")
+    ecrire("## 2. Tableau des Résultats de Superposition")
+    ecrire("")
+    ecrire("### 2.1 Structure de Référence")
+    ecrire("")
+    ecrire("- **PDB ID :** 4WB8")
+    ecrire("- **Chaîne :** A")
+    ecrire("- **Protéine :** PKACA humaine (*Homo sapiens*)")
+    ecrire("- **UniProt :** P17612")
+    ecrire("- **Résolution :** 1.55 Å")
+    ecrire("- **Région superposée :** Lobe C (résidus 127-350, 228 C-alpha)")
+    ecrire("")
+    
+    ecrire("### 2.2 Résultats de Superposition (Format Demandé)")
+    ecrire("")
+    ecrire("| PDB ID | Chaîne utilisée | Nb. C-alpha superposés | RMSD (Å) |")
+    ecrire("|--------|-----------------|------------------------|----------|")
+    recopier(tableau, f)
+    
+    ecrire("")
+    
+    ecrire("### 2.3 Statistiques Globales")
+    ecrire("")
+    ecrire(f"- **Nombre total de structures traitées :** {total}")
+    ecrire(f"- **Succès :** {success} structures ({success*100/total:.1f}%)")
+    ecrire(f"- **Échecs :** {n_errors} structures ({n_errors*100/total:.1f}%)")
+    ecrire(f"- **RMSD moyen :** {avg_rmsd:.2f} Å")
+    ecrire(f"- **Nombre moyen de C-alpha alignés :** {avg_aligned:.0f}")
+    for metrique, (n, somme) in stats['qualite'].items():
+        if n:
+            ecrire(f"- **{metrique} moyen :** {somme / n:.3f} ({n} structures)")
+    ecrire("")
+    
+    ecrire("### 2.4 Répartition par Qualité")
+    ecrire("")
+    ecrire(f"- ✅ **Excellente** (RMSD < 2.0 Å) : {n_excellent} structures ({n_excellent*100/max(success,1):.1f}%)")
+    ecrire(f"- ✅ **Bonne** (2.0 ≤ RMSD < 2.5 Å) : {n_good} structures ({n_good*100/max(success,1):.1f}%)")
+    ecrire(f"- ⚠️ **Modérée** (2.5 ≤ RMSD < 4.0 Å) : {n_moderate} structures ({n_moderate*100/max(success,1):.1f}%)")
+    ecrire(f"- ❌ **RMSD élevé** (≥ 4.0 Å) : {n_high_rmsd} structures ({n_high_rmsd*100/max(success,1):.1f}%)")
+    ecrire("")
+    ecrire("---")
+    ecrire("")
     
     # ========================================================================
     # 3. CAS PROBLÉMATIQUES (EXIGENCE DU PROJET)
     # ========================================================================
-    report.append("## 3. Cas Où la Superposition N'a Pas Abouti")
-    report.append("")
+    ecrire("## 3. Cas Où la Superposition N'a Pas Abouti")
+    ecrire("")
     
-    problematic = [r for r in results if r['Status'] in ['ERROR', 'HIGH_RMSD']]
-    
-    if problematic:
-        report.append(f"**{len(problematic)} structures** présentent des problèmes :")
-        report.append("")
-        
-        for r in problematic:
-            report.append(f"### Structure {r['PDB_ID']} (Chaîne {r['Chain']})")
-            report.append("")
-            
-            if r['Status'] == 'ERROR':
-                report.append("**Type de problème :** ❌ Échec complet du chargement ou de la superposition")
-                report.append("")
-                report.append("**Raisons possibles :**")
-                report.append("")
-                report.append("1. **Structure non disponible** dans la Protein Data Bank")
-                report.append("   - Le fichier mmCIF n'existe pas ou est inaccessible")
-                report.append("   - Solution : Vérifier manuellement sur https://www.rcsb.org/structure/" + r['PDB_ID'])
-                report.append("")
-                report.append("2. **Assemblage biologique non défini**")
-                report.append("   - L'assemblage spécifié dans le CSV n'existe pas pour cette structure")
-                report.append("   - Solution : Utiliser l'assemblage 1 par défaut ou la structure asymétrique")
-                report.append("")
-                report.append("3. **Chaîne manquante ou incorrecte**")
-                report.append(f"   - La chaîne {r['Chain']} n'existe pas dans cette structure")
-                report.append("   - Possible erreur dans le fichier CSV source")
-                report.append("")
-                report.append("4. **Absence complète du domaine kinase**")
-                report.append("   - Structure ne contient pas le lobe C catalytique")
-                report.append("   - Fragment protéique incomplet ou domaine différent")
-                report.append("")
-                report.append("**Impact :** Structure non incluse dans l'analyse finale")
-                report.append("")
-                
-            elif r['Status'] == 'HIGH_RMSD':
-                report.append(f"**Type de problème :** ⚠️ RMSD très élevé ({r['RMSD']} Å > 4.0 Å)")
-                report.append("")
-                report.append(f"**Données de la superposition :**")
-                report.append(f"- RMSD : {r['RMSD']} Å")
-                report.append(f"- C-alpha superposés : {r['N_CA_aligned']}")
-                report.append("")
-                
-                n_aligned = int(r['N_CA_aligned'])
-                rmsd_val = float(r['RMSD'])
-                
-                report.append("**Analyse détaillée :**")
-                report.append("")
-                
-                if n_aligned < 20:
-                    report.append(f"1. **Très peu d'atomes alignés** ({n_aligned} vs ~228 attendus)")
-                    report.append("   - Structure très incomplète ou très différente")
-                    report.append("   - Domaine kinase partiellement absent")
-                    report.append("   - Région du lobe C non homologue")
-                    report.append("")
-                
-                if rmsd_val > 10.0:
-                    report.append(f"2. **RMSD extrêmement élevé** ({rmsd_val:.2f} Å)")
-                    report.append("   - Structures probablement dans des **conformations très différentes**")
-                    report.append("   - État **actif vs inactif** de la kinase")
-                    report.append("   - Présence de **domaines supplémentaires** non présents dans PKACA")
-                    report.append("   - Possible **erreur dans l'identification** de la région du lobe C")
-                    report.append("")
-                elif rmsd_val > 4.0:
-                    report.append(f"2. **RMSD élevé** ({rmsd_val:.2f} Å)")
-                    report.append("   - Conformation différente (possiblement inactive)")
-                    report.append("   - Variations structurales importantes dans le lobe C")
-                    report.append("   - Insertions ou délétions dans la séquence")
-                    report.append("")
-                
-                report.append("**Recommandation :**")
-                report.append("- Vérification visuelle dans PyMOL **impérative**")
-                report.append("- Comparer avec la structure de référence 4WB8")
-                report.append("- Identifier les régions de forte divergence")
-                report.append("- Évaluer si la structure est exploitable pour l'analyse")
-                report.append("")
-                report.append("**Code PyMOL pour vérification :**")
-                report.append("```python")
-                report.append(f"load Super/4WB8-assembly1.cif, reference")
-                report.append(f"load Super/{r['PDB_ID']}_aligned.cif, problematic")
-                report.append(f"hide everything")
-                report.append(f"show ribbon, all")
-                report.append(f"color green, reference")
-                report.append(f"color red, problematic")
-                report.append(f"zoom reference and chain A and resi 127-350")
-                report.append(f"# Observer les différences structurales")
-                report.append("```")
-                report.append("")
-        
+    if stats['n_problemes']:
+        ecrire(f"**{stats['n_problemes']} structures** présentent des problèmes :")
+        ecrire("")
+        recopier(problemes, f)
     else:
-        report.append("✅ **Aucun cas problématique détecté.**")
-        report.append("")
-        report.append("Toutes les structures se sont superposées correctement avec un RMSD < 4.0 Å.")
-        report.append("")
+        ecrire("✅ **Aucun cas problématique détecté.**")
+        ecrire("")
+        ecrire("Toutes les structures se sont superposées correctement avec un RMSD < 4.0 Å.")
+        ecrire("")
     
-    report.append("---")
-    report.append("")
+    ecrire("---")
+    ecrire("")
     
     # ========================================================================
     # 4. DIFFICULTÉS RENCONTRÉES
     # ========================================================================
-    report.append("## 4. Difficultés Rencontrées et Solutions")
-    report.append("")
-    
-    report.append("### 4.1 Difficultés Techniques")
-    report.append("")
-    
-    report.append("#### 4.1.1 Gestion des Assemblages Biologiques")
-    report.append("")
-    report.append("**Problème :**")
-    report.append("- Les structures PDB peuvent avoir plusieurs assemblages biologiques")
-    report.append("- Le CSV spécifie des numéros d'assemblage différents pour chaque structure")
-    report.append("- Certains assemblages n'existent pas ou sont mal définis")
-    report.append("")
-    report.append("**Solution implémentée :**")
-    report.append("- Utilisation de `fetch_mmcif` avec le numéro d'assemblage spécifié")
-    report.append("- Vérification de l'existence du fichier avant téléchargement (cache)")
-    report.append("- Gestion des erreurs avec `try/except` pour continuer en cas d'échec")
-    report.append("")
-    
-    report.append("#### 4.1.2 Numérotation Hétérogène des Résidus")
-    report.append("")
-    report.append("**Problème :**")
-    report.append("- Les structures ALK ont des numérotations de résidus variables")
-    report.append("- La région 127-350 de PKACA peut ne pas exister dans certaines structures")
-    report.append("- Risque d'aligner des régions non homologues")
-    report.append("")
-    report.append("**Solution implémentée :**")
-    report.append("- Tentative d'alignement sur les résidus 127-350")
-    report.append("- Si < 20 C-alpha trouvés : utilisation de **tous les C-alpha** disponibles")
-    report.append("- Permet d'aligner même les structures avec numérotation différente")
-    report.append("- L'algorithme d'alignement de PyMOL trouve automatiquement les régions homologues")
-    report.append("")
-    
-    report.append("#### 4.1.3 Structures Incomplètes")
-    report.append("")
-    report.append("**Problème :**")
-    report.append("- Certaines structures ne contiennent qu'un fragment du domaine kinase")
-    report.append("- Le lobe C peut être partiellement absent")
-    report.append("- RMSD élevé ou nombre de C-alpha très faible")
-    report.append("")
-    report.append("**Solution implémentée :**")
-    report.append("- Critères de validation stricts (RMSD et nombre de C-alpha)")
-    report.append("- Classification en statuts : EXCELLENT, GOOD, MODERATE, HIGH_RMSD, ERROR")
-    report.append("- Identification automatique des cas problématiques pour vérification manuelle")
-    report.append("")
-    
-    report.append("#### 4.1.4 Conformations Actives vs Inactives")
-    report.append("")
-    report.append("**Problème :**")
-    report.append("- Les kinases peuvent adopter différentes conformations")
-    report.append("- État actif (DFG-in) vs inactif (DFG-out)")
-    report.append("- RMSD élevé même pour des structures homologues")
-    report.append("")
-    report.append("**Solution implémentée :**")
-    report.append("- Alignement sur le lobe C global (pas seulement le site actif)")
-    report.append("- Le lobe C est plus conservé que la boucle d'activation")
-    report.append("- Les structures inactives sont détectées par RMSD élevé")
-    report.append("- Nécessité de vérification visuelle pour les interpréter")
-    report.append("")
-    
-    report.append("### 4.2 Limitations du Code Actuel")
-    report.append("")
-    report.append("Le code fonctionne correctement dans la majorité des cas, mais présente quelques limitations :")
-    report.append("")
-    report.append("1. **Structures très divergentes :**")
-    report.append("   - Le code détecte les RMSD > 4 Å mais ne peut pas corriger automatiquement")
-    report.append("   - Nécessite une vérification manuelle et éventuellement un alignement de séquence")
-    report.append("")
-    report.append("2. **Structures avec numérotation non standard :**")
-    report.append("   - Certaines structures utilisent des numéros de résidus très différents")
-    report.append("   - Le fallback (utilisation de tous les C-alpha) fonctionne mais peut aligner des régions non optimales")
-    report.append("")
-    report.append("3. **Assemblages biologiques complexes :**")
-    report.append("   - Les structures avec plusieurs copies de la kinase dans l'assemblage")
-    report.append("   - Le code utilise la première occurrence de la chaîne spécifiée")
-    report.append("")
-    report.append("4. **Structures non disponibles :**")
-    report.append("   - Si une structure n'est pas dans la PDB, le code échoue")
-    report.append("   - Pas de mécanisme de retry ou de recherche alternative")
-    report.append("")
-    
-    report.append("### 4.3 Cas Particuliers Gérés")
-    report.append("")
-    report.append("Le code gère correctement les cas suivants :")
-    report.append("")
-    report.append("✅ Structures déjà téléchargées (cache local)")
-    report.append("✅ Différents assemblages biologiques")
-    report.append("✅ Structures avec numérotation non standard (fallback)")
-    report.append("✅ Suppression automatique des molécules d'eau")
-    report.append("✅ Configuration visuelle automatique (ribbon, sticks, nb_spheres)")
-    report.append("✅ Sauvegarde des structures superposées au format mmCIF")
-    report.append("✅ Génération de statistiques détaillées")
-    report.append("")
-    report.append("---")
-    report.append("")
+    ecrire("## 4. Difficultés Rencontrées et Solutions")
+    ecrire("")
+    
+    ecrire("### 4.1 Difficultés Techniques")
+    ecrire("")
+    
+    ecrire("#### 4.1.1 Gestion des Assemblages Biologiques")
+    ecrire("")
+    ecrire("**Problème :**")
+    ecrire("- Les structures PDB peuvent avoir plusieurs assemblages biologiques")
+    ecrire("- Le CSV spécifie des numéros d'assemblage différents pour chaque structure")
+    ecrire("- Certains assemblages n'existent pas ou sont mal définis")
+    ecrire("")
+    ecrire("**Solution implémentée :**")
+    ecrire("- Utilisation de `fetch_mmcif` avec le numéro d'assemblage spécifié")
+    ecrire("- Vérification de l'existence du fichier avant téléchargement (cache)")
+    ecrire("- Gestion des erreurs avec `try/except` pour continuer en cas d'échec")
+    ecrire("")
+    
+    ecrire("#### 4.1.2 Numérotation Hétérogène des Résidus")
+    ecrire("")
+    ecrire("**Problème :**")
+    ecrire("- Les structures ALK ont des numérotations de résidus variables")
+    ecrire("- La région 127-350 de PKACA peut ne pas exister dans certaines structures")
+    ecrire("- Risque d'aligner des régions non homologues")
+    ecrire("")
+    ecrire("**Solution implémentée :**")
+    ecrire("- Tentative d'alignement sur les résidus 127-350")
+    ecrire("- Si < 20 C-alpha trouvés : utilisation de **tous les C-alpha** disponibles")
+    ecrire("- Permet d'aligner même les structures avec numérotation différente")
+    ecrire("- L'algorithme d'alignement de PyMOL trouve automatiquement les régions homologues")
+    ecrire("")
+    
+    ecrire("#### 4.1.3 Structures Incomplètes")
+    ecrire("")
+    ecrire("**Problème :**")
+    ecrire("- Certaines structures ne contiennent qu'un fragment du domaine kinase")
+    ecrire("- Le lobe C peut être partiellement absent")
+    ecrire("- RMSD élevé ou nombre de C-alpha très faible")
+    ecrire("")
+    ecrire("**Solution implémentée :**")
+    ecrire("- Critères de validation stricts (RMSD et nombre de C-alpha)")
+    ecrire("- Classification en statuts : EXCELLENT, GOOD, MODERATE, HIGH_RMSD, ERROR")
+    ecrire("- Identification automatique des cas problématiques pour vérification manuelle")
+    ecrire("")
+    
+    ecrire("#### 4.1.4 Conformations Actives vs Inactives")
+    ecrire("")
+    ecrire("**Problème :**")
+    ecrire("- Les kinases peuvent adopter différentes conformations")
+    ecrire("- État actif (DFG-in) vs inactif (DFG-out)")
+    ecrire("- RMSD élevé même pour des structures homologues")
+    ecrire("")
+    ecrire("**Solution implémentée :**")
+    ecrire("- Alignement sur le lobe C global (pas seulement le site actif)")
+    ecrire("- Le lobe C est plus conservé que la boucle d'activation")
+    ecrire("- Les structures inactives sont détectées par RMSD élevé")
+    ecrire("- Nécessité de vérification visuelle pour les interpréter")
+    ecrire("")
+    
+    ecrire("### 4.2 Limitations du Code Actuel")
+    ecrire("")
+    ecrire("Le code fonctionne correctement dans la majorité des cas, mais présente quelques limitations :")
+    ecrire("")
+    ecrire("1. **Structures très divergentes :**")
+    ecrire("   - Le code détecte les RMSD > 4 Å mais ne peut pas corriger automatiquement")
+    ecrire("   - Nécessite une vérification manuelle et éventuellement un alignement de séquence")
+    ecrire("")
+    ecrire("2. **Structures avec numérotation non standard :**")
+    ecrire("   - Certaines structures utilisent des numéros de résidus très différents")
+    ecrire("   - Le fallback (utilisation de tous les C-alpha) fonctionne mais peut aligner des régions non optimales")
+    ecrire("")
+    ecrire("3. **Assemblages biologiques complexes :**")
+    ecrire("   - Les structures avec plusieurs copies de la kinase dans l'assemblage")
+    ecrire("   - Le code utilise la première occurrence de la chaîne spécifiée")
+    ecrire("")
+    ecrire("4. **Structures non disponibles :**")
+    ecrire("   - Si une structure n'est pas dans la PDB, le code échoue")
+    ecrire("   - Pas de mécanisme de retry ou de recherche alternative")
+    ecrire("")
+    
+    ecrire("### 4.3 Cas Particuliers Gérés")
+    ecrire("")
+    ecrire("Le code gère correctement les cas suivants :")
+    ecrire("")
+    ecrire("✅ Structures déjà téléchargées (cache local)")
+    ecrire("✅ Différents assemblages biologiques")
+    ecrire("✅ Structures avec numérotation non standard (fallback)")
+    ecrire("✅ Suppression automatique des molécules d'eau")
+    ecrire("✅ Configuration visuelle automatique (ribbon, sticks, nb_spheres)")
+    ecrire("✅ Sauvegarde des structures superposées au format mmCIF")
+    ecrire("✅ Génération de statistiques détaillées")
+    ecrire("")
+    ecrire("---")
+    ecrire("")
     
     # ========================================================================
     # 5. ANALYSE DÉTAILLÉE DES RÉSULTATS
     # ========================================================================
-    report.append("## 5. Analyse Détaillée des Résultats")
-    report.append("")
+    ecrire("## 5. Analyse Détaillée des Résultats")
+    ecrire("")
     
     # Meilleures superpositions
-    best_results = sorted([r for r in valid_results], key=lambda x: float(x['RMSD']))[:5]
-    report.append("### 5.1 Top 5 des Meilleures Superpositions")
-    report.append("")
-    report.append("| Rang | PDB ID | Chaîne | RMSD (Å) | C-alpha alignés |")
-    report.append("|------|--------|--------|----------|-----------------|")
-    for i, r in enumerate(best_results, 1):
-        report.append(f"| {i} | {r['PDB_ID']} | {r['Chain']} | {r['RMSD']} | {r['N_CA_aligned']} |")
-    report.append("")
-    report.append("**Interprétation :**")
-    report.append("- Ces structures montrent une **excellente conservation structurale** du lobe C")
-    report.append("- RMSD < 1.3 Å indique une similarité quasi-identique avec PKACA")
-    report.append("- Confirme l'**homologie structurale** entre ALK et PKACA")
-    report.append("- Suggère des **sites de liaison similaires** pour les inhibiteurs")
-    report.append("")
+    ecrire("### 5.1 Top 5 des Meilleures Superpositions")
+    ecrire("")
+    ecrire("| Rang | PDB ID | Chaîne | RMSD (Å) | C-alpha alignés |")
+    ecrire("|------|--------|--------|----------|-----------------|")
+    for i, (pdb_id, chain, rmsd, n_aligned, _) in enumerate(classement(stats['meilleurs']), 1):
+        ecrire(f"| {i} | {pdb_id} | {chain} | {rmsd} | {n_aligned} |")
+    ecrire("")
+    ecrire("**Interprétation :**")
+    ecrire("- Ces structures montrent une **excellente conservation structurale** du lobe C")
+    ecrire("- RMSD < 1.3 Å indique une similarité quasi-identique avec PKACA")
+    ecrire("- Confirme l'**homologie structurale** entre ALK et PKACA")
+    ecrire("- Suggère des **sites de liaison similaires** pour les inhibiteurs")
+    ecrire("")
     
     # Pires superpositions (hors erreurs)
-    worst_results = sorted([r for r in valid_results], key=lambda x: float(x['RMSD']), reverse=True)[:5]
-    report.append("### 5.2 Top 5 des Pires Superpositions (Hors Erreurs)")
-    report.append("")
-    report.append("| Rang | PDB ID | Chaîne | RMSD (Å) | C-alpha alignés | Statut |")
-    report.append("|------|--------|--------|----------|-----------------|--------|")
-    for i, r in enumerate(worst_results, 1):
-        status_map = {
-            'EXCELLENT': 'Excellent',
-            'GOOD': 'Bon',
-            'MODERATE': 'Modéré',
-            'HIGH_RMSD': 'RMSD élevé',
-            'ERROR': 'Erreur'
-        }
-        status_text = status_map.get(r['Status'], r['Status'])
-        report.append(f"| {i} | {r['PDB_ID']} | {r['Chain']} | {r['RMSD']} | {r['N_CA_aligned']} | {status_text} |")
-    report.append("")
-    report.append("**Interprétation :**")
-    report.append("- Ces structures nécessitent une **analyse approfondie**")
-    report.append("- RMSD élevé peut indiquer :")
-    report.append("  - Conformation inactive de la kinase")
-    report.append("  - Différences structurales majeures dans le lobe C")
-    report.append("  - Présence de domaines supplémentaires")
-    report.append("- **Vérification visuelle recommandée** pour chacune")
-    report.append("")
+    ecrire("### 5.2 Top 5 des Pires Superpositions (Hors Erreurs)")
+    ecrire("")
+    ecrire("| Rang | PDB ID | Chaîne | RMSD (Å) | C-alpha alignés | Statut |")
+    ecrire("|------|--------|--------|----------|-----------------|--------|")
+    for i, (pdb_id, chain, rmsd, n_aligned, status) in enumerate(classement(stats['pires']), 1):
+        status_text = STATUS_MAP.get(status, status)
+        ecrire(f"| {i} | {pdb_id} | {chain} | {rmsd} | {n_aligned} | {status_text} |")
+    ecrire("")
+    ecrire("**Interprétation :**")
+    ecrire("- Ces structures nécessitent une **analyse approfondie**")
+    ecrire("- RMSD élevé peut indiquer :")
+    ecrire("  - Conformation inactive de la kinase")
+    ecrire("  - Différences structurales majeures dans le lobe C")
+    ecrire("  - Présence de domaines supplémentaires")
+    ecrire("- **Vérification visuelle recommandée** pour chacune")
+    ecrire("")
     
     # Distribution des RMSD
-    report.append("### 5.3 Distribution des Valeurs RMSD")
-    report.append("")
-    report.append("| Intervalle RMSD | Nombre de structures | Pourcentage |")
-    report.append("|-----------------|---------------------|-------------|")
-    rmsd_ranges = [
-        (0, 1.5, "0-1.5 Å (Excellent)"),
-        (1.5, 2.0, "1.5-2.0 Å (Très bon)"),
-        (2.0, 2.5, "2.0-2.5 Å (Bon)"),
-        (2.5, 4.0, "2.5-4.0 Å (Modéré)"),
-        (4.0, float('inf'), "> 4.0 Å (Problématique)")
-    ]
-    for min_val, max_val, label in rmsd_ranges:
-        count = sum(1 for r in valid_results if min_val <= float(r['RMSD']) < max_val)
-        pct = count * 100 / max(len(valid_results), 1)
-        report.append(f"| {label} | {count} | {pct:.1f}% |")
-    report.append("")
-    
-    report.append("---")
-    report.append("")
+    ecrire("### 5.3 Distribution des Valeurs RMSD")
+    ecrire("")
+    ecrire("| Intervalle RMSD | Nombre de structures | Pourcentage |")
+    ecrire("|-----------------|---------------------|-------------|")
+    for (_, _, label), count in zip(RMSD_RANGES, stats['histogramme']):
+        pct = count * 100 / max(n_valides, 1)
+        ecrire(f"| {label} | {count} | {pct:.1f}% |")
+    ecrire("")
+    
+    ecrire("---")
+    ecrire("")
     
     # ========================================================================
     # 6. INSTRUCTIONS POUR LA FIGURE
     # ========================================================================
-    report.append("## 6. Génération de la Figure (Ribbon)")
-    report.append("")
-    report.append("Pour générer la figure montrant **toutes les unités biologiques superposées en ribbon** :")
-    report.append("")
-    report.append("### 6.1 Script PyMOL pour Créer la Figure")
-    report.append("")
-    report.append("```python")
-    report.append("# Lancer PyMOL")
-    report.append("pymol -c  # Mode ligne de commande")
-    report.append("")
-    report.append("# Charger la structure de référence")
-    report.append("load Super/4WB8-assembly1.cif, reference")
-    report.append("")
-    report.append("# Charger toutes les structures ALK superposées (exemple)")
-    report.append("# Adapter selon le nombre de structures")
+    ecrire("## 6. Génération de la Figure (Ribbon)")
+    ecrire("")
+    ecrire("Pour générer la figure montrant **toutes les unités biologiques superposées en ribbon** :")
+    ecrire("")
+    ecrire("### 6.1 Script PyMOL pour Créer la Figure")
+    ecrire("")
+    ecrire("```python")
+    ecrire("# Lancer PyMOL")
+    ecrire("pymol -c  # Mode ligne de commande")
+    ecrire("")
+    ecrire("# Charger la structure de référence")
+    ecrire("load Super/4WB8-assembly1.cif, reference")
+    ecrire("")
+    ecrire("# Charger toutes les structures ALK superposées (exemple)")
+    ecrire("# Adapter selon le nombre de structures")
     
     # Sélectionner quelques exemples
-    examples = [r for r in results if r['Status'] == 'EXCELLENT'][:10]
-    for r in examples:
-        if r['PDB_ID'] != 'ERROR':
-            report.append(f"load Super/{r['PDB_ID']}_aligned.cif, {r['PDB_ID']}")
-    
-    report.append("")
-    report.append("# Configuration de l'affichage")
-    report.append("hide everything")
-    report.append("show ribbon, all                    # Toutes les chaînes en ribbon")
-    report.append("show sticks, organic                # Ligands en sticks")
-    report.append("show nb_spheres, inorganic         # Ions métalliques")
-    report.append("")
-    report.append("# Couleurs")
-    report.append("color green, reference              # PKACA en vert (référence)")
-    report.append("color cyan, all                     # Toutes les ALK en cyan")
-    report.append("color green, reference              # Re-colorer PKACA pour être sûr")
-    report.append("")
-    report.append("# Vue sur le lobe C")
-    report.append("zoom reference and chain A and resi 127-350")
-    report.append("")
-    report.append("# Qualité de l'image")
-    report.append("set ray_shadow, 0")
-    report.append("set antialias, 2")
-    report.append("set ambient, 0.4")
-    report.append("")
-    report.append("# Sauvegarder l'image")
-    report.append("png figure_superposition.png, width=2400, height=1800, dpi=300, ray=1")
-    report.append("```")
-    report.append("")
-    
-    report.append("### 6.2 Recommandations pour la Figure")
-    report.append("")
-    report.append("**Éléments à inclure dans la figure :**")
-    report.append("")
-    report.append("1. **Vue d'ensemble** :")
-    report.append("   - Toutes les structures superposées visibles")
-    report.append("   - PKACA (référence) clairement identifiable en vert")
-    report.append("   - Structures ALK en cyan ou couleurs variées")
-    report.append("")
-    report.append("2. **Focus sur le lobe C** :")
-    report.append("   - Zoom sur la région d'alignement (résidus 127-350)")
-    report.append("   - Montrer la qualité de la superposition")
-    report.append("")
-    report.append("3. **Légende claire** :")
-    report.append("   - Identifier la structure de référence (4WB8 en vert)")
-    report.append("   - Indiquer le nombre de structures superposées")
-    report.append("   - Mentionner la région alignée (lobe C)")
-    report.append("")
-    report.append("4. **Qualité de l'image** :")
-    report.append("   - Résolution ≥ 300 dpi")
-    report.append("   - Format PNG ou TIFF")
-    report.append("   - Taille suffisante pour impression (≥ 2400x1800 pixels)")
-    report.append("")
-    
-    report.append("---")
-    report.append("")
+    for pdb_id in stats['exemples']:
+        if pdb_id != 'ERROR':
+            ecrire(f"load Super/{pdb_id}_aligned.cif, {pdb_id}")
+    
+    ecrire("")
+    ecrire("# Configuration de l'affichage")
+    ecrire("hide everything")
+    ecrire("show ribbon, all                    # Toutes les chaînes en ribbon")
+    ecrire("show sticks, organic                # Ligands en sticks")
+    ecrire("show nb_spheres, inorganic         # Ions métalliques")
+    ecrire("")
+    ecrire("# Couleurs")
+    ecrire("color green, reference              # PKACA en vert (référence)")
+    ecrire("color cyan, all                     # Toutes les ALK en cyan")
+    ecrire("color green, reference              # Re-colorer PKACA pour être sûr")
+    ecrire("")
+    ecrire("# Vue sur le lobe C")
+    ecrire("zoom reference and chain A and resi 127-350")
+    ecrire("")
+    ecrire("# Qualité de l'image")
+    ecrire("set ray_shadow, 0")
+    ecrire("set antialias, 2")
+    ecrire("set ambient, 0.4")
+    ecrire("")
+    ecrire("# Sauvegarder l'image")
+    ecrire("png figure_superposition.png, width=2400, height=1800, dpi=300, ray=1")
+    ecrire("```")
+    ecrire("")
+    
+    ecrire("### 6.2 Recommandations pour la Figure")
+    ecrire("")
+    ecrire("**Éléments à inclure dans la figure :**")
+    ecrire("")
+    ecrire("1. **Vue d'ensemble** :")
+    ecrire("   - Toutes les structures superposées visibles")
+    ecrire("   - PKACA (référence) clairement identifiable en vert")
+    ecrire("   - Structures ALK en cyan ou couleurs variées")
+    ecrire("")
+    ecrire("2. **Focus sur le lobe C** :")
+    ecrire("   - Zoom sur la région d'alignement (résidus 127-350)")
+    ecrire("   - Montrer la qualité de la superposition")
+    ecrire("")
+    ecrire("3. **Légende claire** :")
+    ecrire("   - Identifier la structure de référence (4WB8 en vert)")
+    ecrire("   - Indiquer le nombre de structures superposées")
+    ecrire("   - Mentionner la région alignée (lobe C)")
+    ecrire("")
+    ecrire("4. **Qualité de l'image** :")
+    ecrire("   - Résolution ≥ 300 dpi")
+    ecrire("   - Format PNG ou TIFF")
+    ecrire("   - Taille suffisante pour impression (≥ 2400x1800 pixels)")
+    ecrire("")
+    
+    ecrire("---")
+    ecrire("")
     
     # ========================================================================
     # 7. CONCLUSION
     # ========================================================================
-    report.append("## 7. Conclusion")
-    report.append("")
-    
-    report.append(f"### 7.1 Résultats Globaux")
-    report.append("")
-    report.append(f"Sur **{total} structures ALK** analysées :")
-    report.append("")
-    report.append(f"- ✅ **{success} structures** se sont superposées avec succès ({success*100/total:.1f}%)")
-    report.append(f"- ✅ **{n_excellent}** ont une **excellente superposition** (RMSD < 2 Å)")
-    report.append(f"- ⚠️ **{n_high_rmsd}** ont un **RMSD élevé** (> 4 Å, nécessitent vérification)")
-    report.append(f"- ❌ **{n_errors}** ont **échoué** (problèmes techniques ou absence de structure)")
-    report.append("")
-    report.append(f"**RMSD moyen : {avg_rmsd:.2f} Å** - Indique une **bonne conservation structurale** du lobe C")
-    report.append("")
-    
-    report.append(f"### 7.2 Interprétation Biologique")
-    report.append("")
-    report.append("Les résultats confirment que :")
-    report.append("")
-    report.append("1. **Les protéines kinases ALK et PKACA partagent une architecture similaire**")
-    report.append("   - Le lobe C catalytique est bien conservé")
-    report.append("   - Homologie structurale malgré des séquences différentes")
-    report.append("")
-    report.append("2. **La majorité des structures ALK sont dans une conformation active**")
-    report.append("   - RMSD faible indique une conformation similaire à PKACA")
-    report.append("   - Site actif probablement accessible aux inhibiteurs")
-    report.append("")
-    report.append("3. **Quelques structures montrent des différences significatives**")
-    report.append("   - Possibles conformations inactives")
-    report.append("   - Variations structurales dues à la présence d'inhibiteurs spécifiques")
-    report.append("   - Domaines supplémentaires ou fragments incomplets")
-    report.append("")
-    
-    report.append("### 7.3 Applications")
-    report.append("")
-    report.append("Ces résultats sont utiles pour :")
-    report.append("")
-    report.append("- **Design de médicaments** : Identifier des inhibiteurs multi-kinases (ALK + PKACA)")
-    report.append("- **Études de spécificité** : Comprendre pourquoi certains inhibiteurs ciblent ALK et pas PKACA")
-    report.append("- **Modélisation moléculaire** : Utiliser PKACA comme template pour modéliser ALK")
-    report.append("- **Analyse comparative** : Étudier l'évolution structurale des protéines kinases")
-    report.append("")
-    
-    report.append("---")
-    report.append("")
+    ecrire("## 7. Conclusion")
+    ecrire("")
+    
+    ecrire(f"### 7.1 Résultats Globaux")
+    ecrire("")
+    ecrire(f"Sur **{total} structures ALK** analysées :")
+    ecrire("")
+    ecrire(f"- ✅ **{success} structures** se sont superposées avec succès ({success*100/total:.1f}%)")
+    ecrire(f"- ✅ **{n_excellent}** ont une **excellente superposition** (RMSD < 2 Å)")
+    ecrire(f"- ⚠️ **{n_high_rmsd}** ont un **RMSD élevé** (> 4 Å, nécessitent vérification)")
+    ecrire(f"- ❌ **{n_errors}** ont **échoué** (problèmes techniques ou absence de structure)")
+    ecrire("")
+    ecrire(f"**RMSD moyen : {avg_rmsd:.2f} Å** - Indique une **bonne conservation structurale** du lobe C")
+    ecrire("")
+    
+    ecrire(f"### 7.2 Interprétation Biologique")
+    ecrire("")
+    ecrire("Les résultats confirment que :")
+    ecrire("")
+    ecrire("1. **Les protéines kinases ALK et PKACA partagent une architecture similaire**")
+    ecrire("   - Le lobe C catalytique est bien conservé")
+    ecrire("   - Homologie structurale malgré des séquences différentes")
+    ecrire("")
+    ecrire("2. **La majorité des structures ALK sont dans une conformation active**")
+    ecrire("   - RMSD faible indique une conformation similaire à PKACA")
+    ecrire("   - Site actif probablement accessible aux inhibiteurs")
+    ecrire("")
+    ecrire("3. **Quelques structures montrent des différences significatives**")
+    ecrire("   - Possibles conformations inactives")
+    ecrire("   - Variations structurales dues à la présence d'inhibiteurs spécifiques")
+    ecrire("   - Domaines supplémentaires ou fragments incomplets")
+    ecrire("")
+    
+    ecrire("### 7.3 Applications")
+    ecrire("")
+    ecrire("Ces résultats sont utiles pour :")
+    ecrire("")
+    ecrire("- **Design de médicaments** : Identifier des inhibiteurs multi-kinases (ALK + PKACA)")
+    ecrire("- **Études de spécificité** : Comprendre pourquoi certains inhibiteurs ciblent ALK et pas PKACA")
+    ecrire("- **Modélisation moléculaire** : Utiliser PKACA comme template pour modéliser ALK")
+    ecrire("- **Analyse comparative** : Étudier l'évolution structurale des protéines kinases")
+    ecrire("")
+    
+    ecrire("---")
+    ecrire("")
     
     # ========================================================================
     # FICHIERS GÉNÉRÉS
     # ========================================================================
-    report.append("## Fichiers Générés")
-    report.append("")
-    report.append("### Dossier Projet/")
-    report.append("")
-    report.append("- `open-csv.py` : Script principal de superposition (PyMOL)")
-    report.append("- `generate_report.py` : Script de génération de rapport (Python)")
-    report.append("- `rcsb_pdb_custom_report_20260110111300_new.csv` : Liste des structures ALK")
-    report.append("- `superposition_results.csv` : Résultats bruts (tableau)")
-    report.append("- `rapport_resultats.md` : Ce rapport")
-    report.append("")
-    report.append("### Dossier Super/")
-    report.append("")
-    report.append("- `4WB8-assembly1.cif` : Structure de référence PKACA")
-    report.append(f"- `*_aligned.cif` : {success} structures ALK superposées")
-    report.append("")
-    report.append("---")
-    report.append("")
-    report.append(f"*Rapport généré automatiquement le {datetime.now().strftime('%d/%m/%Y à %H:%M')}*")
-    
-    # Écrire le rapport
-    with open(output_file, 'w', encoding='utf-8') as f:
-        f.write('\n'.join(report))
+    ecrire("## Fichiers Générés")
+    ecrire("")
+    ecrire("### Dossier Projet/")
+    ecrire("")
+    ecrire("- `open-csv.py` : Script principal de superposition (PyMOL)")
+    ecrire("- `generate_report.py` : Script de génération de rapport (Python)")
+    ecrire("- `rcsb_pdb_custom_report_20260110111300_new.csv` : Liste des structures ALK")
+    ecrire("- `superposition_results.csv` : Résultats bruts (tableau)")
+    ecrire("- `rapport_resultats.md` : Ce rapport")
+    ecrire("")
+    ecrire("### Dossier Super/")
+    ecrire("")
+    ecrire("- `4WB8-assembly1.cif` : Structure de référence PKACA")
+    ecrire(f"- `*_aligned.cif` : {success} structures ALK superposées")
+    ecrire("")
+    ecrire("---")
+    ecrire("")
+    ecrire(f"*Rapport généré automatiquement le {datetime.now().strftime('%d/%m/%Y à %H:%M')}*")
+
+
+def generate_report(results_file="superposition_results.csv", output_file="rapport_resultats.md"):
+    """Génère un rapport Markdown à partir des résultats de superposition"""
+    
+    if not os.path.exists(results_file):
+        print(f"❌ Fichier {results_file} non trouvé!")
+        print("   Lancez d'abord le script open-csv.py dans PyMOL")
+        return
+    
+    # Lire les résultats (un seul passage) puis écrire le rapport
+    with tempfile.TemporaryFile('w+', encoding='utf-8') as tableau, \
+            tempfile.TemporaryFile('w+', encoding='utf-8') as problemes:
+        stats = parcourir(results_file, tableau, problemes)
+        if not stats['total']:
+            print(f"❌ Aucun résultat dans {results_file}")
+            return
+        with open(output_file, 'w', encoding='utf-8') as f:
+            ecrire_rapport(f, stats, tableau, problemes)
+    
+    total = stats['total']
+    n_errors = stats['statuts']['ERROR']
+    success = total - n_errors
+    n_valides = max(stats['n_valides'], 1)
     
     # Affichage console
     print("="*70)
@@ -644,13 +756,13 @@ def generate_report():
     print(f"\n📊 STATISTIQUES :")
     print(f"   Structures traitées     : {total}")
     print(f"   Succès                  : {success} ({success*100/total:.1f}%)")
-    print(f"   Excellentes (< 2 Å)     : {n_excellent}")
-    print(f"   Bonnes (2-2.5 Å)        : {n_good}")
-    print(f"   Modérées (2.5-4 Å)      : {n_moderate}")
-    print(f"   RMSD élevé (> 4 Å)      : {n_high_rmsd}")
+    print(f"   Excellentes (< 2 Å)     : {stats['statuts']['EXCELLENT']}")
+    print(f"   Bonnes (2-2.5 Å)        : {stats['statuts']['GOOD']}")
+    print(f"   Modérées (2.5-4 Å)      : {stats['statuts']['MODERATE']}")
+    print(f"   RMSD élevé (> 4 Å)      : {stats['statuts']['HIGH_RMSD']}")
     print(f"   Erreurs                 : {n_errors}")
-    print(f"\n   RMSD moyen              : {avg_rmsd:.2f} Å")
-    print(f"   C-alpha alignés (moy.)  : {avg_aligned:.0f}")
+    print(f"\n   RMSD moyen              : {stats['somme_rmsd'] / n_valides:.2f} Å")
+    print(f"   C-alpha alignés (moy.)  : {stats['somme_alignes'] / n_valides:.0f}")
     print(f"\n💡 Consultez {output_file} pour le rapport complet")
     print(f"📁 Structures superposées dans le dossier Super/")
     print("="*70)
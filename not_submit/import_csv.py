@@ -1,10 +1,16 @@
 import csv
 import os
+import sys
 from pymol import cmd
 
-def load_from_csv(filename):
+# telechargement.py est dans Projet/
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "Projet"))
+from telechargement import SOURCE_RCSB, prefetch
+
+def load_from_csv(filename, source=SOURCE_RCSB):
     """
     Charge des structures PDB dans PyMOL à partir d'un fichier CSV.
+    Les fichiers sont d'abord tous téléchargés en parallèle (source : RCSB ou dossier miroir).
     Usage dans PyMOL: load_from_csv mon_fichier.csv
     """
     # Vérifier si le fichier existe
@@ -19,15 +25,19 @@ def load_from_csv(filename):
             # On saute la 1ère ligne et on utilise la 2ème comme header
             reader = csv.DictReader(lines[1:])
             
-            count = 0
-            for row in reader:
-                entry_id = row.get("PDB ID")
-                if entry_id:
-                    print(f"Récupération de : {entry_id}...")
-                    cmd.fetch(entry_id)
-                    count += 1
-            
-            print(f"Terminé ! {count} structures ont été ajoutées. ✨")
+            entry_ids = [row.get("PDB ID") for row in reader if row.get("PDB ID")]
+
+        echecs = prefetch([f"{entry_id}.cif" for entry_id in entry_ids], source)
+
+        count = 0
+        for entry_id in dict.fromkeys(entry_ids):
+            if f"{entry_id}.cif" in echecs:
+                continue
+            print(f"Chargement de : {entry_id}...")
+            cmd.load(f"{entry_id}.cif", entry_id)
+            count += 1
+
+        print(f"Terminé ! {count} structures ont été ajoutées. ✨")
             
     except Exception as e:
         print(f"Une erreur est survenue : {e}")
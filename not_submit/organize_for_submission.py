@@ -3,12 +3,21 @@
 """
 Script pour organiser les fichiers pour le rendu final
 Crée le dossier Super/ et y copie toutes les structures alignées
+Crée aussi l'archive Super.pka (un seul fichier compressé, voir Projet/archive_ensemble.py)
 """
 
 import os
+import sys
 import shutil
 import glob
 
+# archive_ensemble.py est dans Projet/
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "Projet"))
+from archive_ensemble import creer_archive
+
+# archive de l'ensemble à côté du dossier Super/ (None pour ne copier que les fichiers)
+archive_file = "../Super.pka"
+
 # Créer le dossier Super s'il n'existe pas
 super_dir = "../Super"
 if not os.path.exists(super_dir):
@@ -38,6 +47,12 @@ for aligned_file in aligned_files:
 
 print(f"✓ {count} structures alignées copiées dans Super/")
 
+# Archive compressée : un seul fichier à copier ou à envoyer
+if archive_file and aligned_files:
+    creer_archive(sorted(aligned_files), archive_file, verbose=False)
+    taille = sum(os.path.getsize(f) for f in aligned_files)
+    print(f"✓ Archive {archive_file} : {taille / 1e6:.1f} Mo -> {os.path.getsize(archive_file) / 1e6:.1f} Mo")
+
 # Vérifier le contenu
 files_in_super = os.listdir(super_dir)
 print(f"\n✓ Contenu de Super/: {len(files_in_super)} fichiers")
@@ -47,4 +62,4 @@ print("\n" + "="*60)
 print("Organisation terminée!")
 print("="*60)
 print(f"Le dossier Super/ contient toutes les structures superposées")
-print(f"Vous pouvez maintenant créer votre ZIP pour le rendu")
+print(f"Vous pouvez maintenant créer votre ZIP pour le rendu (ou envoyer {archive_file})")
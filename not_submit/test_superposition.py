@@ -6,8 +6,16 @@ Test pour la superposition de peu de structures sur PKACA
 """
 
 import csv
+import os
+import sys
 from pymol import cmd
 
+# fonctions du dossier Projet/
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "Projet"))
+from registre_lobe import chercher_registre
+from superposition import ca_pymol
+from profil_chaines import afficher, choisir_chaine, profil_pymol
+
 # limiter le nombre de structures à tester
 MAX_STRUCTURES = 3
 
@@ -25,6 +33,10 @@ reference_chain = "E"
 PKACA_LOBE_C_START = 127
 PKACA_LOBE_C_END = 300
 
+# recherche du lobe C de la cible : tous les décalages de numérotation évalués
+# en une fois (registre_lobe.py) ; False = essayer six plages fixes avec cmd.align
+RECHERCHE_REGISTRE = True
+
 print("="*60)
 print("TEST DE SUPERPOSITION - MODE LIMITÉ")
 print("="*60)
@@ -96,23 +108,12 @@ with open(csv_file, newline='') as f:
             cmd.do(f"fetch_mmcif {entry_id}, {obj_name}, 1")
             cmd.remove(f"{obj_name} and solvent")
             
-            # identifier la chaîne principale
-            chains = cmd.get_chains(obj_name)
-            print(f"Chaînes disponibles: {', '.join(chains)}")
-            
-            target_chain = None
-            max_residues = 0
-            
-            for chain in chains:
-                n_res = cmd.count_atoms(f"{obj_name} and chain {chain} and polymer.protein and name CA")
-                print(f"  Chaîne {chain}: {n_res} résidus")
-                if n_res > max_residues and n_res > 200:
-                    max_residues = n_res
-                    target_chain = chain
-            
-            if not target_chain:
-                target_chain = chains[0]
-                max_residues = cmd.count_atoms(f"{obj_name} and chain {target_chain} and polymer.protein and name CA")
+            # identifier la chaîne principale : profil de toutes les chaînes en un seul cmd.iterate
+            # (C-alpha, complétude), la plus longue et la plus complète est retenue
+            profils = profil_pymol(cmd, obj_name)
+            afficher(profils)
+            target_chain = choisir_chaine(profils) or cmd.get_chains(obj_name)[0]
+            max_residues = next((p['n_ca'] for p in profils if p['chaine'] == target_chain), 0)
             
             print(f"➜ Chaîne sélectionnée: {target_chain} ({max_residues} résidus)")
             
@@ -136,50 +137,61 @@ with open(csv_file, newline='') as f:
             print(f"\nÉtape 2: Identification de la région correspondant au lobe C...")
             print(f"  Référence PKACA lobe C: résidus {PKACA_LOBE_C_START}-{PKACA_LOBE_C_END}")
             
-            # Tester plusieurs régions possibles pour le lobe C dans la cible
-            lobe_ranges = [
-                (PKACA_LOBE_C_START, PKACA_LOBE_C_END),           # Même numérotation
-                (PKACA_LOBE_C_START - 30, PKACA_LOBE_C_END - 30), # Décalage -30
-                (PKACA_LOBE_C_START + 30, PKACA_LOBE_C_END + 30), # Décalage +30
-                (120, 280),  # Région générique du lobe C pour kinases
-                (140, 300),  # Région alternative
-                (100, 250),  # Région plus courte
-            ]
-            
             best_rmsd = 999
             best_alignment = None
             best_range = None
             best_n_atoms = 0
             
-            for start, end in lobe_ranges:
-                lobe_c_target = f"{obj_name} and chain {target_chain} and resi {start}-{end} and name CA"
+            if RECHERCHE_REGISTRE:
+                # C-alpha lus une seule fois, chaque décalage résidu r <-> r + d scoré par Kabsch
+                registre = chercher_registre(ca_pymol(cmd, global_sel), ca_pymol(cmd, ref_global),
+                                             PKACA_LOBE_C_START, PKACA_LOBE_C_END)
+                if registre is not None:
+                    best_range = (registre['debut_cible'], registre['fin_cible'])
+                    best_rmsd = registre['rmsd']
+                    best_n_atoms = registre['n_paires']
+                    print(f"  ✓ {registre['profil']['score'].size} fenêtres évaluées : décalage {registre['decalage']:+d}, "
+                          f"RMSD={best_rmsd:.2f} Å, {best_n_atoms} atomes appariés")
+            else:
+                # Tester plusieurs régions possibles pour le lobe C dans la cible
+                lobe_ranges = [
+                    (PKACA_LOBE_C_START, PKACA_LOBE_C_END),           # Même numérotation
+                    (PKACA_LOBE_C_START - 30, PKACA_LOBE_C_END - 30), # Décalage -30
+                    (PKACA_LOBE_C_START + 30, PKACA_LOBE_C_END + 30), # Décalage +30
+                    (120, 280),  # Région générique du lobe C pour kinases
+                    (140, 300),  # Région alternative
+                    (100, 250),  # Région plus courte
+                ]
+            
+                for start, end in lobe_ranges:
+                    lobe_c_target = f"{obj_name} and chain {target_chain} and resi {start}-{end} and name CA"
                 
-                n_target = cmd.count_atoms(lobe_c_target)
+                    n_target = cmd.count_atoms(lobe_c_target)
                 
-                # Nécessite au moins 40 résidus pour un lobe C
-                if n_target > 40:
-                    try:
-                        test_align = cmd.align(
-                            lobe_c_target,
-                            lobe_c_ref,  # TOUJOURS aligner sur le lobe C de la référence
-                            cycles=5,
-                            transform=0,  # Ne pas transformer pour ce test
-                            quiet=1
-                        )
+                    # Nécessite au moins 40 résidus pour un lobe C
+                    if n_target > 40:
+                        try:
+                            test_align = cmd.align(
+                                lobe_c_target,
+                                lobe_c_ref,  # TOUJOURS aligner sur le lobe C de la référence
+                                cycles=5,
+                                transform=0,  # Ne pas transformer pour ce test
+                                quiet=1
+                            )
                         
-                        # Garder le meilleur alignement (RMSD faible ET bon nombre d'atomes)
-                        if test_align[1] > 40:  # Au moins 40 atomes alignés
-                            quality_score = test_align[0] - (test_align[1] / 100.0)  # Favorise plus d'atomes
-                            best_score = best_rmsd - (best_n_atoms / 100.0)
+                            # Garder le meilleur alignement (RMSD faible ET bon nombre d'atomes)
+                            if test_align[1] > 40:  # Au moins 40 atomes alignés
+                                quality_score = test_align[0] - (test_align[1] / 100.0)  # Favorise plus d'atomes
+                                best_score = best_rmsd - (best_n_atoms / 100.0)
                             
-                            if quality_score < best_score:
-                                best_rmsd = test_align[0]
-                                best_alignment = test_align
-                                best_range = (start, end)
-                                best_n_atoms = test_align[1]
-                                print(f"  ✓ Essai resi {start:3d}-{end:3d}: RMSD={test_align[0]:.2f} Å, {test_align[1]:3d} atomes alignés")
-                    except Exception as e:
-                        pass
+                                if quality_score < best_score:
+                                    best_rmsd = test_align[0]
+                                    best_alignment = test_align
+                                    best_range = (start, end)
+                                    best_n_atoms = test_align[1]
+                                    print(f"  ✓ Essai resi {start:3d}-{end:3d}: RMSD={test_align[0]:.2f} Å, {test_align[1]:3d} atomes alignés")
+                        except Exception as e:
+                            pass
             
             # Si aucune région spécifique ne fonctionne
             if best_range is None: